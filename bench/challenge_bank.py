@@ -0,0 +1,121 @@
+"""Time-to-first-challenge after a restart.
+
+Fills a challenge bank in a temporary directory, then starts fresh interpreters
+that each open the bank and serve one challenge through MemoryviewReader, the
+way the first click after a restart is served. The page cache is warm, as it
+is after a normal restart of the bot on the same host.
+
+    python bench/challenge_bank.py --challenges 2000 --runs 10
+
+With --compare-remote (requires aiohttp) the same is measured for a cold
+aiohttp session fetching from the loadtest stand-in CAPTCHA API:
+
+    python bench/challenge_bank.py --compare-remote --api-latency-ms 250
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.lib.challengebank import ChallengeBank  # noqa: E402
+
+BANK_FIRST_CHALLENGE = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from src.lib.challengebank import ChallengeBank, MemoryviewReader
+bank = ChallengeBank({directory!r})
+bank.open()
+opened = time.perf_counter()
+challenge = bank.take({difficulty})
+data = MemoryviewReader(challenge.image).read()
+served = time.perf_counter()
+print(opened - start, served - start, len(data))
+"""
+
+REMOTE_FIRST_CHALLENGE = """
+import asyncio, base64, time
+start = time.perf_counter()
+import aiohttp
+
+async def main():
+    async with aiohttp.ClientSession() as session:
+        async with session.get({url!r}) as response:
+            data = await response.json()
+    return base64.b64decode(data["image"].split(",", 1)[1])
+
+image = asyncio.run(main())
+print(0.0, time.perf_counter() - start, len(image))
+"""
+
+
+def _fill(directory: str, challenges: int, difficulties: int, image_bytes: int) -> None:
+    bank = ChallengeBank(directory)
+    bank.open()
+    for i in range(challenges):
+        bank.add(i % difficulties + 1, f"a{i:05d}", os.urandom(image_bytes), 3600)
+    bank.close()
+
+
+def _run(code: str, runs: int) -> tuple[list[float], list[float]]:
+    opened, served = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        open_time, serve_time, _ = output.split()
+        opened.append(float(open_time) * 1000)
+        served.append(float(serve_time) * 1000)
+    return opened, served
+
+
+def _report(label: str, opened: list[float], served: list[float]) -> None:
+    print(
+        f"{label:<8} open median {statistics.median(opened):7.2f} ms   "
+        f"first challenge median {statistics.median(served):7.2f} ms   max {max(served):7.2f} ms"
+    )
+
+
+async def _remote(args: argparse.Namespace) -> tuple[list[float], list[float]]:
+    from bench.loadtest import FakeCaptchaAPI
+
+    api = FakeCaptchaAPI(args.api_latency_ms, 0.0, 0.0, args.image_bytes)
+    url = await api.start(args.api_port)
+    try:
+        code = REMOTE_FIRST_CHALLENGE.format(url=f"{url}?difficulty=1")
+        return await asyncio.to_thread(_run, code, args.runs)
+    finally:
+        await api.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--challenges", type=int, default=2000)
+    parser.add_argument("--difficulties", type=int, default=10)
+    parser.add_argument("--image-bytes", type=int, default=20_000)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--compare-remote", action="store_true")
+    parser.add_argument("--api-latency-ms", type=float, default=250.0)
+    parser.add_argument("--api-port", type=int, default=18081)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        _fill(directory, args.challenges, args.difficulties, args.image_bytes)
+        size = os.path.getsize(os.path.join(directory, "challenges.dat"))
+        print(f"filled {args.challenges} challenges ({size / 1024 / 1024:.1f} MiB) in {time.perf_counter() - start:.2f}s")
+
+        code = BANK_FIRST_CHALLENGE.format(root=ROOT, directory=directory, difficulty=1)
+        _report("bank", *_run(code, args.runs))
+
+    if args.compare_remote:
+        _report("remote", *asyncio.run(_remote(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Cold-start benchmark.
+
+Import mode (default) measures the cold import time of each heavy dependency
+and each cog module in a fresh interpreter, so results are not skewed by the
+module cache:
+
+    python bench/cold_start.py --runs 5
+
+Full mode starts bot.py itself (a test token in .env is required) and reads the
+profile written through STARTUP_PROFILE_PATH. It reports the time until the
+bot is ready and, with --wait-interaction, until the first interaction is
+received (click a panel in the test guild after each restart):
+
+    python bench/cold_start.py --full --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEPENDENCIES = ("discord", "watchdog.observers", "sentry_sdk", "psutil", "aiohttp", "asyncpg")
+
+
+def _cog_modules() -> list[str]:
+    modules = []
+    for root, _, files in os.walk(os.path.join(ROOT, "src")):
+        for file in files:
+            if file.endswith(".py"):
+                relative = os.path.relpath(os.path.join(root, file[:-3]), ROOT)
+                modules.append(relative.replace(os.sep, "."))
+    return sorted(modules)
+
+
+def _import_time(module: str) -> float:
+    code = f"import time; s = time.perf_counter(); import {module}; print(time.perf_counter() - s)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip())
+
+
+def run_imports(runs: int) -> None:
+    print(f"{'module':<40}{'median':>10}{'min':>10}")
+    for module in DEPENDENCIES + tuple(_cog_modules()):
+        try:
+            samples = [_import_time(module) for _ in range(runs)]
+        except subprocess.CalledProcessError as e:
+            print(f"{module:<40}{'failed':>10}  {e.stderr.strip().splitlines()[-1]}")
+            continue
+        print(f"{module:<40}{statistics.median(samples) * 1000:>8.1f}ms{min(samples) * 1000:>8.1f}ms")
+
+
+def run_full(runs: int, wait_interaction: bool, timeout: float) -> None:
+    target = "first_interaction" if wait_interaction else "ready"
+    results: dict[str, list[float]] = {}
+    for i in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profile.json")
+            env = dict(os.environ, STARTUP_PROFILE_PATH=path)
+            proc = subprocess.Popen([sys.executable, "bot.py"], cwd=ROOT, env=env,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            deadline = time.monotonic() + timeout
+            profile = None
+            try:
+                while time.monotonic() < deadline:
+                    time.sleep(0.1)
+                    if os.path.exists(path):
+                        with open(path, encoding="utf-8") as f:
+                            try:
+                                data = json.load(f)
+                            except json.JSONDecodeError:
+                                continue
+                        if target in data["marks"]:
+                            profile = data
+                            break
+            finally:
+                proc.terminate()
+                proc.wait()
+        if profile is None:
+            print(f"run {i + 1}: timed out waiting for '{target}'")
+            continue
+        for name, seconds in profile["marks"].items():
+            results.setdefault(name, []).append(seconds)
+        for name, seconds in profile["imports"].items():
+            results.setdefault(f"import {name}", []).append(seconds)
+        for name, seconds in profile["cogs"].items():
+            results.setdefault(f"cog_load {name}", []).append(seconds)
+
+    print(f"{'phase':<45}{'median':>10}{'max':>10}")
+    for name, samples in results.items():
+        print(f"{name:<45}{statistics.median(samples) * 1000:>8.1f}ms{max(samples) * 1000:>8.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--full", action="store_true", help="start bot.py and read its startup profile")
+    parser.add_argument("--wait-interaction", action="store_true", help="wait for the first interaction")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    if args.full:
+        run_full(args.runs, args.wait_interaction, args.timeout)
+    else:
+        run_imports(args.runs)
+
+
+if __name__ == "__main__":
+    main()
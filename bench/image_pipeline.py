@@ -0,0 +1,108 @@
+"""Bytes per challenge and time per image of the CAPTCHA image pipeline.
+
+Fetches sample challenges for each difficulty from the CAPTCHA API (or
+generates CAPTCHA-like images with --synthetic when offline) and runs them
+through src.lib.imagepipeline.compact with the current CAPTCHA_IMAGE_* settings:
+
+    python bench/image_pipeline.py --samples 20
+    CAPTCHA_IMAGE_MAX_BYTES=15000 python bench/image_pipeline.py --synthetic
+
+Requires Pillow (and aiohttp unless --synthetic is used).
+"""
+import argparse
+import asyncio
+import base64
+import os
+import random
+import statistics
+import string
+import sys
+import time
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.lib import imagepipeline  # noqa: E402
+
+DEFAULT_API_URL = os.getenv("CAPTCHA_API_URL", "https://captcha.evex.land/api/captcha")
+
+
+async def _fetch_samples(url: str, difficulty: int, count: int) -> list[bytes]:
+    import aiohttp
+
+    images = []
+    async with aiohttp.ClientSession() as session:
+        for _ in range(count):
+            async with session.get(f"{url}?difficulty={difficulty}") as response:
+                response.raise_for_status()
+                data = await response.json()
+            images.append(base64.b64decode(data["image"].split(",", 1)[1]))
+    return images
+
+
+def _synthetic_samples(difficulty: int, count: int) -> list[bytes]:
+    """Text on a noisy background; noise grows with difficulty"""
+    from PIL import Image, ImageDraw
+
+    images = []
+    for _ in range(count):
+        image = Image.new("RGB", (600, 200), tuple(random.randint(200, 255) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(difficulty * 40):
+            xy = [random.randint(0, 600), random.randint(0, 200), random.randint(0, 600), random.randint(0, 200)]
+            draw.line(xy, fill=tuple(random.randint(0, 255) for _ in range(3)), width=random.randint(1, 3))
+        for _ in range(difficulty * 2000):
+            draw.point((random.randint(0, 599), random.randint(0, 199)), fill=tuple(random.randint(0, 255) for _ in range(3)))
+        text = "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
+        draw.text((60, 60), text, fill=(20, 20, 20), font_size=72)
+        out = BytesIO()
+        image.save(out, format="PNG")
+        images.append(out.getvalue())
+    return images
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=10, help="images per difficulty")
+    parser.add_argument("--difficulties", default="1-10")
+    parser.add_argument("--api-url", default=DEFAULT_API_URL)
+    parser.add_argument("--synthetic", action="store_true", help="generate images locally instead of fetching")
+    args = parser.parse_args()
+
+    if not imagepipeline.enabled():
+        sys.exit("Pillow is not installed or CAPTCHA_IMAGE_MAX_BYTES is 0; nothing to measure")
+
+    low, _, high = args.difficulties.partition("-")
+    difficulties = range(int(low), int(high or low) + 1)
+    print(
+        f"budget {imagepipeline.MAX_BYTES} B, width {imagepipeline.MIN_WIDTH}-{imagepipeline.MAX_WIDTH}px, "
+        f"{imagepipeline.COLORS} colours"
+    )
+    print(f"{'diff':>4} {'in (B)':>10} {'out (B)':>10} {'ratio':>7} {'over':>5} {'mean ms':>8} {'p95 ms':>8}")
+
+    for difficulty in difficulties:
+        if args.synthetic:
+            samples = _synthetic_samples(difficulty, args.samples)
+        else:
+            samples = asyncio.run(_fetch_samples(args.api_url, difficulty, args.samples))
+
+        sizes_in, sizes_out, times = [], [], []
+        for data in samples:
+            start = time.perf_counter()
+            out = imagepipeline.compact(data)
+            times.append((time.perf_counter() - start) * 1000)
+            sizes_in.append(len(data))
+            sizes_out.append(len(out))
+
+        times.sort()
+        over = sum(size > imagepipeline.MAX_BYTES for size in sizes_out)
+        print(
+            f"{difficulty:>4} {statistics.mean(sizes_in):>10.0f} {statistics.mean(sizes_out):>10.0f} "
+            f"{sum(sizes_out) / sum(sizes_in):>7.1%} {over:>5} {statistics.mean(times):>8.1f} "
+            f"{times[min(len(times) - 1, int(len(times) * 0.95))]:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+"""End-to-end load generator for the verification flow.
+
+Runs the real PersistentAuthView -> PersistentModalButtonView ->
+PersistentAuthModal callbacks against local stand-ins:
+
+* a local aiohttp server playing captcha.evex.land, with configurable latency
+  and error rate,
+* synthetic interactions (guild, member, response) in place of Discord, which
+  fail like Discord does when the first response comes after 3 seconds,
+* an in-memory connection in place of PostgreSQL, used by the real Auth,
+  AuditLog and AuthStats cogs.
+
+    python bench/loadtest.py --concurrency 50 --duration 60
+    python bench/loadtest.py --concurrency 200 --duration 1800 --api-error-rate 0.02   # soak
+
+Reports throughput, per-stage latency percentiles, error rates and memory growth.
+"""
+import argparse
+import asyncio
+import base64
+import gc
+import os
+import random
+import statistics
+import string
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.lib.supervisor import Supervisor  # noqa: E402
+
+STAGES = ("click_ack", "click", "open_modal", "submit", "total")
+
+
+# ---------------------------------------------------------------------------
+# Fake CAPTCHA API
+# ---------------------------------------------------------------------------
+
+class FakeCaptchaAPI:
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, image_bytes: int) -> None:
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.image = base64.b64encode(os.urandom(image_bytes)).decode()
+        self.requests = 0
+        self.url: Optional[str] = None
+        self._runner = None
+
+    async def handle(self, request):
+        from aiohttp import web
+
+        self.requests += 1
+        delay = max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        if random.random() < self.error_rate:
+            return web.Response(status=500, text="injected error")
+        answer = "".join(random.choices(string.ascii_lowercase + string.digits, k=6))
+        return web.json_response({"image": f"data:image/png;base64,{self.image}", "answer": answer})
+
+    async def start(self, port: int) -> str:
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/api/captcha", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", port)
+        await site.start()
+        self.url = f"http://127.0.0.1:{port}/api/captcha"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+
+# ---------------------------------------------------------------------------
+# Stand-in database
+# ---------------------------------------------------------------------------
+
+class FakeConnection:
+    """The subset of asyncpg.Connection used on the verification path"""
+
+    def __init__(self, latency_ms: float = 1.0) -> None:
+        self.latency = latency_ms / 1000
+        self.panels: dict[int, dict] = {}
+        self.copied_records = 0
+        self.queries = 0
+
+    async def _roundtrip(self) -> None:
+        self.queries += 1
+        await asyncio.sleep(self.latency)
+
+    async def fetchrow(self, query: str, *args):
+        await self._roundtrip()
+        return self.panels.get(args[0])
+
+    async def fetch(self, query: str, *args):
+        await self._roundtrip()
+        return list(self.panels.values())
+
+    async def execute(self, query: str, *args) -> str:
+        await self._roundtrip()
+        return "OK"
+
+    async def executemany(self, query: str, args) -> None:
+        await self._roundtrip()
+
+    async def copy_records_to_table(self, table: str, *, records, columns=None) -> str:
+        await self._roundtrip()
+        self.copied_records += len(records)
+        return f"COPY {len(records)}"
+
+    async def close(self) -> None:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Fake Discord
+# ---------------------------------------------------------------------------
+
+# Discord drops an interaction whose first response arrives later than this
+INITIAL_RESPONSE_SECONDS = 3.0
+
+
+class UnknownInteraction(Exception):
+    """What discord.py raises (NotFound, code 10062) for a response past the deadline"""
+
+
+class FakeResponse:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.created_at = time.monotonic()
+        self._done = False
+        self.responded_at: Optional[float] = None
+        self.deferred = False
+        self.message: Optional[str] = None
+        self.view = None
+        self.modal = None
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _respond(self) -> None:
+        if self._done:
+            raise RuntimeError("interaction has already been responded to")
+        await asyncio.sleep(self.latency)
+        if time.monotonic() - self.created_at > INITIAL_RESPONSE_SECONDS:
+            raise UnknownInteraction("first response after the 3s deadline")
+        self._done = True
+        self.responded_at = time.monotonic()
+
+    async def send_message(self, content=None, *, embed=None, file=None, view=None, ephemeral=False, **kwargs):
+        if file is not None:
+            # Drain the upload like discord.py would
+            file.fp.read()
+        await self._respond()
+        self.message = content
+        self.view = view
+
+    async def send_modal(self, modal) -> None:
+        await self._respond()
+        self.modal = modal
+
+    async def defer(self, **kwargs) -> None:
+        await self._respond()
+        self.deferred = True
+
+
+class FakeFollowup:
+    """Followup messages land on the response, so callers read the answer in one place"""
+
+    def __init__(self, response: FakeResponse) -> None:
+        self.response = response
+
+    async def send(self, content=None, *, embed=None, file=None, view=None, ephemeral=False, **kwargs):
+        if not self.response.deferred:
+            raise RuntimeError("followup sent without a deferred response")
+        if file is not None:
+            file.fp.read()
+        await asyncio.sleep(self.response.latency)
+        self.response.message = content
+        self.response.view = view
+
+
+class FakeMember:
+    def __init__(self, user_id: int, guild, role_latency: float) -> None:
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.guild = guild
+        self.roles = []
+        self._role_latency = role_latency
+
+    async def add_roles(self, *roles, reason=None) -> None:
+        await asyncio.sleep(self._role_latency)
+        self.roles.extend(roles)
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, role_id: int) -> None:
+        self.id = guild_id
+        self.name = f"guild {guild_id}"
+        self._role = SimpleNamespace(id=role_id, name="verified")
+
+    def get_role(self, role_id: int):
+        return self._role if role_id == self._role.id else None
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.cogs: dict[str, object] = {}
+        self.user = SimpleNamespace(id=1, name="AuthShield")
+        self.supervisor = Supervisor()
+
+    def get_cog(self, name: str):
+        return self.cogs.get(name)
+
+    def add_view(self, view, *, message_id=None) -> None:
+        pass
+
+
+class FakeInteraction:
+    def __init__(self, client: FakeClient, guild: FakeGuild, user: FakeMember, latency: float) -> None:
+        self.client = client
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.response = FakeResponse(latency)
+        self.followup = FakeFollowup(self.response)
+        self.data = {}
+
+
+# ---------------------------------------------------------------------------
+# Harness
+# ---------------------------------------------------------------------------
+
+class Environment:
+    """Wires the real cogs to the stand-ins"""
+
+    def __init__(self, args, api: Optional[FakeCaptchaAPI] = None) -> None:
+        self.args = args
+        # Environments standing in for several processes can share one API
+        self._owns_api = api is None
+        self.api = api or FakeCaptchaAPI(args.api_latency_ms, args.api_jitter_ms, args.api_error_rate, args.image_bytes)
+        self.conn = FakeConnection(args.db_latency_ms)
+        self.client = FakeClient()
+        self.guilds: list[FakeGuild] = []
+        self.views = []
+        self._user_ids = iter(range(10**17, 10**18))
+
+    async def start(self) -> None:
+        os.environ["CAPTCHA_API_URL"] = await self.api.start(self.args.api_port) if self._owns_api else self.api.url
+
+        import aiohttp
+        from src.panel import authpanel
+        from src.panel.audit import AuditLog
+        from src.panel.authpanel_stats import AuthStats
+
+        # The module reads CAPTCHA_API_URL at import time
+        authpanel.API_BASE_URL = os.environ["CAPTCHA_API_URL"]
+
+        auth = authpanel.Auth(self.client)
+        auth._session = aiohttp.ClientSession()
+        auth.conn = self.conn
+        audit = AuditLog(self.client)
+        audit.conn = self.conn
+        self.client.supervisor.start("audit.flush", audit._flush_loop, owner=audit)
+        stats = AuthStats(self.client)
+        stats.conn = self.conn
+        self.client.cogs.update({"Auth": auth, "AuditLog": audit, "AuthStats": stats})
+
+        for g in range(self.args.guilds):
+            guild_id = 10**17 + g
+            message_id = 2 * 10**17 + g
+            role_id = 3 * 10**17 + g
+            difficulty = g % 10 + 1
+            self.guilds.append(FakeGuild(guild_id, role_id))
+            row = {"message_id": message_id, "guild_id": guild_id, "channel_id": 4 * 10**17 + g,
+                   "role_id": role_id, "difficulty": difficulty}
+            self.conn.panels[message_id] = row
+            info = authpanel.PanelInfo(**row)
+            auth.panels.put(info)
+            auth._register_view(info)
+            self.views.append(auth._views[message_id])
+
+    async def stop(self) -> None:
+        auth = self.client.cogs["Auth"]
+        audit = self.client.cogs["AuditLog"]
+        await self.client.supervisor.shutdown()
+        await audit.flush()
+        await auth._session.close()
+        if self._owns_api:
+            await self.api.stop()
+
+    def interaction(self, guild: FakeGuild, user: Optional[FakeMember] = None) -> FakeInteraction:
+        if user is None:
+            user = FakeMember(next(self._user_ids), guild, self.args.discord_latency_ms / 1000)
+        return FakeInteraction(self.client, guild, user, self.args.discord_latency_ms / 1000)
+
+
+class Results:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.completed = 0
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def report(self, elapsed: float) -> str:
+        attempts = self.completed + sum(self.errors.values())
+        lines = [
+            f"elapsed {elapsed:.1f}s, {self.completed} verifications completed "
+            f"({self.completed / elapsed:.1f}/s), {attempts} attempted",
+        ]
+        for kind, count in sorted(self.errors.items()):
+            lines.append(f"  error {kind:<20}{count:>8} ({count / max(attempts, 1):.2%})")
+        lines.append(f"{'stage':<12}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+        for stage in STAGES:
+            samples = sorted(self.latencies.get(stage, ()))
+            if not samples:
+                continue
+            q = statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+            lines.append(
+                f"{stage:<12}{q[49] * 1000:>8.1f}ms{q[94] * 1000:>8.1f}ms{q[98] * 1000:>8.1f}ms"
+                f"{samples[-1] * 1000:>8.1f}ms"
+            )
+        return "\n".join(lines)
+
+
+async def verify_once(env: Environment, results: Results, guild_index: int,
+                      answer_correctly: bool = True, think_time: float = 0.0) -> dict:
+    """Run one full verification and return the per-stage durations (seconds)"""
+    guild = env.guilds[guild_index]
+    view = env.views[guild_index]
+    durations: dict[str, float] = {}
+    started = time.perf_counter()
+
+    click = env.interaction(guild)
+    stage_start = time.perf_counter()
+    await view.auth_button_callback(click)
+    durations["click"] = time.perf_counter() - stage_start
+    # Time to the first response (a defer counts), which Discord caps at 3s
+    if click.response.responded_at is not None:
+        durations["click_ack"] = click.response.responded_at - click.response.created_at
+    modal_view = click.response.view
+    if modal_view is None:
+        results.errors["challenge_refused"] += 1
+        return durations
+
+    open_modal = env.interaction(guild, click.user)
+    stage_start = time.perf_counter()
+    await modal_view.modal_button_callback(open_modal)
+    durations["open_modal"] = time.perf_counter() - stage_start
+    modal = open_modal.response.modal
+
+    if think_time:
+        await asyncio.sleep(think_time)
+    modal.answer_input._value = modal.answer if answer_correctly else "wrong"
+    submit = env.interaction(guild, click.user)
+    stage_start = time.perf_counter()
+    await modal.on_submit(submit)
+    durations["submit"] = time.perf_counter() - stage_start
+    durations["total"] = time.perf_counter() - started
+
+    for stage, seconds in durations.items():
+        results.latencies[stage].append(seconds)
+    results.completed += 1
+    return durations
+
+
+async def worker(env: Environment, results: Results, deadline: float) -> None:
+    while time.monotonic() < deadline:
+        try:
+            await verify_once(env, results, random.randrange(len(env.guilds)),
+                              answer_correctly=random.random() >= env.args.fail_rate)
+        except Exception as e:
+            results.errors[type(e).__name__] += 1
+
+
+async def run(args) -> None:
+    env = Environment(args)
+    await env.start()
+    results = Results()
+
+    gc.collect()
+    tracemalloc.start()
+    memory_start = tracemalloc.get_traced_memory()[0]
+    started = time.monotonic()
+    deadline = started + args.duration
+
+    async def progress() -> None:
+        while True:
+            await asyncio.sleep(args.report_interval)
+            current = tracemalloc.get_traced_memory()[0]
+            print(f"[{time.monotonic() - started:>6.0f}s] completed {results.completed}, "
+                  f"errors {sum(results.errors.values())}, memory +{(current - memory_start) / 1024:.0f}KiB")
+
+    reporter = asyncio.create_task(progress())
+    await asyncio.gather(*(worker(env, results, deadline) for _ in range(args.concurrency)))
+    reporter.cancel()
+    elapsed = time.monotonic() - started
+
+    await env.stop()
+    gc.collect()
+    memory_end = tracemalloc.get_traced_memory()[0]
+
+    print(results.report(elapsed))
+    print(f"memory growth {(memory_end - memory_start) / 1024:.0f}KiB "
+          f"({(memory_end - memory_start) / max(results.completed, 1):.1f}B per verification)")
+    print(f"api requests {env.api.requests}, db queries {env.conn.queries}, "
+          f"audit records copied {env.conn.copied_records}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--guilds", type=int, default=10)
+    parser.add_argument("--fail-rate", type=float, default=0.1, help="share of wrong answers")
+    parser.add_argument("--api-port", type=int, default=18080)
+    parser.add_argument("--api-latency-ms", type=float, default=80.0)
+    parser.add_argument("--api-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--image-bytes", type=int, default=24 * 1024)
+    parser.add_argument("--db-latency-ms", type=float, default=1.0)
+    parser.add_argument("--discord-latency-ms", type=float, default=40.0)
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    return parser
+
+
+if __name__ == "__main__":
+    asyncio.run(run(build_parser().parse_args()))
@@ -0,0 +1,116 @@
+"""Resident memory per guild and per member under each cache policy.
+
+Builds a discord.py ConnectionState for each policy in bot.py and feeds it
+synthetic GUILD_CREATE payloads (roles, channels and members shaped like a
+real gateway payload). Memory is measured with tracemalloc in a fresh
+interpreter per policy.
+
+    python bench/member_cache.py --guilds 20 --members 2000
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def load_presets() -> dict:
+    """CACHE_POLICY_PRESETS from bot.py, without its startup output"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        from bot import CACHE_POLICY_PRESETS
+    return CACHE_POLICY_PRESETS
+
+
+POLICIES = load_presets()
+
+
+def guild_payload(guild_index: int, members: int) -> dict:
+    guild_id = 10**17 + guild_index * 10**6
+    return {
+        "id": str(guild_id), "name": f"guild {guild_index}", "icon": None, "owner_id": str(guild_id + 1),
+        "afk_timeout": 300, "verification_level": 1, "default_message_notifications": 0,
+        "explicit_content_filter": 0, "features": [], "mfa_level": 0, "system_channel_flags": 0,
+        "premium_tier": 0, "preferred_locale": "ja", "nsfw_level": 0, "member_count": members,
+        "large": members > 250, "unavailable": False,
+        "roles": [
+            {"id": str(guild_id + r), "name": f"role {r}", "color": 0, "hoist": False, "position": r,
+             "permissions": "0", "managed": False, "mentionable": False}
+            for r in range(20)
+        ],
+        "channels": [
+            {"id": str(guild_id + 100 + c), "type": 0, "name": f"channel-{c}", "position": c,
+             "permission_overwrites": [], "nsfw": False, "parent_id": None}
+            for c in range(30)
+        ],
+        "members": [
+            {"user": {"id": str(guild_id + 1000 + m), "username": f"member{m}", "global_name": f"Member {m}",
+                      "avatar": None, "discriminator": "0", "public_flags": 0},
+             "roles": [str(guild_id + (m % 20))], "joined_at": "2024-01-01T00:00:00+00:00",
+             "deaf": False, "mute": False, "flags": 0, "pending": False}
+            for m in range(members)
+        ],
+        "voice_states": [], "presences": [], "emojis": [], "stickers": [], "threads": [],
+        "stage_instances": [], "guild_scheduled_events": [],
+    }
+
+
+def worker(policy: str, guilds: int, members: int) -> None:
+    import discord
+    from discord.state import ConnectionState
+
+    preset = POLICIES[policy]
+    intents = discord.Intents.default()
+    intents.members = preset["members"]
+    intents.message_content = preset["message_content"]
+    flags = (discord.MemberCacheFlags.from_intents(intents) if preset["member_cache"] == "all"
+             else discord.MemberCacheFlags.none())
+
+    state = ConnectionState(
+        dispatch=lambda *args, **kwargs: None, handlers={}, hooks={}, http=None,
+        intents=intents, member_cache_flags=flags, chunk_guilds_at_startup=False,
+    )
+    payloads = [guild_payload(i, members) for i in range(guilds)]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for payload in payloads:
+        state._add_guild_from_data(payload)
+    after = tracemalloc.get_traced_memory()[0]
+
+    cached = sum(len(guild.members) for guild in state.guilds)
+    print(json.dumps({"policy": policy, "bytes": after - before, "cached_members": cached}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--members", type=int, default=2000, help="members per guild")
+    parser.add_argument("--worker", choices=POLICIES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.guilds, args.members)
+        return
+
+    total_members = args.guilds * args.members
+    print(f"{args.guilds} guilds x {args.members} members")
+    print(f"{'policy':<8}{'cached members':>16}{'KiB / guild':>14}{'bytes / member':>16}")
+    for policy in POLICIES:
+        result = subprocess.run(
+            [sys.executable, __file__, "--worker", policy,
+             "--guilds", str(args.guilds), "--members", str(args.members)],
+            capture_output=True, text=True, check=True
+        )
+        data = json.loads(result.stdout)
+        print(f"{policy:<8}{data['cached_members']:>16}{data['bytes'] / args.guilds / 1024:>14.1f}"
+              f"{data['bytes'] / total_members:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
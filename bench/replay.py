@@ -0,0 +1,203 @@
+"""Replays captured production traffic against the real cogs.
+
+Reads trace files written with TRACE_CAPTURE_DIR set (src/lib/tracecapture.py)
+and replays every captured verification through the loadtest stand-ins
+(real Auth, AuditLog and AuthStats cogs, local CAPTCHA API, in-memory
+database, synthetic interactions). Each verification follows its recorded
+timing: the click, the modal opening after the user read the challenge and
+the submission. It is replayed in the recorded guild with the recorded
+difficulty and outcome. Verifications that were abandoned stop at the same
+step.
+
+    python bench/replay.py /var/lib/authshield/traces
+    python bench/replay.py traces/ --skip 3600 --duration 900 --speed 4   # that raid, 4x as fast
+
+--speed divides every delay (between verifications and within one), so values
+above 1 replay the same traffic shape at a higher rate. The report compares
+replayed latency per step with the latency that was recorded. Command traces
+are counted but not replayed.
+"""
+import asyncio
+import statistics
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+from loadtest import Environment, Results, build_parser
+
+from src.lib.tracecapture import read_traces
+
+# Captured op -> loadtest stage
+STEPS = {"auth.click": "click", "auth.open_modal": "open_modal", "auth.submit": "submit"}
+
+
+class Flow:
+    """One captured verification: the click and, if they happened, the modal and the submission"""
+
+    __slots__ = ("guild", "click", "open_modal", "submit", "passed", "difficulty")
+
+    def __init__(self, record: dict) -> None:
+        self.guild = record["guild"]
+        self.click = record["t"]
+        self.open_modal: Optional[float] = None
+        self.submit: Optional[float] = None
+        self.passed = True
+        self.difficulty = record["tags"].get("difficulty")
+
+
+def load_flows(args) -> tuple[list[Flow], dict[str, list[float]], Counter]:
+    flows: list[Flow] = []
+    recorded: dict[str, list[float]] = defaultdict(list)
+    skipped: Counter = Counter()
+    # Latest click of each (pseudonymous) user, which their next modal and submit belong to
+    open_flows: dict[str, Flow] = {}
+    start = end = None
+
+    for record in sorted(read_traces(args.paths), key=lambda record: record["t"]):
+        if start is None:
+            start = record["t"] + args.skip
+            end = start + args.duration if args.duration else None
+        if record["t"] < start or (end is not None and record["t"] >= end):
+            continue
+        step = STEPS.get(record["op"])
+        if step is None:
+            skipped[record["op"]] += 1
+            continue
+        recorded[step].append(record["ms"] / 1000)
+        if step == "click":
+            # Refused clicks (e.g. while draining) never produced a challenge
+            if not record["tags"].get("draining") and not record["error"]:
+                flow = open_flows[record["user"]] = Flow(record)
+                flows.append(flow)
+            continue
+        flow = open_flows.get(record["user"])
+        if flow is None:
+            skipped[f"{record['op']} without click"] += 1
+        elif step == "open_modal":
+            flow.open_modal = record["t"]
+        else:
+            flow.submit = record["t"]
+            flow.passed = record["tags"].get("passed", True)
+            del open_flows[record["user"]]
+    return flows, recorded, skipped
+
+
+async def sleep_until(deadline: float) -> None:
+    delay = deadline - time.monotonic()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+async def replay_flow(env: Environment, results: Results, flow: Flow, guild_index: int,
+                      origin: float, replay_start: float, speed: float) -> None:
+    def at(timestamp: float) -> float:
+        return replay_start + (timestamp - origin) / speed
+
+    guild = env.guilds[guild_index]
+    click = env.interaction(guild)
+    stage_start = time.perf_counter()
+    await env.views[guild_index].auth_button_callback(click)
+    results.latencies["click"].append(time.perf_counter() - stage_start)
+    modal_view = click.response.view
+    if modal_view is None:
+        results.errors["challenge_refused"] += 1
+        return
+    if flow.open_modal is None:
+        results.errors["abandoned (as recorded)"] += 1
+        return
+
+    await sleep_until(at(flow.open_modal))
+    open_modal = env.interaction(guild, click.user)
+    stage_start = time.perf_counter()
+    await modal_view.modal_button_callback(open_modal)
+    results.latencies["open_modal"].append(time.perf_counter() - stage_start)
+    if flow.submit is None:
+        results.errors["abandoned (as recorded)"] += 1
+        return
+
+    await sleep_until(at(flow.submit))
+    modal = open_modal.response.modal
+    modal.answer_input._value = modal.answer if flow.passed else "wrong"
+    submit = env.interaction(guild, click.user)
+    stage_start = time.perf_counter()
+    await modal.on_submit(submit)
+    results.latencies["submit"].append(time.perf_counter() - stage_start)
+    results.completed += 1
+
+
+def configure_guilds(env: Environment, flows: list[Flow], guild_indexes: dict[str, int]) -> None:
+    """Give each replayed guild the difficulty it had when captured"""
+    from src.panel import authpanel
+
+    auth = env.client.cogs["Auth"]
+    for flow in flows:
+        if flow.difficulty is None:
+            continue
+        view = env.views[guild_indexes[flow.guild]]
+        row = env.conn.panels[view.message_id]
+        row["difficulty"] = view.difficulty = flow.difficulty
+        auth.panels.put(authpanel.PanelInfo(**row))
+
+
+def percentiles(samples: list[float]) -> str:
+    if not samples:
+        return f"{'-':>10}{'-':>10}{'-':>10}"
+    samples = sorted(samples)
+    q = statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+    return f"{q[49] * 1000:>8.1f}ms{q[94] * 1000:>8.1f}ms{q[98] * 1000:>8.1f}ms"
+
+
+async def run(args) -> None:
+    flows, recorded, skipped = load_flows(args)
+    if not flows:
+        raise SystemExit("No verifications in the selected traces")
+    guild_indexes = {guild: index for index, guild in enumerate(dict.fromkeys(flow.guild for flow in flows))}
+    args.guilds = len(guild_indexes)
+    origin = flows[0].click
+    span = (flows[-1].click - origin) / args.speed
+    print(f"replaying {len(flows)} verifications in {args.guilds} guilds over {span:.0f}s (speed x{args.speed:g})")
+
+    env = Environment(args)
+    await env.start()
+    configure_guilds(env, flows, guild_indexes)
+    results = Results()
+    tasks = set()
+    replay_start = time.monotonic()
+
+    async def guarded(flow: Flow) -> None:
+        try:
+            await replay_flow(env, results, flow, guild_indexes[flow.guild], origin, replay_start, args.speed)
+        except Exception as e:
+            results.errors[type(e).__name__] += 1
+
+    for flow in flows:
+        await sleep_until(replay_start + (flow.click - origin) / args.speed)
+        task = asyncio.create_task(guarded(flow))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - replay_start
+    await env.stop()
+
+    print(results.report(elapsed))
+    print(f"{'step':<12}{'recorded p50':>12}{'p95':>10}{'p99':>10}   {'replayed p50':>12}{'p95':>10}{'p99':>10}")
+    for step in STEPS.values():
+        print(f"{step:<12}{percentiles(recorded[step]):>32}   {percentiles(results.latencies[step]):>32}")
+    for op, count in sorted(skipped.items()):
+        print(f"  not replayed: {op} x{count}")
+    print(f"api requests {env.api.requests}, db queries {env.conn.queries}")
+
+
+def build_replay_parser():
+    parser = build_parser()
+    parser.description = __doc__
+    parser.add_argument("paths", nargs="+", help="trace files or capture directories")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression factor")
+    parser.add_argument("--skip", type=float, default=0.0, help="seconds of the capture to skip")
+    # --duration (from loadtest) limits the replayed part of the capture; 0 replays all of it
+    parser.set_defaults(duration=0.0)
+    return parser
+
+
+if __name__ == "__main__":
+    asyncio.run(run(build_replay_parser().parse_args()))
@@ -0,0 +1,197 @@
+"""Verification gap while a shard process is restarted.
+
+Two loadtest Environments (real Auth, AuditLog and AuthStats cogs) stand in
+for the old and new process of the same shard and share the stand-in CAPTCHA
+API. Users verify continuously, taking --think-time seconds to answer each
+challenge. At --restart-at the process is replaced using one of these modes:
+
+* hard     the old process exits at once (bot.run and SIGTERM, as before drain
+           mode). The new one answers after --startup-seconds.
+* drain    SIGTERM drain: the old process refuses new clicks with a message and
+           exits once issued challenges are answered. The new one starts at
+           the same time.
+* rolling  the new process is started first. Once it is ready, the old one
+           drains with DRAIN_HANDOFF and leaves new clicks to it (it still
+           answers them itself while it has not seen the successor).
+
+rolling relies on how Discord dispatches interactions to two sessions of one
+shard; see Cluster for the assumption and what breaks if it does not hold.
+
+    python bench/restart_gap.py --users 50 --duration 40 --restart-at 15
+
+For each mode the report shows completed verifications, clicks nobody
+answered, clicks that were refused, challenges lost in flight, and the
+longest gap between two completed verifications.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from loadtest import Environment, FakeCaptchaAPI, build_parser
+
+MODES = ("hard", "drain", "rolling")
+RETRY_SECONDS = 1.0
+
+
+class Process:
+    def __init__(self, args, api: FakeCaptchaAPI) -> None:
+        self.env = Environment(args, api)
+        # connected: receives new interactions; alive: can still answer its own challenges
+        self.connected = False
+        self.alive = True
+
+    @property
+    def auth(self):
+        return self.env.client.cogs["Auth"]
+
+    async def boot(self, startup_seconds: float) -> None:
+        await self.env.start()
+        # Time until the gateway is connected and persistent views are registered
+        await asyncio.sleep(startup_seconds)
+        self.connected = True
+
+    async def kill(self) -> None:
+        self.connected = self.alive = False
+        await self.env.stop()
+
+    async def drain(self, timeout: float) -> None:
+        await self.auth.drain(timeout)
+        self.connected = self.alive = False
+        await self.env.stop()
+
+
+class Outcome:
+    def __init__(self) -> None:
+        self.completions: list[float] = []
+        self.unanswered = 0
+        self.refused = 0
+        self.lost = 0
+
+
+class Cluster:
+    """Delivers each click to every connected process, like duplicate gateway sessions of one shard.
+
+    The first response wins; a process that is ready answers faster than one that is shutting down.
+
+    This is an assumption about Discord, not something the bench can observe:
+    that while two sessions identify for the same shard, each interaction is
+    dispatched to both and only the first response is accepted. If Discord
+    routes an interaction to one session only (for example the newest), a
+    click the old process leaves to its successor is lost whenever it was
+    dispatched to the old session, and the rolling numbers are optimistic.
+    """
+
+    def __init__(self) -> None:
+        self.processes: list[Process] = []
+
+    async def click(self, guild_index: int):
+        for process in reversed(self.processes):
+            if not process.connected:
+                continue
+            interaction = process.env.interaction(process.env.guilds[guild_index])
+            await process.env.views[guild_index].auth_button_callback(interaction)
+            if interaction.response.is_done():
+                return process, interaction
+        return None, None
+
+
+async def user(cluster: Cluster, outcome: Outcome, args, deadline: float) -> None:
+    while time.monotonic() < deadline:
+        guild_index = random.randrange(args.guilds)
+        process, click = await cluster.click(guild_index)
+        if process is None:
+            outcome.unanswered += 1
+            await asyncio.sleep(RETRY_SECONDS)
+            continue
+        modal_view = click.response.view
+        if modal_view is None:
+            outcome.refused += 1
+            await asyncio.sleep(RETRY_SECONDS)
+            continue
+
+        await asyncio.sleep(random.uniform(0.5, 1.5) * args.think_time)
+        if not process.alive:
+            outcome.lost += 1
+            continue
+        open_modal = process.env.interaction(process.env.guilds[guild_index], click.user)
+        await modal_view.modal_button_callback(open_modal)
+        modal = open_modal.response.modal
+        modal.answer_input._value = modal.answer
+        if not process.alive:
+            outcome.lost += 1
+            continue
+        submit = process.env.interaction(process.env.guilds[guild_index], click.user)
+        await modal.on_submit(submit)
+        outcome.completions.append(time.monotonic())
+
+
+async def run_mode(mode: str, args, api: FakeCaptchaAPI) -> str:
+    from src.panel import authpanel
+
+    authpanel.DRAIN_HANDOFF = mode == "rolling"
+    cluster = Cluster()
+    old = Process(args, api)
+    cluster.processes.append(old)
+    await old.boot(0)
+
+    outcome = Outcome()
+    started = time.monotonic()
+    deadline = started + args.duration
+    users = [asyncio.create_task(user(cluster, outcome, args, deadline)) for _ in range(args.users)]
+
+    await asyncio.sleep(args.restart_at)
+    restart = time.monotonic()
+    new = Process(args, api)
+    cluster.processes.append(new)
+
+    # Stands in for the shard_instances heartbeat query: the successor is live once it is connected
+    async def successor_live() -> bool:
+        return new.connected
+    old.auth._check_successor = successor_live
+    if mode == "hard":
+        await old.kill()
+        await new.boot(args.startup_seconds)
+    elif mode == "drain":
+        await asyncio.gather(old.drain(args.drain_timeout), new.boot(args.startup_seconds))
+    else:
+        await new.boot(args.startup_seconds)
+        await old.drain(args.drain_timeout)
+
+    await asyncio.gather(*users)
+    await new.env.stop()
+
+    gaps = [b - a for a, b in zip(outcome.completions, outcome.completions[1:]) if b >= restart]
+    before = sum(1 for t in outcome.completions if t < restart) / (restart - started)
+    return (
+        f"{mode:<8} {len(outcome.completions):>9} {before:>8.1f}/s {outcome.unanswered:>10} "
+        f"{outcome.refused:>8} {outcome.lost:>6} {max(gaps, default=0.0) * 1000:>9.0f}ms"
+    )
+
+
+async def main(args) -> None:
+    api = FakeCaptchaAPI(args.api_latency_ms, args.api_jitter_ms, args.api_error_rate, args.image_bytes)
+    await api.start(args.api_port)
+    try:
+        print(f"{'mode':<8} {'completed':>9} {'before':>10} {'unanswered':>10} {'refused':>8} {'lost':>6} {'max gap':>11}")
+        for mode in args.modes:
+            print(await run_mode(mode, args, api))
+    finally:
+        await api.stop()
+
+
+def build_restart_parser() -> argparse.ArgumentParser:
+    parser = build_parser()
+    parser.description = __doc__
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--restart-at", type=float, default=15.0, help="seconds after the start")
+    parser.add_argument("--startup-seconds", type=float, default=8.0, help="time until a new process answers")
+    parser.add_argument("--think-time", type=float, default=4.0, help="mean seconds to answer a challenge")
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.set_defaults(duration=40.0)
+    return parser
+
+
+if __name__ == "__main__":
+    asyncio.run(main(build_restart_parser().parse_args()))
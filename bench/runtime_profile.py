@@ -0,0 +1,130 @@
+"""Compare CPU time per 1k interactions between the standard and fast runtime profiles.
+
+Each profile runs in its own interpreter (the event loop policy can only be
+chosen once per process). One synthetic interaction decodes an
+INTERACTION_CREATE gateway frame, decodes a CAPTCHA API payload the way
+fetch_captcha does, and hops through the event loop a few times the way a
+button click, a CAPTCHA fetch and the reply do.
+
+discord.py decodes gateway frames with orjson whenever it is installed, so
+both profiles decode frames the same way; only the event loop and the
+CAPTCHA payload decoding differ.
+
+    python bench/runtime_profile.py --interactions 5000
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROFILES = ("standard", "fast")
+IMAGE_BYTES = 24 * 1024
+LOOP_HOPS = 6
+
+
+def _gateway_frame(i: int) -> bytes:
+    member = {
+        "user": {"id": str(10**17 + i), "username": f"user{i}", "global_name": None, "avatar": None,
+                 "discriminator": "0", "public_flags": 0},
+        "roles": [str(10**17 + r) for r in range(5)], "joined_at": "2024-01-01T00:00:00+00:00",
+        "deaf": False, "mute": False, "flags": 0, "pending": False, "permissions": "2248473465835073",
+    }
+    payload = {
+        "op": 0, "s": i, "t": "INTERACTION_CREATE",
+        "d": {
+            "id": str(10**18 + i), "application_id": "1356227161832427671", "type": 3,
+            "guild_id": "1234567890123456789", "channel_id": "1234567890123456790",
+            "member": member, "token": "x" * 180, "version": 1, "locale": "ja",
+            "data": {"custom_id": "persistent_auth_button_1234567890123456791", "component_type": 2},
+            "message": {"id": "1234567890123456791", "embeds": [{"title": "Authentication Panel"}],
+                        "components": [{"type": 1, "components": [{"type": 2, "custom_id": "x"}]}]},
+        },
+    }
+    return json.dumps(payload).encode()
+
+
+def _captcha_payload() -> bytes:
+    image = base64.b64encode(os.urandom(IMAGE_BYTES)).decode()
+    return json.dumps({"image": f"data:image/png;base64,{image}", "answer": "abc123"}).encode()
+
+
+def worker(profile: str, interactions: int) -> None:
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+        print("orjson not installed", file=sys.stderr)
+    # Same choice as discord.utils._from_json, independent of the profile
+    frame_loads = orjson.loads if orjson is not None else json.loads
+    loads = json.loads
+    if profile == "fast":
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            print("uvloop not installed", file=sys.stderr)
+        if orjson is not None:
+            loads = orjson.loads
+
+    frames = [_gateway_frame(i) for i in range(100)]
+    captcha = _captcha_payload()
+
+    def decode_captcha_standard(body: bytes) -> bytes:
+        data = json.loads(body.decode())
+        return base64.b64decode(data["image"].split(",")[1])
+
+    def decode_captcha_fast(body: bytes) -> bytes:
+        data = loads(body)
+        image = data["image"]
+        return binascii.a2b_base64(image[image.index(",") + 1:])
+
+    decode_captcha = decode_captcha_fast if profile == "fast" else decode_captcha_standard
+
+    async def interaction(i: int) -> None:
+        frame_loads(frames[i % len(frames)])
+        for _ in range(LOOP_HOPS // 2):
+            await asyncio.sleep(0)
+        decode_captcha(captcha)
+        for _ in range(LOOP_HOPS // 2):
+            await asyncio.sleep(0)
+
+    async def run() -> float:
+        start = time.process_time()
+        for batch in range(0, interactions, 100):
+            await asyncio.gather(*(interaction(i) for i in range(batch, min(batch + 100, interactions))))
+        return time.process_time() - start
+
+    cpu = asyncio.run(run())
+    print(json.dumps({"profile": profile, "cpu_seconds": cpu, "interactions": interactions}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interactions", type=int, default=5000)
+    parser.add_argument("--worker", choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.interactions)
+        return
+
+    print(f"{'profile':<12}{'CPU ms / 1k interactions':>28}")
+    for profile in PROFILES:
+        result = subprocess.run(
+            [sys.executable, __file__, "--worker", profile, "--interactions", str(args.interactions)],
+            capture_output=True, text=True, check=True
+        )
+        data = json.loads(result.stdout)
+        per_1k = data["cpu_seconds"] / data["interactions"] * 1000 * 1000
+        print(f"{profile:<12}{per_1k:>26.1f}ms")
+        if result.stderr:
+            print(f"  ({result.stderr.strip()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,338 @@
-import discord
-from discord.ext import commands
+import time
+
+# 起動時間計測の基準点（他のimportより先に取得する）
+_BOOT_STARTED = time.perf_counter()
+
+import asyncio
+import json
 import os
+import signal
 import sys
+from contextlib import contextmanager
 from dotenv import load_dotenv
-import asyncio
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+
+
+class StartupProfiler:
+    """起動処理の各フェーズ（import / load_extension / cog_load）の所要時間を記録する"""
+
+    def __init__(self, started: float) -> None:
+        self.started = started
+        self.imports: dict[str, float] = {}
+        self.extensions: dict[str, float] = {}
+        self.cogs: dict[str, float] = {}
+        self.marks: dict[str, float] = {}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def timed_import(self, name: str):
+        start = time.perf_counter()
+        yield
+        self.imports[name] = time.perf_counter() - start
+
+    def mark(self, name: str) -> None:
+        if name not in self.marks:
+            self.marks[name] = self.elapsed()
+
+    def to_dict(self) -> dict:
+        return {
+            "imports": self.imports,
+            "extensions": self.extensions,
+            "cogs": self.cogs,
+            "marks": self.marks,
+        }
+
+    def report(self) -> str:
+        lines = ["起動プロファイル:"]
+        for title, timings in (("import", self.imports), ("load_extension", self.extensions), ("cog_load", self.cogs)):
+            for name, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+                lines.append(f"  {title:<15}{seconds * 1000:>9.1f}ms  {name}")
+        for name, seconds in self.marks.items():
+            lines.append(f"  {'mark':<15}{seconds * 1000:>9.1f}ms  {name}")
+        return "\n".join(lines)
+
+    def dump(self) -> None:
+        path = os.getenv("STARTUP_PROFILE_PATH")
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, indent=2)
+
+
+profiler = StartupProfiler(_BOOT_STARTED)
+
+# 重い依存関係はimport時間を個別に記録する
+with profiler.timed_import("discord"):
+    import discord
+    from discord.ext import commands
+with profiler.timed_import("watchdog"):
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
 
 # 現在のディレクトリをPythonパスに追加
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # .envファイルから環境変数をロード
+# （src配下のモジュールはimport時に設定を読むため、それらのimportより先に行う）
 load_dotenv()
 
+from src.lib import tracing
+from src.lib.supervisor import Supervisor
+
 TOKEN = os.getenv('DISCORD_TOKEN')
 
 # シャーディング設定（.envファイルから読み込み）
 SHARD_ID = os.getenv('SHARD_ID')
 SHARD_COUNT = os.getenv('SHARD_COUNT')
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
+# SIGTERM/SIGINT受信後、発行済みの認証が回答されるのを待つ最大秒数
+DRAIN_TIMEOUT_SECONDS = float(os.getenv('DRAIN_TIMEOUT_SECONDS', 60))
+# 2回目のシグナル後、終了処理にかける最大秒数（超えたらプロセスを強制終了する）
+FORCE_CLOSE_TIMEOUT_SECONDS = float(os.getenv('FORCE_CLOSE_TIMEOUT_SECONDS', 10))
+
+# 実行プロファイル（fast: uvloopと、CAPTCHA APIの応答のorjsonデコードを利用可能なら使用する）
+RUNTIME_PROFILE = os.getenv('RUNTIME_PROFILE', 'standard')
+
+
+def apply_runtime_profile(profile: str) -> list[str]:
+    """プロファイルに応じて高速化ライブラリを有効化し、有効になったものを返す"""
+    enabled = []
+    if profile != 'fast':
+        return enabled
+
+    try:
+        import uvloop
+    except ImportError:
+        print("警告: uvloopがインストールされていません。標準のイベントループを使用します。")
+    else:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        enabled.append('uvloop')
+
+    # discord.pyはorjsonがインストールされていればプロファイルに関係なく使用する
+    # （CAPTCHA APIの応答はfastプロファイルの場合のみorjsonでデコードする）
+    if discord.utils.HAS_ORJSON:
+        enabled.append('orjson')
+    else:
+        print("警告: orjsonがインストールされていません。標準のjsonを使用します。")
+    return enabled
+
+
+with profiler.timed_import("runtime_profile"):
+    _enabled = apply_runtime_profile(RUNTIME_PROFILE)
+print(f"実行プロファイル: {RUNTIME_PROFILE} ({', '.join(_enabled) or '標準ライブラリ'})")
+
+# キャッシュポリシー（full: 全メンバーをキャッシュ / slim: 認証に必要な情報のみ）
+CACHE_POLICY = os.getenv('CACHE_POLICY', 'full')
+
+CACHE_POLICY_PRESETS = {
+    # 従来の動作: 全メンバーをキャッシュし、起動時にチャンクする
+    'full': {'members': True, 'message_content': True, 'member_cache': 'all', 'chunk': True},
+    # 認証フローはインタラクションに含まれるメンバー情報だけで動作する。
+    # 参加イベントのためにmembersインテントは維持するが、メンバーはキャッシュしない。
+    # message_contentが無効なため、ギルド内のプレフィックスコマンド（as!memdiag, as!tasks,
+    # as!test_sentry）は反応しない。DMで実行するか、INTENT_MESSAGE_CONTENT=1で有効にする
+    'slim': {'members': True, 'message_content': False, 'member_cache': 'none', 'chunk': False},
+}
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def build_member_cache_flags(member_cache: str, intents: discord.Intents):
+    """MEMBER_CACHEの値からMemberCacheFlagsを作る。不明なフラグ名が含まれる場合はNoneを返す"""
+    if member_cache == 'all':
+        return discord.MemberCacheFlags.from_intents(intents)
+    if member_cache == 'none':
+        return discord.MemberCacheFlags.none()
+    names = [name.strip() for name in member_cache.split(',') if name.strip()]
+    if not names or any(name not in discord.MemberCacheFlags.VALID_FLAGS for name in names):
+        return None
+    return discord.MemberCacheFlags(**{name: True for name in names})
+
+
+def build_cache_policy(policy: str):
+    """プリセットと環境変数の上書きからインテント・メンバーキャッシュ・チャンク設定を組み立てる"""
+    preset = CACHE_POLICY_PRESETS.get(policy)
+    if preset is None:
+        print(f"警告: 不明なCACHE_POLICY '{policy}' です。fullを使用します。")
+        preset = CACHE_POLICY_PRESETS['full']
+
+    intents = discord.Intents.default()
+    intents.members = _env_flag('INTENT_MEMBERS', preset['members'])
+    intents.message_content = _env_flag('INTENT_MESSAGE_CONTENT', preset['message_content'])
+
+    # MEMBER_CACHE: all / none / カンマ区切りのフラグ名（例: joined,voice）
+    member_cache = os.getenv('MEMBER_CACHE', preset['member_cache'])
+    member_cache_flags = build_member_cache_flags(member_cache, intents)
+    if member_cache_flags is None:
+        print(
+            f"警告: MEMBER_CACHE '{member_cache}' に不明なフラグがあります"
+            f"（使用可能: all, none, {', '.join(discord.MemberCacheFlags.VALID_FLAGS)}）。"
+            f"{preset['member_cache']}を使用します。"
+        )
+        member_cache_flags = build_member_cache_flags(preset['member_cache'], intents)
+
+    chunk_guilds = _env_flag('CHUNK_GUILDS_AT_STARTUP', preset['chunk'] and intents.members)
+    return intents, member_cache_flags, chunk_guilds
+
+
+intents, member_cache_flags, chunk_guilds_at_startup = build_cache_policy(CACHE_POLICY)
+print(
+    f"キャッシュポリシー: {CACHE_POLICY} (members={intents.members}, "
+    f"message_content={intents.message_content}, member_cache={member_cache_flags.value}, "
+    f"chunk={chunk_guilds_at_startup})"
+)
+class TracedCommandTree(discord.app_commands.CommandTree):
+    """スラッシュコマンドごとにトレースを作成する
+
+    コマンドの実行全体を囲める公開フックがないため、非公開の_callを上書きしている。
+    requirements.txtでdiscord.pyのバージョンを固定し、
+    tests/test_command_tree.pyで_callが残っていることを確認する
+    """
+
+    async def _call(self, interaction) -> None:
+        name = interaction.data.get('name', 'unknown') if interaction.data else 'unknown'
+        with tracing.transaction('command', f'/{name}'):
+            tracing.set_actor(interaction.guild_id, interaction.user.id)
+            await super()._call(interaction)
+
+
+BOT_OPTIONS = {
+    'command_prefix': "as!",
+    'tree_cls': TracedCommandTree,
+    'intents': intents,
+    'member_cache_flags': member_cache_flags,
+    'chunk_guilds_at_startup': chunk_guilds_at_startup,
+}
+
+
+# src/lib はコグではない共通モジュール（マイグレーション等）を置く場所
+LIB_DIR = os.path.join('.', 'src', 'lib')
+
+
+def iter_extensions():
+    """src以下のコグ（拡張機能）のモジュール名を列挙する"""
+    for root, _, files in os.walk('./src'):
+        if os.path.normpath(root).startswith(os.path.normpath(LIB_DIR)):
+            continue
+        for file in files:
+            if file.endswith('.py'):
+                relative_path = os.path.relpath(root, './src').replace(os.sep, '.')
+                yield f'src.{relative_path}.{file[:-3]}' if relative_path != '.' else f'src.{file[:-3]}'
+
+
+class AuthShieldBot(commands.Bot):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # バックグラウンドタスクはすべてsupervisor経由で起動する
+        self.supervisor = Supervisor()
+        # ホットリロードは同時に1つずつ行う
+        self.supervisor.set_group_limit('cog_reload', 1)
+        self.draining = False
+        self._drain_task = None
+        self._force_closing = False
+
+    async def add_cog(self, cog, /, **kwargs) -> None:
+        # add_cogの所要時間はほぼcog_loadの時間
+        start = time.perf_counter()
+        await super().add_cog(cog, **kwargs)
+        profiler.cogs[cog.qualified_name] = time.perf_counter() - start
+
+    async def remove_cog(self, name, /, **kwargs):
+        # cog_unloadより先に、そのコグが起動したタスクを止める
+        cog = self.get_cog(name)
+        if cog is not None:
+            await self.supervisor.cancel_owner(cog)
+        return await super().remove_cog(name, **kwargs)
+
+    async def close(self) -> None:
+        await super().close()
+        await self.supervisor.shutdown()
+
+    async def drain(self) -> None:
+        """新しい認証の受付を止め、処理中の認証が終わってから終了する"""
+        self.draining = True
+        print("ドレインを開始します（新しい認証の受付を停止）")
+        auth = self.get_cog('Auth')
+        if auth:
+            await auth.drain(DRAIN_TIMEOUT_SECONDS)
+        # 各コグのcog_unloadで監査ログと統計をフラッシュし、セッションとDB接続を閉じる
+        await self.close()
+        print("ドレイン完了、終了します")
+
+    async def force_close(self) -> None:
+        """ドレインを待たずに終了する。終了処理が時間内に終わらなければプロセスを終了する"""
+        try:
+            await asyncio.wait_for(self.close(), FORCE_CLOSE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"{FORCE_CLOSE_TIMEOUT_SECONDS:.0f}秒以内に終了できなかったため、プロセスを終了します")
+            os._exit(1)
+
+    def handle_signal(self, sig: signal.Signals) -> None:
+        if self._force_closing:
+            # 3回目のシグナルでは終了処理も待たない
+            print(f"{sig.name}を再度受信しました。プロセスを終了します")
+            os._exit(1)
+        if self.draining:
+            # 2回目のシグナルではドレインを中止して終了する
+            print(f"{sig.name}を再度受信しました。ドレインを中止して終了します")
+            self._force_closing = True
+            if self._drain_task is not None:
+                self._drain_task.cancel()
+            self.supervisor.spawn('force_close', self.force_close(), owner='bot')
+            return
+        print(f"{sig.name}を受信しました")
+        self.draining = True
+        self._drain_task = self.supervisor.spawn('drain', self.drain(), owner='bot')
+
+    async def invoke(self, ctx) -> None:
+        # プレフィックスコマンドもトレースする
+        with tracing.transaction('command', f'as!{ctx.command}'):
+            tracing.set_actor(ctx.guild.id if ctx.guild else None, ctx.author.id)
+            tracing.add_size('message', len(ctx.message.content))
+            await super().invoke(ctx)
+
+    async def _timed_load_extension(self, module_name: str) -> None:
+        start = time.perf_counter()
+        await self.load_extension(module_name)
+        profiler.extensions[module_name] = time.perf_counter() - start
+
+    async def setup_hook(self) -> None:
+        # ゲートウェイ接続前にコグを並列にロードし、永続Viewを登録しておく
+        await asyncio.gather(*(self._timed_load_extension(name) for name in iter_extensions()))
+        profiler.mark("extensions_loaded")
+        print("All cogs loaded!")
+
+        # コマンド同期は応答開始を待たせないようにバックグラウンドで行う
+        self.supervisor.spawn('commands.sync', self._sync_commands(), owner='bot')
+
+    async def _sync_commands(self) -> None:
+        await self.tree.sync()
+        profiler.mark("commands_synced")
+        print("Commands synced!")
+
 
 # シャーディングの設定
 if SHARD_ID is not None and SHARD_COUNT is not None:
     try:
         shard_id = int(SHARD_ID)
         shard_count = int(SHARD_COUNT)
-        bot = commands.Bot(
-            command_prefix="as!", 
-            intents=intents,
+        bot = AuthShieldBot(
+            **BOT_OPTIONS,
             shard_id=shard_id,
             shard_count=shard_count
         )
         print(f"シャーディングモードで実行: シャードID {shard_id}/{shard_count}")
     except ValueError:
         print("警告: SHARD_IDまたはSHARD_COUNTの値が不正です。通常モードで実行します。")
-        bot = commands.Bot(command_prefix="as!", intents=intents)
+        bot = AuthShieldBot(**BOT_OPTIONS)
 else:
     # シャーディング設定がない場合は通常のBotインスタンスを作成
-    bot = commands.Bot(command_prefix="as!", intents=intents)
+    bot = AuthShieldBot(**BOT_OPTIONS)
 
 class CogReloader(FileSystemEventHandler):
     def __init__(self, bot):
@@ -49,6 +341,9 @@ class CogReloader(FileSystemEventHandler):
         self.pending_reloads = set()
 
     def on_modified(self, event):
+        # 共通モジュールは拡張機能ではないためリロード対象外
+        if os.path.normpath(event.src_path).startswith(os.path.normpath(LIB_DIR)):
+            return
         if event.src_path.endswith('.py'):
             rel_path = os.path.relpath(event.src_path, './src')
             rel_path = os.path.splitext(rel_path)[0]
@@ -57,7 +352,9 @@ class CogReloader(FileSystemEventHandler):
                 return
             self.pending_reloads.add(module_name)
             self.loop.call_soon_threadsafe(
-                lambda: asyncio.create_task(self._reload_and_clear(module_name))
+                lambda: self.bot.supervisor.spawn(
+                    'cog_reload', self._reload_and_clear(module_name), owner='bot', group='cog_reload'
+                )
             )
 
     async def _reload_and_clear(self, module_name):
@@ -79,36 +376,52 @@ class CogReloader(FileSystemEventHandler):
 async def on_ready():
     print(f'Logged in as {bot.user}')
 
-    # コグ（拡張機能）を並列にロード
-    tasks = []
-    for root, _, files in os.walk('./src'):
-        for file in files:
-            if file.endswith('.py'):
-                relative_path = os.path.relpath(root, './src').replace(os.sep, '.')
-                module_name = f'src.{relative_path}.{file[:-3]}' if relative_path != '.' else f'src.{file[:-3]}'
-                tasks.append(bot.load_extension(module_name))
-    await asyncio.gather(*tasks)
-    await bot.tree.sync()
-    print("All cogs loaded and commands synced!")
-    
+    # on_readyは再接続のたびに呼ばれるため、初回のみ初期化する
+    if "ready" in profiler.marks:
+        return
+    profiler.mark("ready")
+    print(profiler.report())
+    profiler.dump()
+
     # watchdogの設定と起動（非同期タスクとして実行）
     event_handler = CogReloader(bot)
     observer = Observer()
     observer.schedule(event_handler, path='./src', recursive=True)
     observer.start()
     print("Watchdogを起動しました。srcディレクトリを監視中...")
-    
+
     # ステータス自動更新タスクを開始
     async def update_status():
-        while True:
-            await bot.change_presence(
-                activity=discord.Game(
-                    name=f"{len(bot.guilds)}Server || {round(bot.latency * 1000)}ms || {bot.shard_count}shards"
-                )
+        await bot.change_presence(
+            activity=discord.Game(
+                name=f"{len(bot.guilds)}Server || {round(bot.latency * 1000)}ms || {bot.shard_count}shards"
             )
-            await asyncio.sleep(30)
-    
-    asyncio.create_task(update_status())
+        )
+
+    bot.supervisor.every('presence', 30, update_status, owner='bot', initial_delay=0)
     print("定期タスクを開始しました")
 
-bot.run(TOKEN)
\ No newline at end of file
+@bot.listen()
+async def on_interaction(interaction):
+    # 起動後に最初のインタラクションを処理するまでの時間を記録
+    if "first_interaction" not in profiler.marks:
+        profiler.mark("first_interaction")
+        print(f"最初のインタラクションまで: {profiler.marks['first_interaction'] * 1000:.1f}ms")
+        profiler.dump()
+
+async def main():
+    # bot.runの代わりに自前でループを回し、シグナルでドレインできるようにする
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, bot.handle_signal, sig)
+        except NotImplementedError:
+            # Windowsではシグナルハンドラを登録できない（Ctrl+CはKeyboardInterruptになる）
+            pass
+    async with bot:
+        await bot.start(TOKEN)
+
+
+if __name__ == '__main__':
+    discord.utils.setup_logging()
+    asyncio.run(main())
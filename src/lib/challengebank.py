@@ -0,0 +1,371 @@
+"""Persistent bank of pre-rendered challenges, served straight from an mmap.
+
+Two files live in the bank directory:
+
+* challenges.dat - append-only records, each the answer followed by the image
+* challenges.idx - fixed-width entries (see INDEX_FORMAT), one per record
+
+A bank belongs to one process at a time: open() takes an exclusive flock on
+challenges.lock (not on the index, which compaction replaces) and raises
+BankLocked if another process holds it.
+
+Served challenges are marked consumed in place in the index. compact()
+rewrites only the live records to new files, and refill can be done offline:
+
+    python -m src.lib.challengebank refill --count 100 --difficulty 1-10
+    python -m src.lib.challengebank stats
+
+All mutating methods must be called from a single thread (the event loop);
+build_compacted() is the only part that is safe to run in a worker thread.
+"""
+import argparse
+import asyncio
+import fcntl
+import hashlib
+import io
+import logging
+import mmap
+import os
+import struct
+import time
+from collections import defaultdict
+from typing import Final, NamedTuple, Optional
+
+DATA_FILE: Final[str] = "challenges.dat"
+INDEX_FILE: Final[str] = "challenges.idx"
+LOCK_FILE: Final[str] = "challenges.lock"
+# One bank per shard: shards never share served-state, and a drain successor of the same shard waits its turn
+DEFAULT_DIRECTORY: Final[str] = os.path.join("challenge_bank", f"shard-{os.getenv('SHARD_ID', '0')}")
+
+# offset, record length, answer length, difficulty, flags, answer hash, expires_at (unix time)
+INDEX_FORMAT: Final[struct.Struct] = struct.Struct("<QIBBB3x16sd")
+FLAGS_OFFSET: Final[int] = 14
+FLAG_CONSUMED: Final[int] = 0x01
+
+logger = logging.getLogger(__name__)
+
+
+class BankLocked(RuntimeError):
+    """The bank directory is open in another process"""
+
+
+def _answer_hash(answer: bytes) -> bytes:
+    return hashlib.blake2b(answer, digest_size=16).digest()
+
+
+class IndexEntry(NamedTuple):
+    slot: int
+    offset: int
+    length: int
+    answer_len: int
+    difficulty: int
+    flags: int
+    answer_hash: bytes
+    expires_at: float
+
+
+class BankedChallenge(NamedTuple):
+    image: memoryview
+    answer: str
+    difficulty: int
+
+
+class MemoryviewReader(io.RawIOBase):
+    """Read-only file object over a memoryview, so discord.File can upload it without a bytes copy"""
+
+    def __init__(self, view: memoryview) -> None:
+        super().__init__()
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), len(self._view) - self._pos)
+        buffer[:size] = self._view[self._pos:self._pos + size]
+        self._pos += size
+        return size
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._pos + size)
+        data = self._view[self._pos:end].tobytes()
+        self._pos = end
+        return data
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, min(offset, len(self._view)))
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+class ChallengeBank:
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._data_path = os.path.join(directory, DATA_FILE)
+        self._index_path = os.path.join(directory, INDEX_FILE)
+        self._lock_path = os.path.join(directory, LOCK_FILE)
+        self._lock_fd: Optional[int] = None
+        self._data_file = None
+        self._index_fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        self._data_size = 0
+        self._slots = 0
+        self._entries: dict[int, IndexEntry] = {}
+        # difficulty -> slots of live challenges, newest last
+        self._available: dict[int, list[int]] = defaultdict(list)
+        self.served = 0
+        self.compacting = False
+
+    def open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock()
+        self._open_files()
+
+    def _lock(self) -> None:
+        if self._lock_fd is not None:
+            return
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise BankLocked(f"challenge bank {self.directory} is in use by another process") from None
+        self._lock_fd = fd
+
+    def _open_files(self) -> None:
+        self._data_file = open(self._data_path, "a+b")
+        self._index_fd = os.open(self._index_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._data_size = os.fstat(self._data_file.fileno()).st_size
+
+        with open(self._index_path, "rb") as f:
+            raw = f.read()
+        self._slots = len(raw) // INDEX_FORMAT.size
+        now = time.time()
+        for slot in range(self._slots):
+            entry = IndexEntry(slot, *INDEX_FORMAT.unpack_from(raw, slot * INDEX_FORMAT.size))
+            if entry.offset + entry.length > self._data_size:
+                # Torn append: the index entry was written but the data was not
+                continue
+            self._entries[slot] = entry
+            if not entry.flags & FLAG_CONSUMED and entry.expires_at > now:
+                self._available[entry.difficulty].append(slot)
+        self._remap()
+
+    def close(self) -> None:
+        self._close_files()
+        if self._lock_fd is not None:
+            # Closing the descriptor releases the flock
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _close_files(self) -> None:
+        # The mmap itself is left to the garbage collector: images handed out as memoryviews may still be in use
+        self._map = None
+        if self._data_file:
+            self._data_file.close()
+            self._data_file = None
+        if self._index_fd is not None:
+            os.close(self._index_fd)
+            self._index_fd = None
+
+    def _remap(self) -> None:
+        if self._data_size:
+            self._map = mmap.mmap(self._data_file.fileno(), self._data_size, access=mmap.ACCESS_READ)
+
+    def add(self, difficulty: int, answer: str, image: bytes, ttl_seconds: float) -> None:
+        answer_bytes = answer.encode("utf-8")
+        offset = self._data_size
+        self._data_file.write(answer_bytes)
+        self._data_file.write(image)
+        self._data_file.flush()
+        self._data_size += len(answer_bytes) + len(image)
+
+        entry = IndexEntry(
+            self._slots, offset, len(answer_bytes) + len(image), len(answer_bytes), difficulty, 0,
+            _answer_hash(answer_bytes), time.time() + ttl_seconds
+        )
+        os.pwrite(self._index_fd, INDEX_FORMAT.pack(*entry[1:]), self._slots * INDEX_FORMAT.size)
+        self._slots += 1
+        self._entries[entry.slot] = entry
+        self._available[difficulty].append(entry.slot)
+
+    def take(self, difficulty: int) -> Optional[BankedChallenge]:
+        """Serve one unexpired challenge of this difficulty and mark it consumed"""
+        slots = self._available.get(difficulty)
+        now = time.time()
+        while slots:
+            entry = self._entries[slots.pop()]
+            if entry.expires_at <= now:
+                continue
+            self._mark_consumed(entry)
+            if self._map is None or entry.offset + entry.length > len(self._map):
+                self._remap()
+            view = memoryview(self._map)[entry.offset:entry.offset + entry.length]
+            answer = view[:entry.answer_len]
+            if _answer_hash(answer) != entry.answer_hash:
+                logger.error("Challenge bank entry %d is corrupt, skipping", entry.slot)
+                continue
+            self.served += 1
+            return BankedChallenge(view[entry.answer_len:], answer.tobytes().decode("utf-8"), difficulty)
+        return None
+
+    def _mark_consumed(self, entry: IndexEntry) -> None:
+        entry = entry._replace(flags=entry.flags | FLAG_CONSUMED)
+        self._entries[entry.slot] = entry
+        os.pwrite(self._index_fd, bytes([entry.flags]), entry.slot * INDEX_FORMAT.size + FLAGS_OFFSET)
+
+    @property
+    def data_size(self) -> int:
+        """Bytes in the data file, live and dead records alike"""
+        return self._data_size
+
+    def available(self) -> dict[int, int]:
+        return {difficulty: len(slots) for difficulty, slots in self._available.items() if slots}
+
+    def dead_ratio(self) -> float:
+        """Share of the data file taken up by consumed or expired challenges"""
+        if not self._data_size:
+            return 0.0
+        live = sum(self._entries[slot].length for slots in self._available.values() for slot in slots)
+        return 1.0 - live / self._data_size
+
+    # -- compaction ---------------------------------------------------------
+
+    def snapshot(self) -> tuple[list[IndexEntry], Optional[mmap.mmap]]:
+        self._remap()
+        now = time.time()
+        live = [self._entries[slot] for slots in self._available.values() for slot in slots]
+        return [entry for entry in live if entry.expires_at > now], self._map
+
+    def build_compacted(self, live: list[IndexEntry], source: Optional[mmap.mmap]) -> dict[int, IndexEntry]:
+        """Write live records to temporary files; returns old slot -> new entry. Thread-safe."""
+        mapping = {}
+        with open(self._data_path + ".tmp", "wb") as data, open(self._index_path + ".tmp", "wb") as index:
+            offset = 0
+            for new_slot, entry in enumerate(live):
+                data.write(source[entry.offset:entry.offset + entry.length])
+                new_entry = entry._replace(slot=new_slot, offset=offset, flags=0)
+                index.write(INDEX_FORMAT.pack(*new_entry[1:]))
+                mapping[entry.slot] = new_entry
+                offset += entry.length
+            data.flush()
+            os.fsync(data.fileno())
+            index.flush()
+            os.fsync(index.fileno())
+        return mapping
+
+    def finish_compaction(self, mapping: dict[int, IndexEntry]) -> None:
+        """Swap in the compacted files, keeping changes made since snapshot()"""
+        live_now = {slot for slots in self._available.values() for slot in slots}
+        # Challenges added while compacting are not in the new files yet
+        added = [self._entries[slot] for slot in live_now if slot not in mapping]
+        consumed = [new.slot for old, new in mapping.items() if old not in live_now]
+        self._remap()
+        old_map = self._map
+
+        # The lock stays held across the swap
+        self._close_files()
+        os.replace(self._data_path + ".tmp", self._data_path)
+        os.replace(self._index_path + ".tmp", self._index_path)
+        self._entries.clear()
+        self._available.clear()
+        self._open_files()
+
+        for slot in consumed:
+            if slot in self._entries:
+                self._mark_consumed(self._entries[slot])
+                self._available[self._entries[slot].difficulty].remove(slot)
+        for entry in added:
+            record = old_map[entry.offset:entry.offset + entry.length]
+            answer = record[:entry.answer_len].decode("utf-8")
+            self.add(entry.difficulty, answer, record[entry.answer_len:], entry.expires_at - time.time())
+
+    async def compact(self) -> None:
+        if self.compacting:
+            return
+        self.compacting = True
+        try:
+            await self._compact()
+        finally:
+            self.compacting = False
+
+    async def _compact(self) -> None:
+        live, source = self.snapshot()
+        before = self._data_size
+        mapping = await asyncio.to_thread(self.build_compacted, live, source)
+        self.finish_compaction(mapping)
+        logger.info("Compacted challenge bank: %d -> %d bytes, %d live challenges", before, self._data_size, len(mapping))
+
+
+async def refill(directory: str, difficulties: list[int], count: int, ttl_seconds: float) -> None:
+    """Offline refill: top up each difficulty to `count` challenges (run while the bot is stopped)"""
+    import aiohttp
+    from src.panel.authpanel import request_captcha
+
+    bank = ChallengeBank(directory)
+    bank.open()
+    try:
+        async with aiohttp.ClientSession() as session:
+            for difficulty in difficulties:
+                missing = count - bank.available().get(difficulty, 0)
+                for _ in range(max(0, missing)):
+                    image, answer, error = await request_captcha(session, difficulty)
+                    if error:
+                        print(f"difficulty {difficulty}: {error}")
+                        break
+                    bank.add(difficulty, answer, image, ttl_seconds)
+                print(f"difficulty {difficulty}: {bank.available().get(difficulty, 0)} available")
+        if bank.dead_ratio() > 0.5:
+            await bank.compact()
+    finally:
+        bank.close()
+
+
+def _parse_range(value: str) -> list[int]:
+    if "-" in value:
+        low, high = value.split("-", 1)
+        return list(range(int(low), int(high) + 1))
+    return [int(part) for part in value.split(",")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage the on-disk challenge bank")
+    parser.add_argument("command", choices=("refill", "compact", "stats"))
+    parser.add_argument("--dir", default=os.getenv("CHALLENGE_BANK_DIR", DEFAULT_DIRECTORY))
+    parser.add_argument("--difficulty", default="1-10", help="e.g. 1-10 or 1,3,5")
+    parser.add_argument("--count", type=int, default=100, help="target challenges per difficulty")
+    parser.add_argument("--ttl-hours", type=float, default=float(os.getenv("CHALLENGE_BANK_TTL_HOURS", 24)))
+    args = parser.parse_args()
+
+    try:
+        if args.command == "refill":
+            asyncio.run(refill(args.dir, _parse_range(args.difficulty), args.count, args.ttl_hours * 3600))
+        else:
+            _manage(args.dir, args.command)
+    except BankLocked as e:
+        parser.exit(1, f"{e}; stop that bot process first\n")
+
+
+def _manage(directory: str, command: str) -> None:
+    bank = ChallengeBank(directory)
+    bank.open()
+    try:
+        if command == "compact":
+            asyncio.run(bank.compact())
+        print(f"available: {bank.available()}")
+        print(f"data size: {bank.data_size} bytes, dead ratio: {bank.dead_ratio():.1%}")
+    finally:
+        bank.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Fair sharing of a limited resource (CAPTCHA API, role grants, a DB connection) between guilds.
+
+Work is admitted through `async with scheduler.slot(guild_id):`. Each guild has
+its own FIFO queue; when a slot frees up the next job is chosen by deficit
+round robin over the guilds that are waiting, so a guild flooding its queue
+only lengthens its own wait. A global cap bounds total concurrency and a
+per-guild cap keeps one guild from holding every slot.
+
+Queue wait times are recorded per guild in a fixed-bucket histogram, and as a
+"queue.<name>" stage of the current trace.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Final, NamedTuple, Optional
+
+from src.lib import histogram, tracing
+
+# Queue wait buckets (ms) for src.lib.histogram
+WAIT_BUCKETS_MS: Final[tuple] = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUANTUM: Final[float] = 1.0
+
+
+class WaitStats:
+    __slots__ = ("count", "queued", "total_seconds", "max_seconds", "hist")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.queued = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.hist = histogram.new_histogram(WAIT_BUCKETS_MS)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        histogram.observe(WAIT_BUCKETS_MS, self.hist, seconds * 1000)
+
+    def quantile(self, q: float) -> Optional[int]:
+        """Wait quantile in ms, as a bucket upper bound"""
+        return histogram.quantile(WAIT_BUCKETS_MS, self.hist, q)
+
+
+class _Waiter(NamedTuple):
+    future: asyncio.Future
+    cost: float
+    enqueued_at: float
+
+
+class FairScheduler:
+    def __init__(self, name: str, concurrency: int, per_guild: int) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.per_guild = per_guild
+        self._running = 0
+        self._active: dict[int, int] = {}
+        self._queues: dict[int, deque[_Waiter]] = {}
+        # Guilds with queued work, in round-robin order
+        self._ring: deque[int] = deque()
+        self._deficit: dict[int, float] = {}
+        self._weights: dict[int, float] = {}
+        self.waits: dict[int, WaitStats] = {}
+        self.total = WaitStats()
+
+    def set_weight(self, guild_id: int, weight: float) -> None:
+        """Relative share of a guild when guilds compete (default 1.0)"""
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        self._weights[guild_id] = weight
+
+    def _can_start(self, guild_id: int) -> bool:
+        return self._running < self.concurrency and self._active.get(guild_id, 0) < self.per_guild
+
+    def _start(self, guild_id: int) -> None:
+        self._running += 1
+        self._active[guild_id] = self._active.get(guild_id, 0) + 1
+
+    def _release(self, guild_id: int) -> None:
+        self._running -= 1
+        remaining = self._active[guild_id] - 1
+        if remaining:
+            self._active[guild_id] = remaining
+        else:
+            del self._active[guild_id]
+        self._dispatch()
+
+    def _record_wait(self, guild_id: int, seconds: float) -> None:
+        stats = self.waits.get(guild_id)
+        if stats is None:
+            stats = self.waits[guild_id] = WaitStats()
+        stats.observe(seconds)
+        self.total.observe(seconds)
+
+    def _dispatch(self) -> None:
+        idle_visits = 0
+        while self._ring and self._running < self.concurrency and idle_visits < len(self._ring):
+            guild_id = self._ring[0]
+            queue = self._queues[guild_id]
+            if not self._can_start(guild_id):
+                # At its per-guild cap; it keeps its deficit for the next round
+                self._ring.rotate(-1)
+                idle_visits += 1
+                continue
+
+            deficit = self._deficit.get(guild_id, 0.0) + QUANTUM * self._weights.get(guild_id, 1.0)
+            granted = False
+            while queue and deficit >= queue[0].cost and self._can_start(guild_id):
+                waiter = queue.popleft()
+                deficit -= waiter.cost
+                self._start(guild_id)
+                waiter.future.set_result(None)
+                granted = True
+
+            if queue:
+                self._deficit[guild_id] = deficit
+                self._ring.rotate(-1)
+            else:
+                # An emptied queue does not bank its deficit
+                self._ring.popleft()
+                del self._queues[guild_id]
+                self._deficit.pop(guild_id, None)
+            # Only guilds at their cap count as idle: a guild short of deficit gains a quantum per
+            # visit and is granted eventually, even when it is alone in the ring with a weight below 1
+            if granted:
+                idle_visits = 0
+
+    @asynccontextmanager
+    async def slot(self, guild_id: int, cost: float = 1.0) -> AsyncIterator[None]:
+        if guild_id not in self._queues and self._can_start(guild_id):
+            self._start(guild_id)
+            self._record_wait(guild_id, 0.0)
+        else:
+            waiter = _Waiter(asyncio.get_running_loop().create_future(), cost, time.monotonic())
+            queue = self._queues.get(guild_id)
+            if queue is None:
+                queue = self._queues[guild_id] = deque()
+                self._ring.append(guild_id)
+            queue.append(waiter)
+            self.waits.setdefault(guild_id, WaitStats()).queued += 1
+            self._dispatch()
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # Granted just as we were cancelled: hand the slot on
+                    self._release(guild_id)
+                elif waiter in queue:
+                    queue.remove(waiter)
+                    if not queue and self._queues.get(guild_id) is queue:
+                        del self._queues[guild_id]
+                        self._ring.remove(guild_id)
+                        self._deficit.pop(guild_id, None)
+                raise
+            waited = time.monotonic() - waiter.enqueued_at
+            self._record_wait(guild_id, waited)
+            tracing.add_stage(f"queue.{self.name}", waited)
+        try:
+            yield
+        finally:
+            self._release(guild_id)
+
+    def would_wait(self, guild_id: int) -> bool:
+        """Whether slot(guild_id) would queue if entered now"""
+        return guild_id in self._queues or not self._can_start(guild_id)
+
+    def queued(self, guild_id: Optional[int] = None) -> int:
+        if guild_id is not None:
+            return len(self._queues.get(guild_id, ()))
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "running": self._running,
+            "queued": self.queued(),
+            "waiting_guilds": len(self._queues),
+            "wait_p50_ms": self.total.quantile(0.5),
+            "wait_p95_ms": self.total.quantile(0.95),
+            "wait_max_ms": self.total.max_seconds * 1000,
+        }
+
+    def slowest_guilds(self, limit: int = 5) -> list[tuple[int, WaitStats]]:
+        return sorted(self.waits.items(), key=lambda item: item[1].max_seconds, reverse=True)[:limit]
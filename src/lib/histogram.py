@@ -0,0 +1,27 @@
+"""Fixed-bucket histograms kept as plain lists of counts.
+
+`bounds` are the bucket upper bounds in ascending order; the counts list has
+one more entry, for the open-ended bucket above the last bound. Plain lists
+keep per-panel aggregates small and are stored as-is in BIGINT[] columns.
+"""
+import bisect
+from typing import Optional, Sequence
+
+
+def new_histogram(bounds: Sequence[float]) -> list[int]:
+    return [0] * (len(bounds) + 1)
+
+
+def observe(bounds: Sequence[float], counts: list[int], value: float) -> None:
+    counts[bisect.bisect_left(bounds, value)] += 1
+
+
+def quantile(bounds: Sequence[float], counts: Sequence[int], q: float) -> Optional[float]:
+    """Upper bound of the bucket containing the q-quantile (None for the open bucket, or no samples)"""
+    target = q * sum(counts)
+    cumulative = 0
+    for i, count in enumerate(counts):
+        cumulative += count
+        if count and cumulative >= target:
+            return bounds[i] if i < len(bounds) else None
+    return None
@@ -0,0 +1,123 @@
+"""Re-encodes CAPTCHA images to a byte budget before they are uploaded.
+
+Images are downscaled to CAPTCHA_IMAGE_MAX_WIDTH, palette-quantized and saved
+as optimised PNG; if the result is still over CAPTCHA_IMAGE_MAX_BYTES, fewer
+colours and smaller sizes are tried (never below CAPTCHA_IMAGE_MIN_WIDTH, to
+keep the text legible). The work runs in a worker thread.
+
+Only the header is read before deciding: images that are already within
+budget, or larger than CAPTCHA_IMAGE_MAX_INPUT_BYTES / _MAX_INPUT_PIXELS, are
+passed through without being decoded.
+
+Pillow is listed in requirements.txt. If it is missing anyway, a warning is
+logged and images are passed through unchanged, as are images it cannot decode.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from io import BytesIO
+from typing import Final
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+MAX_BYTES: Final[int] = int(os.getenv("CAPTCHA_IMAGE_MAX_BYTES", 30_000))
+MAX_WIDTH: Final[int] = int(os.getenv("CAPTCHA_IMAGE_MAX_WIDTH", 400))
+MIN_WIDTH: Final[int] = int(os.getenv("CAPTCHA_IMAGE_MIN_WIDTH", 240))
+COLORS: Final[int] = int(os.getenv("CAPTCHA_IMAGE_COLORS", 32))
+MIN_COLORS: Final[int] = 8
+# Larger inputs are never decoded (a CAPTCHA is a few hundred pixels wide)
+MAX_INPUT_BYTES: Final[int] = int(os.getenv("CAPTCHA_IMAGE_MAX_INPUT_BYTES", 2 * 1024 * 1024))
+MAX_INPUT_PIXELS: Final[int] = int(os.getenv("CAPTCHA_IMAGE_MAX_INPUT_PIXELS", 4_000_000))
+SHRINK_FACTOR: Final[float] = 0.85
+
+logger = logging.getLogger(__name__)
+
+if Image is None:
+    logger.warning("Pillow is not installed; CAPTCHA images are uploaded without re-encoding")
+
+metrics = {
+    "processed": 0,
+    "passthrough": 0,
+    "oversized": 0,
+    "failed": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "seconds": 0.0,
+}
+# compact() runs in worker threads
+_metrics_lock = threading.Lock()
+
+
+def _count(**deltas: float) -> None:
+    with _metrics_lock:
+        for key, delta in deltas.items():
+            metrics[key] += delta
+
+
+def enabled() -> bool:
+    return Image is not None and MAX_BYTES > 0
+
+
+def _encode(image, width: int, colors: int) -> bytes:
+    if width < image.width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    # FASTOCTREE is the only quantizer that also handles RGBA
+    quantized = image.quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+    out = BytesIO()
+    quantized.save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+def compact(data: bytes) -> bytes:
+    """Smallest acceptable re-encoding of data, or data itself if that is already the smallest"""
+    if not enabled():
+        return data
+    if len(data) > MAX_INPUT_BYTES:
+        _count(oversized=1)
+        return data
+    start = time.perf_counter()
+    try:
+        # open() only parses the header; pixels are decoded by convert()
+        with Image.open(BytesIO(data)) as source:
+            if source.width * source.height > MAX_INPUT_PIXELS:
+                _count(oversized=1)
+                return data
+            if len(data) <= MAX_BYTES and source.width <= MAX_WIDTH:
+                _count(passthrough=1)
+                return data
+            image = source.convert("RGBA" if "A" in source.getbands() else "RGB")
+
+        best = data
+        width = min(image.width, MAX_WIDTH)
+        colors = COLORS
+        while True:
+            encoded = _encode(image, width, colors)
+            if len(encoded) < len(best):
+                best = encoded
+            if len(best) <= MAX_BYTES:
+                break
+            # Drop colours first (cheap on legibility), then size
+            if colors > MIN_COLORS:
+                colors //= 2
+            elif width > MIN_WIDTH:
+                width = max(MIN_WIDTH, int(width * SHRINK_FACTOR))
+            else:
+                break
+    except Exception as e:
+        _count(failed=1)
+        logger.debug("Image could not be re-encoded, sending it unchanged: %s", e)
+        return data
+
+    _count(processed=1, bytes_in=len(data), bytes_out=len(best), seconds=time.perf_counter() - start)
+    return best
+
+
+async def compact_async(data: bytes) -> bytes:
+    if not enabled():
+        return data
+    return await asyncio.to_thread(compact, data)
@@ -0,0 +1,117 @@
+"""Numbered schema migrations, applied at startup under an advisory lock.
+
+Every cog that owns a database connection calls apply_migrations() in its
+_initialize_db. The first caller applies pending versions; the others wait on
+the lock and then find nothing left to do. Migrations are never edited once
+released; schema changes are appended as a new version.
+"""
+import logging
+from typing import Final
+
+import asyncpg
+
+# Arbitrary key for pg_advisory_lock, shared by every AuthShield process
+MIGRATION_LOCK_KEY: Final[int] = 0x4155_5448
+
+MIGRATIONS: Final[tuple] = (
+    (1, "create panels", """
+        CREATE TABLE IF NOT EXISTS panels (
+            message_id BIGINT PRIMARY KEY,
+            channel_id BIGINT NOT NULL,
+            role_id BIGINT NOT NULL,
+            difficulty INTEGER NOT NULL
+        )
+    """),
+    (2, "panel guild_id, timestamps and lookup indexes", """
+        ALTER TABLE panels ADD COLUMN IF NOT EXISTS guild_id BIGINT;
+        ALTER TABLE panels ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
+        ALTER TABLE panels ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+        CREATE INDEX IF NOT EXISTS panels_guild_id_idx ON panels (guild_id, created_at, message_id);
+        CREATE INDEX IF NOT EXISTS panels_channel_id_idx ON panels (channel_id);
+    """),
+    (3, "create auth_attempts", """
+        CREATE TABLE IF NOT EXISTS auth_attempts (
+            attempted_at TIMESTAMPTZ NOT NULL,
+            guild_id BIGINT NOT NULL,
+            panel_id BIGINT NOT NULL,
+            user_id BIGINT NOT NULL,
+            outcome TEXT NOT NULL,
+            solve_ms INTEGER,
+            difficulty SMALLINT NOT NULL
+        ) PARTITION BY RANGE (attempted_at)
+    """),
+    (4, "create panel_stats", """
+        CREATE TABLE IF NOT EXISTS panel_stats (
+            guild_id BIGINT NOT NULL,
+            panel_id BIGINT NOT NULL,
+            attempts BIGINT NOT NULL,
+            passes BIGINT NOT NULL,
+            solve_hist BIGINT[] NOT NULL,
+            difficulty_counts BIGINT[] NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (guild_id, panel_id)
+        )
+    """),
+    (5, "notify panel changes", """
+        CREATE OR REPLACE FUNCTION panels_notify() RETURNS trigger AS $$
+        DECLARE
+            r RECORD;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                r := OLD;
+            ELSE
+                r := NEW;
+            END IF;
+            PERFORM pg_notify('authshield_panels', json_build_object(
+                'op', TG_OP,
+                'message_id', r.message_id,
+                'guild_id', r.guild_id,
+                'channel_id', r.channel_id,
+                'role_id', r.role_id,
+                'difficulty', r.difficulty
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        DROP TRIGGER IF EXISTS panels_notify ON panels;
+        CREATE TRIGGER panels_notify AFTER INSERT OR UPDATE OR DELETE ON panels
+            FOR EACH ROW EXECUTE FUNCTION panels_notify();
+    """),
+    (6, "create shard_instances", """
+        CREATE TABLE IF NOT EXISTS shard_instances (
+            instance_id TEXT PRIMARY KEY,
+            shard_id INTEGER NOT NULL,
+            started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        CREATE INDEX IF NOT EXISTS shard_instances_shard_id_idx ON shard_instances (shard_id, heartbeat_at);
+    """),
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def apply_migrations(conn: asyncpg.Connection) -> None:
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_KEY)
+    try:
+        await conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """
+        )
+        applied = {row["version"] for row in await conn.fetch("SELECT version FROM schema_migrations")}
+        for version, name, sql in MIGRATIONS:
+            if version in applied:
+                continue
+            async with conn.transaction():
+                await conn.execute(sql)
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)", version, name
+                )
+            logger.info("Applied schema migration %d: %s", version, name)
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
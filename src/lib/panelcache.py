@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Final, NamedTuple, Optional
+
+import asyncpg
+
+from src.lib.supervisor import Supervisor
+
+NOTIFY_CHANNEL: Final[str] = "authshield_panels"
+RECONNECT_DELAY_SECONDS: Final[float] = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+class PanelInfo(NamedTuple):
+    message_id: int
+    guild_id: Optional[int]
+    channel_id: int
+    role_id: int
+    difficulty: int
+
+
+class PanelCache:
+    """LRU cache of panel metadata kept coherent across processes with LISTEN/NOTIFY.
+
+    Rows are loaded lazily with the query connection passed to get(). Changes
+    made by any process are pushed by the panels_notify trigger (schema version
+    5) and applied here, so lookups only reach the database for panels that
+    were never seen or have been evicted.
+    """
+
+    def __init__(
+        self,
+        db_config: dict,
+        max_size: int,
+        supervisor: Supervisor,
+        owner: Any = None,
+        on_change: Optional[Callable[[str, PanelInfo], None]] = None
+    ) -> None:
+        self._db_config = db_config
+        self.max_size = max_size
+        self._supervisor = supervisor
+        self._owner = owner
+        self._on_change = on_change
+        # None marks a panel known not to exist
+        self._entries: OrderedDict[int, Optional[PanelInfo]] = OrderedDict()
+        # guild_id -> {message_id: PanelInfo} for the panels currently cached
+        self._by_guild: dict[int, dict[int, PanelInfo]] = {}
+        self._listen_conn: Optional[asyncpg.Connection] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def start(self) -> None:
+        self._closed = False
+        self._listen_conn = await asyncpg.connect(**self._db_config)
+        await self._listen_conn.add_listener(NOTIFY_CHANNEL, self._on_notify)
+        self._listen_conn.add_termination_listener(self._on_terminated)
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._listen_conn:
+            await self._listen_conn.close()
+            self._listen_conn = None
+
+    def _index(self, message_id: int, info: Optional[PanelInfo]) -> None:
+        old = self._entries.get(message_id)
+        if old is not None and old.guild_id in self._by_guild:
+            panels = self._by_guild[old.guild_id]
+            panels.pop(message_id, None)
+            if not panels:
+                del self._by_guild[old.guild_id]
+        if info is not None and info.guild_id is not None:
+            self._by_guild.setdefault(info.guild_id, {})[message_id] = info
+
+    def _store(self, message_id: int, info: Optional[PanelInfo]) -> None:
+        self._index(message_id, info)
+        self._entries[message_id] = info
+        self._entries.move_to_end(message_id)
+        while len(self._entries) > self.max_size:
+            evicted = next(iter(self._entries))
+            self._index(evicted, None)
+            del self._entries[evicted]
+
+    def put(self, info: PanelInfo) -> None:
+        self._store(info.message_id, info)
+
+    def evict(self, message_id: int) -> None:
+        self._index(message_id, None)
+        self._entries.pop(message_id, None)
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._by_guild.clear()
+
+    def __contains__(self, message_id: int) -> bool:
+        """Whether get() would be answered without a query"""
+        return message_id in self._entries
+
+    def guild_panels(self, guild_id: int) -> list[PanelInfo]:
+        """Cached panels of a guild, without touching the database"""
+        return list(self._by_guild.get(guild_id, {}).values())
+
+    async def get(self, message_id: int, conn: asyncpg.Connection) -> Optional[PanelInfo]:
+        if message_id in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(message_id)
+            return self._entries[message_id]
+
+        self.misses += 1
+        row = await conn.fetchrow(
+            "SELECT message_id, guild_id, channel_id, role_id, difficulty FROM panels WHERE message_id = $1",
+            message_id
+        )
+        info = PanelInfo(**dict(row)) if row else None
+        self._store(message_id, info)
+        return info
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+    def _on_notify(self, conn: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+            op = data.pop("op")
+            info = PanelInfo(**data)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error("Invalid panel notification %r: %s", payload, e)
+            return
+
+        self.invalidations += 1
+        self._store(info.message_id, None if op == "DELETE" else info)
+        if self._on_change:
+            self._on_change(op, info)
+
+    def _on_terminated(self, conn: asyncpg.Connection) -> None:
+        if self._closed:
+            return
+        # Notifications may have been missed while disconnected, so start over cold
+        logger.warning("Panel cache listener connection lost; clearing cache and reconnecting")
+        self._clear()
+        self._reconnect_task = self._supervisor.spawn("panelcache.reconnect", self._reconnect(), owner=self._owner)
+
+    async def _reconnect(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+            try:
+                await self.start()
+                self._clear()
+                logger.info("Panel cache listener reconnected")
+                return
+            except Exception as e:
+                logger.error("Panel cache listener reconnect failed: %s", e)
@@ -0,0 +1,263 @@
+"""Owner of every background task the bot runs.
+
+Three kinds of task are supported:
+
+* start()  - a long-running coroutine (an event-driven loop); restarted with
+             exponential backoff if it raises, finished if it returns
+* every()  - a coroutine function called at a fixed interval; a failing
+             iteration is recorded and the next one is delayed with backoff
+* spawn()  - a one-shot coroutine, optionally limited by a concurrency group
+
+Tasks are registered with an owner (usually a cog). AuthShieldBot cancels a
+cog's tasks before the cog is removed, so unloading or reloading a cog never
+leaves its loops running. Metrics are kept per task name.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Coroutine, Final, Optional
+
+BACKOFF_INITIAL_SECONDS: Final[float] = 1.0
+BACKOFF_MAX_SECONDS: Final[float] = 300.0
+# A run that lasted this long resets the backoff of a restarted task
+BACKOFF_RESET_SECONDS: Final[float] = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+class TaskMetrics:
+    __slots__ = (
+        "name", "kind", "owner", "active", "runs", "failures", "restarts",
+        "total_seconds", "last_seconds", "last_error", "last_failure_at", "last_run_at"
+    )
+
+    def __init__(self, name: str, kind: str, owner: str) -> None:
+        self.name = name
+        self.kind = kind
+        self.owner = owner
+        self.active = 0
+        self.runs = 0
+        self.failures = 0
+        self.restarts = 0
+        self.total_seconds = 0.0
+        self.last_seconds = 0.0
+        self.last_error: Optional[str] = None
+        self.last_failure_at: Optional[float] = None
+        self.last_run_at: Optional[float] = None
+
+    def record(self, seconds: float, error: Optional[BaseException] = None) -> None:
+        self.runs += 1
+        self.total_seconds += seconds
+        self.last_seconds = seconds
+        self.last_run_at = time.time()
+        if error is not None:
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+            self.last_failure_at = self.last_run_at
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.runs if self.runs else 0.0
+
+
+def _owner_name(owner: Any) -> str:
+    if owner is None:
+        return "-"
+    if isinstance(owner, str):
+        return owner
+    return getattr(owner, "qualified_name", None) or type(owner).__name__
+
+
+def _backoff(failures: int) -> float:
+    return min(BACKOFF_MAX_SECONDS, BACKOFF_INITIAL_SECONDS * 2 ** max(0, failures - 1))
+
+
+class Supervisor:
+    def __init__(self) -> None:
+        self.metrics: dict[str, TaskMetrics] = {}
+        self._tasks: dict[asyncio.Task, Any] = {}
+        self._groups: dict[str, asyncio.Semaphore] = {}
+        self._group_limits: dict[str, int] = {}
+        self._closed = False
+
+    def set_group_limit(self, group: str, limit: int) -> None:
+        """Bound how many spawn()ed tasks of a group run at once (must be set before first use)"""
+        self._group_limits[group] = limit
+        self._groups[group] = asyncio.Semaphore(limit)
+
+    def _metrics(self, name: str, kind: str, owner: Any) -> TaskMetrics:
+        metrics = self.metrics.get(name)
+        if metrics is None:
+            metrics = self.metrics[name] = TaskMetrics(name, kind, _owner_name(owner))
+        return metrics
+
+    def _track(self, name: str, coro: Coroutine, owner: Any) -> asyncio.Task:
+        if self._closed:
+            coro.close()
+            raise RuntimeError("Supervisor is shut down")
+        task = asyncio.create_task(coro, name=name)
+        self._tasks[task] = owner
+        task.add_done_callback(self._tasks.pop)
+        return task
+
+    def start(
+        self,
+        name: str,
+        factory: Callable[[], Awaitable[None]],
+        *,
+        owner: Any = None,
+        restart: bool = True
+    ) -> asyncio.Task:
+        """Run a long-lived coroutine, restarting it with backoff when it crashes"""
+        return self._track(name, self._run_forever(name, factory, owner, restart), owner)
+
+    async def _run_forever(self, name: str, factory: Callable[[], Awaitable[None]], owner: Any, restart: bool) -> None:
+        metrics = self._metrics(name, "loop", owner)
+        failures = 0
+        while True:
+            metrics.active += 1
+            start = time.monotonic()
+            try:
+                await factory()
+            except asyncio.CancelledError:
+                metrics.record(time.monotonic() - start)
+                raise
+            except Exception as e:
+                elapsed = time.monotonic() - start
+                metrics.record(elapsed, e)
+                failures = 1 if elapsed >= BACKOFF_RESET_SECONDS else failures + 1
+                if not restart:
+                    logger.error("Task %s crashed: %s", name, e, exc_info=True)
+                    return
+                logger.error("Task %s crashed, restarting in %.0fs: %s", name, _backoff(failures), e, exc_info=True)
+            else:
+                metrics.record(time.monotonic() - start)
+                return
+            finally:
+                metrics.active -= 1
+            metrics.restarts += 1
+            await asyncio.sleep(_backoff(failures))
+
+    def every(
+        self,
+        name: str,
+        interval: float,
+        func: Callable[[], Awaitable[None]],
+        *,
+        owner: Any = None,
+        initial_delay: Optional[float] = None
+    ) -> asyncio.Task:
+        """Call func every `interval` seconds (after `initial_delay`, default one interval)"""
+        return self._track(name, self._run_periodic(name, interval, func, owner, initial_delay), owner)
+
+    async def _run_periodic(
+        self,
+        name: str,
+        interval: float,
+        func: Callable[[], Awaitable[None]],
+        owner: Any,
+        initial_delay: Optional[float]
+    ) -> None:
+        metrics = self._metrics(name, "periodic", owner)
+        failures = 0
+        await asyncio.sleep(interval if initial_delay is None else initial_delay)
+        while True:
+            metrics.active += 1
+            start = time.monotonic()
+            try:
+                await func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.record(time.monotonic() - start, e)
+                failures += 1
+                logger.error("Periodic task %s failed (%d in a row): %s", name, failures, e, exc_info=True)
+            else:
+                metrics.record(time.monotonic() - start)
+                failures = 0
+            finally:
+                metrics.active -= 1
+            await asyncio.sleep(max(interval, _backoff(failures)) if failures else interval)
+
+    def spawn(self, name: str, coro: Coroutine, *, owner: Any = None, group: Optional[str] = None) -> asyncio.Task:
+        """Run a one-shot coroutine; failures are logged and counted, never lost"""
+        if self._closed:
+            # _track only closes the wrapper; close the caller's coroutine too
+            coro.close()
+        return self._track(name, self._run_once(name, coro, owner, group), owner)
+
+    async def _run_once(self, name: str, coro: Coroutine, owner: Any, group: Optional[str]) -> None:
+        metrics = self._metrics(name, "oneshot", owner)
+        semaphore = self._groups.get(group) if group else None
+        try:
+            if semaphore is not None:
+                await semaphore.acquire()
+        except asyncio.CancelledError:
+            coro.close()
+            raise
+        metrics.active += 1
+        start = time.monotonic()
+        try:
+            await coro
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics.record(time.monotonic() - start, e)
+            logger.error("Task %s failed: %s", name, e, exc_info=True)
+        else:
+            metrics.record(time.monotonic() - start)
+        finally:
+            metrics.active -= 1
+            if semaphore is not None:
+                semaphore.release()
+
+    def task_count(self) -> int:
+        """Supervised tasks that have not finished yet"""
+        return len(self._tasks)
+
+    def tasks_of(self, owner: Any) -> list[asyncio.Task]:
+        return [task for task, task_owner in self._tasks.items() if task_owner is owner]
+
+    async def cancel_owner(self, owner: Any) -> None:
+        """Cancel every task registered by owner and wait for them to finish"""
+        tasks = self.tasks_of(owner)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def shutdown(self) -> None:
+        self._closed = True
+        # shutdown() may itself be running in a supervised task (e.g. a drain)
+        tasks = [task for task in self._tasks if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def health(self) -> list[dict[str, Any]]:
+        """One row per task name, failing tasks first"""
+        rows = []
+        for metrics in self.metrics.values():
+            rows.append({
+                "name": metrics.name,
+                "kind": metrics.kind,
+                "owner": metrics.owner,
+                "active": metrics.active,
+                "runs": metrics.runs,
+                "failures": metrics.failures,
+                "restarts": metrics.restarts,
+                "mean_ms": metrics.mean_seconds * 1000,
+                "last_ms": metrics.last_seconds * 1000,
+                "last_error": metrics.last_error,
+                "last_failure_at": metrics.last_failure_at,
+            })
+        rows.sort(key=lambda row: (-row["failures"], row["name"]))
+        return rows
+
+    def group_usage(self) -> dict[str, tuple[int, int]]:
+        """group -> (running, limit)"""
+        return {
+            group: (self._group_limits[group] - semaphore._value, self._group_limits[group])
+            for group, semaphore in self._groups.items()
+        }
@@ -0,0 +1,139 @@
+"""Opt-in capture of interaction traces for offline replay (bench/replay.py).
+
+Every finished tracing transaction (panel click, modal open and submit, slash
+and prefix commands) becomes one JSON line:
+
+    {"t": 1760000000.123, "op": "auth.click", "name": "auth.verify",
+     "guild": "3f0c...", "user": "9a51...", "ms": 212.4,
+     "stages": {"captcha.fetch": 180.2, ...}, "sizes": {"image": 21344},
+     "error": false, "tags": {"difficulty": 3, ...}}
+
+Guild and user IDs are replaced by keyed hashes. The key is random per
+process and never written, so the hashes cannot be reversed by hashing known
+IDs; they only link the interactions of one verification together.
+
+Records are buffered in memory and appended as gzip members by a worker
+thread. Files rotate at TRACE_CAPTURE_FILE_BYTES and the oldest are deleted
+beyond TRACE_CAPTURE_MAX_FILES.
+"""
+import asyncio
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Final, Iterable, Iterator, Optional
+
+from src.lib.tracing import Trace
+
+CAPTURE_DIR: Final[Optional[str]] = os.getenv("TRACE_CAPTURE_DIR") or None
+FILE_BYTES: Final[int] = int(os.getenv("TRACE_CAPTURE_FILE_BYTES", 16 * 1024 * 1024))
+MAX_FILES: Final[int] = int(os.getenv("TRACE_CAPTURE_MAX_FILES", 48))
+FLUSH_INTERVAL_SECONDS: Final[float] = 5.0
+# Records held between flushes; beyond this they are dropped and counted
+BUFFER_RECORDS: Final[int] = 20_000
+FILE_PATTERN: Final[str] = "traces-*.jsonl.gz"
+
+logger = logging.getLogger(__name__)
+
+
+class TraceRecorder:
+    def __init__(self, directory: str, file_bytes: int = FILE_BYTES, max_files: int = MAX_FILES) -> None:
+        self.directory = directory
+        self.file_bytes = file_bytes
+        self.max_files = max_files
+        self._key = os.urandom(16)
+        self._buffer: list[dict] = []
+        self._path: Optional[str] = None
+        self._files_started = 0
+        self.recorded = 0
+        self.dropped = 0
+        self.bytes_written = 0
+
+    def _pseudonym(self, value: Optional[int]) -> Optional[str]:
+        if value is None:
+            return None
+        return hashlib.blake2b(str(value).encode(), key=self._key, digest_size=8).hexdigest()
+
+    def observe(self, trace: Trace, duration: float) -> None:
+        """tracing finish hook; only builds a dict, all I/O happens in flush()"""
+        if len(self._buffer) >= BUFFER_RECORDS:
+            self.dropped += 1
+            return
+        self._buffer.append({
+            "t": round(trace.started, 4),
+            "op": trace.op,
+            "name": trace.name,
+            "guild": self._pseudonym(trace.guild_id),
+            "user": self._pseudonym(trace.user_id),
+            "ms": round(duration * 1000, 2),
+            "stages": {op: round(seconds * 1000, 2) for op, seconds in trace.stages.items()},
+            "sizes": trace.sizes,
+            "error": trace.error,
+            "tags": trace.tags,
+        })
+
+    async def flush(self) -> None:
+        if not self._buffer:
+            return
+        records, self._buffer = self._buffer, []
+        await asyncio.to_thread(self._write, records)
+        self.recorded += len(records)
+
+    def _write(self, records: list[dict]) -> None:
+        if self._path is None:
+            # The PID keeps shard processes sharing a directory apart
+            self._files_started += 1
+            self._path = os.path.join(
+                self.directory,
+                f"traces-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._files_started}.jsonl.gz"
+            )
+        data = "".join(json.dumps(record, separators=(",", ":"), default=str) + "\n" for record in records)
+        # Each flush appends a gzip member; readers see one continuous stream
+        with gzip.open(self._path, "ab") as f:
+            f.write(data.encode())
+        size = os.path.getsize(self._path)
+        self.bytes_written += len(data)
+        if size >= self.file_bytes:
+            self._path = None
+            self._prune()
+
+    def _prune(self) -> None:
+        files = sorted(glob.glob(os.path.join(self.directory, FILE_PATTERN)), key=os.path.getmtime)
+        for path in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning("Could not remove old trace file %s: %s", path, e)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "recorded": self.recorded,
+            "buffered": len(self._buffer),
+            "dropped": self.dropped,
+            "bytes_written": self.bytes_written,
+        }
+
+
+def trace_files(paths: Iterable[str]) -> list[str]:
+    """Capture files named directly or found in the given directories, oldest first"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, FILE_PATTERN)))
+        else:
+            files.append(path)
+    return sorted(files, key=os.path.getmtime)
+
+
+def read_traces(paths: Iterable[str]) -> Iterator[dict]:
+    for path in trace_files(paths):
+        with gzip.open(path, "rt") as f:
+            try:
+                for line in f:
+                    yield json.loads(line)
+            except (EOFError, json.JSONDecodeError):
+                # The file currently being written can end mid-member
+                logger.warning("Truncated trace file %s", path)
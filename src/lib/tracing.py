@@ -0,0 +1,237 @@
+"""Performance tracing for the verification flow and command handlers.
+
+transaction() and span() always measure stage durations (finish hooks receive
+them, e.g. the dynamic sampler below). They also report to Sentry when Sentry
+has been initialised by LoggingCog, and cost almost nothing when it has not.
+"""
+import logging
+import os
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Callable, Final, Iterator, Optional
+
+TRACES_BASE_RATE: Final[float] = float(os.getenv("SENTRY_TRACES_BASE_RATE", 0.2))
+# Budget of sampled traces per second for each transaction name
+TRACES_PER_SECOND: Final[float] = float(os.getenv("SENTRY_TRACES_PER_SECOND", 2))
+SLOW_TRACE_SECONDS: Final[float] = int(os.getenv("SENTRY_SLOW_TRACE_MS", 3000)) / 1000
+SAMPLER_WINDOW_SECONDS: Final[float] = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+class Trace:
+    """Timing of one transaction, shared with the spans opened inside it"""
+
+    __slots__ = ("op", "name", "started", "stages", "error", "tags", "guild_id", "user_id", "sizes")
+
+    def __init__(self, op: str, name: str) -> None:
+        self.op = op
+        self.name = name
+        self.started = time.time()
+        self.stages: dict[str, float] = {}
+        self.error = False
+        self.tags: dict[str, object] = {}
+        # Who triggered it and payload sizes in bytes, for finish hooks only (never sent to Sentry)
+        self.guild_id: Optional[int] = None
+        self.user_id: Optional[int] = None
+        self.sizes: dict[str, int] = {}
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("authshield_trace", default=None)
+_finish_hooks: list[Callable[[Trace, float], None]] = []
+
+
+def add_finish_hook(hook: Callable[[Trace, float], None]) -> None:
+    if hook not in _finish_hooks:
+        _finish_hooks.append(hook)
+
+
+def remove_finish_hook(hook: Callable[[Trace, float], None]) -> None:
+    if hook in _finish_hooks:
+        _finish_hooks.remove(hook)
+
+
+def _sdk():
+    """sentry_sdk if it is imported and initialised, otherwise None (never imports it)"""
+    sdk = sys.modules.get("sentry_sdk")
+    if sdk is None or not sdk.Hub.current.client:
+        return None
+    return sdk
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+def mark_error() -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.error = True
+
+
+def set_tag(key: str, value: object) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.tags[key] = value
+
+
+def set_actor(guild_id: Optional[int], user_id: Optional[int]) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.guild_id = guild_id
+        trace.user_id = user_id
+
+
+def add_size(name: str, nbytes: int) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.sizes[name] = trace.sizes.get(name, 0) + nbytes
+
+
+def add_stage(op: str, seconds: float) -> None:
+    """Record time spent outside a span (e.g. waiting in a queue) as a stage"""
+    trace = _current.get()
+    if trace is not None:
+        trace.stages[op] = trace.stages.get(op, 0.0) + seconds
+
+
+def trace_headers() -> Optional[dict[str, str]]:
+    """Headers that let a later interaction continue the current trace"""
+    sdk = _sdk()
+    if sdk is None:
+        return None
+    traceparent = sdk.get_traceparent()
+    if not traceparent:
+        return None
+    return {"sentry-trace": traceparent, "baggage": sdk.get_baggage() or ""}
+
+
+@contextmanager
+def transaction(op: str, name: str, continue_from: Optional[dict] = None) -> Iterator[Trace]:
+    trace = Trace(op, name)
+    token = _current.set(trace)
+    start = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            sentry_transaction = None
+            sdk = _sdk()
+            if sdk is not None:
+                if continue_from:
+                    sentry_transaction = stack.enter_context(
+                        sdk.start_transaction(sdk.continue_trace(continue_from, op=op, name=name))
+                    )
+                else:
+                    sentry_transaction = stack.enter_context(sdk.start_transaction(op=op, name=name))
+            try:
+                yield trace
+            except BaseException:
+                trace.error = True
+                raise
+            finally:
+                if sentry_transaction is not None:
+                    sentry_transaction.set_status("internal_error" if trace.error else "ok")
+                    for key, value in trace.tags.items():
+                        sentry_transaction.set_tag(key, value)
+    finally:
+        duration = time.perf_counter() - start
+        _current.reset(token)
+        for hook in _finish_hooks:
+            try:
+                hook(trace, duration)
+            except Exception as e:
+                logger.error("Trace finish hook failed: %s", e, exc_info=True)
+
+
+@contextmanager
+def span(op: str, description: Optional[str] = None) -> Iterator[None]:
+    trace = _current.get()
+    start = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            sdk = _sdk() if trace is not None else None
+            if sdk is not None:
+                stack.enter_context(sdk.start_span(op=op, description=description))
+            yield
+    finally:
+        if trace is not None:
+            trace.stages[op] = trace.stages.get(op, 0.0) + time.perf_counter() - start
+
+
+class _WindowStats:
+    __slots__ = ("window_start", "count", "errors", "slow", "prev_count", "prev_errors", "prev_slow")
+
+    def __init__(self, now: float) -> None:
+        self.window_start = now
+        self.count = self.errors = self.slow = 0
+        self.prev_count = self.prev_errors = self.prev_slow = 0
+
+    def roll(self, now: float) -> None:
+        if now - self.window_start >= SAMPLER_WINDOW_SECONDS:
+            # A window with no traffic at all resets the history
+            stale = now - self.window_start >= 2 * SAMPLER_WINDOW_SECONDS
+            self.prev_count = 0 if stale else self.count
+            self.prev_errors = 0 if stale else self.errors
+            self.prev_slow = 0 if stale else self.slow
+            self.count = self.errors = self.slow = 0
+            self.window_start = now
+
+
+class DynamicSampler:
+    """traces_sampler that favours failing and slow transactions and caps healthy volume.
+
+    Sampling is decided when a transaction starts, so the decision is based on
+    what recently happened to transactions of the same name: names that had
+    errors (or many slow traces) in the last minute are sampled at a high rate,
+    healthy ones at the base rate, and each is capped to a per-second budget.
+    """
+
+    def __init__(self, base_rate: float, traces_per_second: float, slow_seconds: float) -> None:
+        self.base_rate = base_rate
+        self.traces_per_second = traces_per_second
+        self.slow_seconds = slow_seconds
+        self._stats: dict[str, _WindowStats] = {}
+
+    def observe(self, trace: Trace, duration: float) -> None:
+        now = time.monotonic()
+        stats = self._stats.get(trace.name)
+        if stats is None:
+            stats = self._stats[trace.name] = _WindowStats(now)
+        stats.roll(now)
+        stats.count += 1
+        stats.errors += trace.error
+        stats.slow += duration >= self.slow_seconds
+
+    def __call__(self, sampling_context: dict) -> float:
+        parent_sampled = sampling_context.get("parent_sampled")
+        if parent_sampled is not None:
+            # Keep continued traces (click -> modal -> submit) whole
+            return float(parent_sampled)
+
+        name = sampling_context.get("transaction_context", {}).get("name")
+        stats = self._stats.get(name)
+        if stats is None:
+            return self.base_rate
+        now = time.monotonic()
+        stats.roll(now)
+
+        count = stats.count + stats.prev_count
+        errors = stats.errors + stats.prev_errors
+        slow = stats.slow + stats.prev_slow
+        if errors:
+            rate, budget = 1.0, self.traces_per_second * 4
+        elif count and slow / count >= 0.05:
+            rate, budget = 0.5, self.traces_per_second * 2
+        else:
+            rate, budget = self.base_rate, self.traces_per_second
+
+        elapsed = SAMPLER_WINDOW_SECONDS + (now - stats.window_start) if stats.prev_count else now - stats.window_start
+        per_second = count / max(elapsed, 1.0)
+        if per_second * rate > budget:
+            rate = budget / per_second
+        return rate
+
+
+sampler = DynamicSampler(TRACES_BASE_RATE, TRACES_PER_SECOND, SLOW_TRACE_SECONDS)
+add_finish_hook(sampler.observe)
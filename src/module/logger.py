@@ -1,28 +1,59 @@
+import asyncio
 import logging
 import os
+import re
 import sys
-from typing import Optional
+import time
+from typing import Final, NamedTuple, Optional
 from dotenv import load_dotenv
 
 import discord
-import sentry_sdk
 from discord.ext import commands
-from sentry_sdk.integrations.logging import LoggingIntegration
+
+from src.lib import tracing
 
 # 環境変数を読み込む
 load_dotenv()
 
+# Sentry SDKはSENTRY_DSNが設定されている場合のみ_init_sentryで読み込む（起動時間短縮のため）
+sentry_sdk = None
+
+# フィードバックキューの上限（満杯の間は新しいフィードバックを断る）
+FEEDBACK_QUEUE_SIZE: Final[int] = 200
+# 同じユーザーからのフィードバック送信間隔
+FEEDBACK_USER_INTERVAL_SECONDS: Final[int] = 60
+# 同じエラーへの同じ内容のフィードバックを重複とみなす期間
+FEEDBACK_DEDUP_SECONDS: Final[int] = 3600
+FEEDBACK_PRUNE_INTERVAL_SECONDS: Final[int] = 300
+# リロード・終了時にキューに残ったフィードバックを送信する時間の上限
+FEEDBACK_DRAIN_TIMEOUT_SECONDS: Final[float] = float(os.getenv("FEEDBACK_DRAIN_TIMEOUT_SECONDS", 10))
+
+FEEDBACK_MESSAGES: Final[dict] = {
+    "queued": "Thank you for reporting the error. The development team has been notified.",
+    "duplicate": "This report has already been received. Thank you!",
+    "rate_limited": "You are sending reports too quickly. Please try again in {} seconds.",
+    "full": "Too many reports are being sent right now. Please try again later.",
+    "unavailable": "Sorry, the error reporting system is currently unavailable.",
+}
+
 # エラーレポート用のUIコンポーネント
-class ErrorReportButton(discord.ui.Button):
+# custom_idからエラーIDを取り出す1つのハンドラで全てのボタンを処理する（エラーごとにViewを保持しない）
+class ErrorReportButton(discord.ui.DynamicItem[discord.ui.Button], template=r"error_report:(?P<id>[0-9A-Za-z-]{1,64})"):
     def __init__(self, error_id: str):
         super().__init__(
-            style=discord.ButtonStyle.primary,
-            label="Submit detailed user report",
-            emoji="📝",
-            custom_id=f"error_report:{error_id}"
+            discord.ui.Button(
+                style=discord.ButtonStyle.primary,
+                label="Submit detailed user report",
+                emoji="📝",
+                custom_id=f"error_report:{error_id}"
+            )
         )
         self.error_id = error_id
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match[str]):
+        return cls(match["id"])
+
     async def callback(self, interaction: discord.Interaction):
         # Create and display a modal
         modal = ErrorReportModal(self.error_id)
@@ -51,54 +82,75 @@ class ErrorReportModal(discord.ui.Modal, title="Error Report Form"):
         self.add_item(self.reproduce_steps)
 
     async def on_submit(self, interaction: discord.Interaction):
-        # Send user feedback to Sentry
-        if sentry_sdk.Hub.current.client:
-            # Use the related error event ID to send a new message
-            with sentry_sdk.push_scope() as scope:
-                # Set user information
-                scope.set_user({
-                    "id": str(interaction.user.id),
-                    "username": str(interaction.user),
-                    "email": f"{interaction.user.id}@discord.user"
-                })
-                
-                # Set feedback information as tags and context
-                scope.set_tag("feedback_type", "error_report")
-                scope.set_tag("original_error_id", self.error_id)
-                scope.set_context("user_feedback", {
-                    "situation": self.description.value,
-                    "reproduction_steps": self.reproduce_steps.value or "Not provided",
-                    "reported_at": str(discord.utils.utcnow()),
-                    "original_error_id": self.error_id
-                })
-                
-                # Send feedback message
-                feedback_id = sentry_sdk.capture_message(
-                    f"User feedback for error {self.error_id}",
-                    level="info"
-                )
-                
-                # Add breadcrumb linking feedback to the related event
-                sentry_sdk.add_breadcrumb(
-                    category="feedback",
-                    message=f"User provided feedback for error",
-                    level="info",
-                    data={
-                        "feedback_id": feedback_id,
-                        "original_error_id": self.error_id,
-                        "user": str(interaction.user)
-                    }
-                )
-            
-            # Notify the user of completion
-            await interaction.response.send_message("Thank you for reporting the error. The development team has been notified.", ephemeral=True)
-        else:
-            await interaction.response.send_message("Sorry, the error reporting system is currently unavailable.", ephemeral=True)
+        # Sentryへの送信はキュー経由でワーカーが行う
+        cog = interaction.client.get_cog("LoggingCog")
+        if cog is None or not (sentry_sdk and sentry_sdk.Hub.current.client):
+            await interaction.response.send_message(FEEDBACK_MESSAGES["unavailable"], ephemeral=True)
+            return
+
+        status, retry_after = cog.feedback.submit(Feedback(
+            error_id=self.error_id,
+            user_id=interaction.user.id,
+            username=str(interaction.user),
+            situation=self.description.value,
+            reproduction_steps=self.reproduce_steps.value or "Not provided",
+            reported_at=str(discord.utils.utcnow())
+        ))
+        await interaction.response.send_message(FEEDBACK_MESSAGES[status].format(retry_after), ephemeral=True)
 
 class ErrorReportView(discord.ui.View):
     def __init__(self, error_id: str):
         super().__init__(timeout=None)  # タイムアウトなし
         self.add_item(ErrorReportButton(error_id))
+        # 停止済みのViewは送信しても保持されない。押されたボタンは登録済みのErrorReportButtonが処理する
+        self.stop()
+
+class Feedback(NamedTuple):
+    error_id: str
+    user_id: int
+    username: str
+    situation: str
+    reproduction_steps: str
+    reported_at: str
+
+class FeedbackQueue:
+    """上限付き・重複排除・ユーザーごとのレート制限付きのフィードバックキュー"""
+
+    def __init__(self, maxsize: int = FEEDBACK_QUEUE_SIZE) -> None:
+        self.queue: asyncio.Queue[Feedback] = asyncio.Queue(maxsize)
+        self._last_by_user: dict[int, float] = {}
+        self._seen: dict[tuple[str, int], float] = {}
+        self.counts = {"queued": 0, "duplicate": 0, "rate_limited": 0, "full": 0, "sent": 0, "failed": 0}
+
+    @staticmethod
+    def _key(feedback: Feedback) -> tuple[str, int]:
+        return feedback.error_id, hash(" ".join(feedback.situation.lower().split()))
+
+    def submit(self, feedback: Feedback) -> tuple[str, int]:
+        """(結果, 再送までの秒数) を返す。結果はFEEDBACK_MESSAGESのキー"""
+        now = time.monotonic()
+        key = self._key(feedback)
+        if now - self._seen.get(key, -FEEDBACK_DEDUP_SECONDS) < FEEDBACK_DEDUP_SECONDS:
+            status, retry_after = "duplicate", 0
+        elif now - self._last_by_user.get(feedback.user_id, -FEEDBACK_USER_INTERVAL_SECONDS) < FEEDBACK_USER_INTERVAL_SECONDS:
+            status = "rate_limited"
+            retry_after = int(FEEDBACK_USER_INTERVAL_SECONDS - (now - self._last_by_user[feedback.user_id])) + 1
+        elif self.queue.full():
+            status, retry_after = "full", 0
+        else:
+            self.queue.put_nowait(feedback)
+            self._seen[key] = now
+            self._last_by_user[feedback.user_id] = now
+            status, retry_after = "queued", 0
+        self.counts[status] += 1
+        return status, retry_after
+
+    async def prune(self) -> None:
+        now = time.monotonic()
+        self._last_by_user = {
+            user_id: at for user_id, at in self._last_by_user.items() if now - at < FEEDBACK_USER_INTERVAL_SECONDS
+        }
+        self._seen = {key: at for key, at in self._seen.items() if now - at < FEEDBACK_DEDUP_SECONDS}
 
 class LoggingCog(commands.Cog):
     """Cog for logging bot activities"""
@@ -116,16 +168,101 @@ class LoggingCog(commands.Cog):
         self.old_tree_on_error = bot.tree.on_error
         bot.tree.on_error = self.on_app_command_tree_error
         
-        # 永続的なViewを追加（ボットが再起動してもボタンが機能するために必要）
-        bot.add_view(ErrorReportView("dummy"))  # ダミーIDでViewを初期化
+        # エラーレポートボタンはcustom_idのパターンで処理する（ボットが再起動してもボタンが機能する）
+        bot.add_dynamic_items(ErrorReportButton)
+        self.feedback = FeedbackQueue()
+
+    async def cog_load(self) -> None:
+        self.bot.supervisor.start("feedback.sender", self._send_feedback_loop, owner=self)
+        self.bot.supervisor.every("feedback.prune", FEEDBACK_PRUNE_INTERVAL_SECONDS, self.feedback.prune, owner=self)
+
+    async def cog_unload(self) -> None:
+        self.bot.remove_dynamic_items(ErrorReportButton)
+        # 送信ワーカーは既に停止しているので、残りのフィードバックをここで送信する（時間上限あり）
+        queue = self.feedback.queue
+        deadline = time.monotonic() + FEEDBACK_DRAIN_TIMEOUT_SECONDS
+        while not queue.empty():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._deliver_feedback(queue.get_nowait()), remaining)
+            except asyncio.TimeoutError:
+                break
+            finally:
+                queue.task_done()
+        if not queue.empty():
+            self.logger.warning(f"Dropped {queue.qsize()} user feedback reports on shutdown")
+
+    async def _send_feedback_loop(self) -> None:
+        """キューからフィードバックを1件ずつSentryへ送信する"""
+        while True:
+            feedback = await self.feedback.queue.get()
+            try:
+                await self._deliver_feedback(feedback)
+            finally:
+                self.feedback.queue.task_done()
+
+    async def _deliver_feedback(self, feedback: Feedback) -> None:
+        try:
+            # Sentry SDKの呼び出しはブロッキングなのでイベントループの外で実行する
+            await asyncio.to_thread(self._send_feedback, feedback)
+            self.feedback.counts["sent"] += 1
+        except Exception as e:
+            self.feedback.counts["failed"] += 1
+            self.logger.error(f"Failed to send user feedback to Sentry: {e}")
+
+    def _send_feedback(self, feedback: Feedback) -> None:
+        if not (sentry_sdk and sentry_sdk.Hub.current.client):
+            return
+        # Use the related error event ID to send a new message
+        with sentry_sdk.push_scope() as scope:
+            # Set user information
+            scope.set_user({
+                "id": str(feedback.user_id),
+                "username": feedback.username,
+                "email": f"{feedback.user_id}@discord.user"
+            })
+
+            # Set feedback information as tags and context
+            scope.set_tag("feedback_type", "error_report")
+            scope.set_tag("original_error_id", feedback.error_id)
+            scope.set_context("user_feedback", {
+                "situation": feedback.situation,
+                "reproduction_steps": feedback.reproduction_steps,
+                "reported_at": feedback.reported_at,
+                "original_error_id": feedback.error_id
+            })
+
+            # Send feedback message
+            feedback_id = sentry_sdk.capture_message(
+                f"User feedback for error {feedback.error_id}",
+                level="info"
+            )
+
+            # Add breadcrumb linking feedback to the related event
+            sentry_sdk.add_breadcrumb(
+                category="feedback",
+                message="User provided feedback for error",
+                level="info",
+                data={
+                    "feedback_id": feedback_id,
+                    "original_error_id": feedback.error_id,
+                    "user": feedback.username
+                }
+            )
     
     def _init_sentry(self) -> None:
         """Sentry SDKの初期化"""
+        global sentry_sdk
         sentry_dsn = os.getenv("SENTRY_DSN")
         
         if not sentry_dsn:
             self.logger.warning("SENTRY_DSN environment variable is not set. Error tracking disabled.")
             return
+
+        import sentry_sdk
+        from sentry_sdk.integrations.logging import LoggingIntegration
             
         # Sentryのロギング統合をセットアップ
         logging_integration = LoggingIntegration(
@@ -137,7 +274,8 @@ class LoggingCog(commands.Cog):
         sentry_sdk.init(
             dsn=sentry_dsn,
             integrations=[logging_integration],
-            traces_sample_rate=0.2,  # パフォーマンス追跡のサンプルレート
+            # エラーや遅いトランザクションを優先し、正常な大量トラフィックは予算内に抑える
+            traces_sampler=tracing.sampler,
             environment=os.getenv("BOT_ENV", "development"),
             release=os.getenv("BOT_VERSION", "0.1.0"),
             
@@ -167,7 +305,7 @@ class LoggingCog(commands.Cog):
         self.logger.info("Bot is ready. Logged in as %s", self.bot.user)
         
         # Send startup event to Sentry
-        if sentry_sdk.Hub.current.client:
+        if sentry_sdk and sentry_sdk.Hub.current.client:
             sentry_sdk.capture_message(
                 f"Bot started successfully: {self.bot.user}",
                 level="info",
@@ -197,8 +335,11 @@ class LoggingCog(commands.Cog):
         self.logger.info("Member joined: %s (ID: %s) in guild: %s", member.name, member.id, member.guild.name)
 
     @commands.Cog.listener()
-    async def on_member_remove(self, member: discord.Member) -> None:
-        self.logger.info("Member left: %s (ID: %s) from guild: %s", member.name, member.id, member.guild.name)
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent) -> None:
+        # メンバーキャッシュが無効でも発火するraw版を使う
+        guild = self.bot.get_guild(payload.guild_id)
+        guild_name = guild.name if guild else payload.guild_id
+        self.logger.info("Member left: %s (ID: %s) from guild: %s", payload.user.name, payload.user.id, guild_name)
 
     @commands.Cog.listener()
     async def on_command_completion(self, ctx: commands.Context) -> None:
@@ -216,7 +357,7 @@ class LoggingCog(commands.Cog):
             return
             
         # Sentryにエラーイベントを明示的に送信
-        if sentry_sdk.Hub.current.client:
+        if sentry_sdk and sentry_sdk.Hub.current.client:
             with sentry_sdk.push_scope() as scope:
                 # コンテキスト情報を追加
                 scope.set_tag("command", str(ctx.command) if ctx.command else "Unknown")
@@ -258,7 +399,7 @@ class LoggingCog(commands.Cog):
         self.logger.error("Command error: %s by %s (ID: %s) in guild: %s - %s", command_name, interaction.user.name, interaction.user.id, guild_name, error)
         
         # Sentryにエラーイベントを明示的に送信
-        if sentry_sdk.Hub.current.client:
+        if sentry_sdk and sentry_sdk.Hub.current.client:
             with sentry_sdk.push_scope() as scope:
                 # コンテキスト情報を追加
                 scope.set_tag("command", command_name)
@@ -302,7 +443,7 @@ class LoggingCog(commands.Cog):
         self.logger.error(f"Uncaught exception in {event_method}: {error_type.__name__}: {error_value}")
         
         # Sentryにエラーを送信
-        if sentry_sdk.Hub.current.client:
+        if sentry_sdk and sentry_sdk.Hub.current.client:
             with sentry_sdk.push_scope() as scope:
                 scope.set_tag("event", event_method)
                 scope.set_extra("traceback", f"{error_type.__name__}: {error_value}")
@@ -363,11 +504,12 @@ class LoggingCog(commands.Cog):
     async def on_app_command_tree_error(self, interaction: discord.Interaction, error: discord.app_commands.AppCommandError) -> None:
         """アプリケーションコマンドツリーレベルのエラーハンドラ"""
         command_name = interaction.command.name if interaction.command else "Unknown"
+        tracing.mark_error()
         self.logger.error("App Command Tree error: %s by %s (ID: %s) - %s", 
                          command_name, interaction.user.name, interaction.user.id, error)
         
         # Sentryにエラーイベントを明示的に送信
-        if sentry_sdk.Hub.current.client:
+        if sentry_sdk and sentry_sdk.Hub.current.client:
             with sentry_sdk.push_scope() as scope:
                 # コンテキスト情報を追加
                 scope.set_tag("command", command_name)
@@ -418,7 +560,7 @@ class LoggingCog(commands.Cog):
             return
 
         try:
-            if not sentry_sdk.Hub.current.client:
+            if not (sentry_sdk and sentry_sdk.Hub.current.client):
                 await ctx.send("❌ Sentry is not initialized. Please check the environment variables.")
                 return
                 
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Final, Optional
+
+import asyncpg
+from discord.ext import commands
+
+from src.lib.migrations import apply_migrations
+from src.panel.authpanel import DB_CONFIG
+
+# Buffer / flush settings
+FLUSH_BATCH_SIZE: Final[int] = 500
+FLUSH_INTERVAL_SECONDS: Final[float] = 5.0
+MAX_BUFFERED_RECORDS: Final[int] = 10_000
+BACKPRESSURE_TIMEOUT_SECONDS: Final[float] = 0.5
+
+# Partition / retention settings
+PARTITION_PRECREATE_DAYS: Final[int] = 2
+RETENTION_DAYS: Final[int] = int(os.getenv("AUDIT_RETENTION_DAYS", 90))
+MAINTENANCE_INTERVAL_SECONDS: Final[int] = 3600
+
+TABLE_NAME: Final[str] = "auth_attempts"
+COLUMNS: Final[tuple] = (
+    "attempted_at", "guild_id", "panel_id", "user_id", "outcome", "solve_ms", "difficulty"
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _partition_name(day: datetime) -> str:
+    return f"{TABLE_NAME}_{day:%Y%m%d}"
+
+
+class AuditLog(commands.Cog):
+    """Append-only log of verification attempts, written to PostgreSQL in batches"""
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self.conn: Optional[asyncpg.Connection] = None
+        self._buffer: deque = deque()
+        self._flush_requested = asyncio.Event()
+        self._space_available = asyncio.Event()
+        self._space_available.set()
+        self._flush_lock = asyncio.Lock()
+        self._last_maintenance = 0.0
+        self.written = 0
+        self.dropped = 0
+
+    async def _initialize_db(self) -> None:
+        await apply_migrations(self.conn)
+        await self._maintain_partitions()
+
+    async def cog_load(self) -> None:
+        self.conn = await asyncpg.connect(**DB_CONFIG)
+        await self._initialize_db()
+        self.bot.supervisor.start("audit.flush", self._flush_loop, owner=self)
+
+    async def cog_unload(self) -> None:
+        # The flush loop has already been cancelled by the supervisor
+        if self.conn:
+            await self.flush()
+            await self.conn.close()
+            self.conn = None
+
+    async def record(
+        self,
+        guild_id: int,
+        panel_id: int,
+        user_id: int,
+        outcome: str,
+        solve_ms: Optional[int],
+        difficulty: int
+    ) -> bool:
+        """Buffer one attempt. Returns False when the record had to be dropped."""
+        if len(self._buffer) >= MAX_BUFFERED_RECORDS:
+            # Backpressure: ask for a flush and wait briefly for room
+            self._space_available.clear()
+            self._flush_requested.set()
+            try:
+                await asyncio.wait_for(self._space_available.wait(), BACKPRESSURE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            if len(self._buffer) >= MAX_BUFFERED_RECORDS:
+                self.dropped += 1
+                logger.warning("Audit buffer full, dropped attempt record (total dropped: %d)", self.dropped)
+                return False
+
+        self._buffer.append((
+            datetime.now(timezone.utc), guild_id, panel_id, user_id, outcome, solve_ms, difficulty
+        ))
+        if len(self._buffer) >= FLUSH_BATCH_SIZE:
+            self._flush_requested.set()
+        return True
+
+    def pending(self) -> int:
+        """Records buffered and not yet written"""
+        return len(self._buffer)
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            while self._buffer and self.conn:
+                count = min(len(self._buffer), FLUSH_BATCH_SIZE)
+                batch = [self._buffer.popleft() for _ in range(count)]
+                try:
+                    await self.conn.copy_records_to_table(TABLE_NAME, records=batch, columns=COLUMNS)
+                    self.written += count
+                except Exception as e:
+                    logger.error("Failed to flush %d audit records: %s", count, e, exc_info=True)
+                    # Put the batch back (newest records are dropped first if there is no room)
+                    room = max(0, MAX_BUFFERED_RECORDS - len(self._buffer))
+                    self.dropped += max(0, count - room)
+                    self._buffer.extendleft(reversed(batch[:room]))
+                    break
+            self._space_available.set()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), FLUSH_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+                if time.monotonic() - self._last_maintenance >= MAINTENANCE_INTERVAL_SECONDS:
+                    await self._maintain_partitions()
+            except Exception as e:
+                logger.error("Error in audit flush loop: %s", e, exc_info=True)
+
+    async def _maintain_partitions(self) -> None:
+        """Create upcoming daily partitions and drop those past the retention period"""
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        for offset in range(-1, PARTITION_PRECREATE_DAYS + 1):
+            start = today + timedelta(days=offset)
+            end = start + timedelta(days=1)
+            await self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {_partition_name(start)} PARTITION OF {TABLE_NAME} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+
+        cutoff = _partition_name(today - timedelta(days=RETENTION_DAYS))
+        rows = await self.conn.fetch(
+            """
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = $1::text::regclass
+            """,
+            TABLE_NAME
+        )
+        for row in rows:
+            # Partition names sort by date, so a plain string comparison is enough
+            if row["relname"] < cutoff:
+                await self.conn.execute(f"DROP TABLE IF EXISTS {row['relname']}")
+                logger.info("Dropped expired audit partition %s", row["relname"])
+        self._last_maintenance = time.monotonic()
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(AuditLog(bot))
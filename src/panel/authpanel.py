@@ -1,18 +1,58 @@
+import asyncio
 import asyncpg
-import base64
+import binascii
+import json
 import logging
 import os
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
 from io import BytesIO
-from typing import Final, Optional
+from typing import AsyncIterator, Final, Optional
 
 import aiohttp
 import discord
 from discord.ext import commands
 
-API_BASE_URL: Final[str] = "https://captcha.evex.land/api/captcha"
+from src.lib import imagepipeline, tracing
+from src.lib.challengebank import MemoryviewReader
+from src.lib.fairsched import FairScheduler
+from src.lib.migrations import apply_migrations
+from src.lib.panelcache import PanelCache, PanelInfo
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+API_BASE_URL: Final[str] = os.getenv("CAPTCHA_API_URL", "https://captcha.evex.land/api/captcha")
 TIMEOUT_SECONDS: Final[int] = 30
+PANEL_CACHE_SIZE: Final[int] = int(os.getenv("PANEL_CACHE_SIZE", 10000))
+PANEL_CACHE_REPORT_SECONDS: Final[int] = 600
+# Fair scheduling between guilds (see src/lib/fairsched.py): total and per-guild concurrency
+CAPTCHA_CONCURRENCY: Final[int] = int(os.getenv("CAPTCHA_CONCURRENCY", 32))
+CAPTCHA_CONCURRENCY_PER_GUILD: Final[int] = int(os.getenv("CAPTCHA_CONCURRENCY_PER_GUILD", 4))
+ROLE_GRANT_CONCURRENCY: Final[int] = int(os.getenv("ROLE_GRANT_CONCURRENCY", 16))
+ROLE_GRANT_CONCURRENCY_PER_GUILD: Final[int] = int(os.getenv("ROLE_GRANT_CONCURRENCY_PER_GUILD", 2))
+# Scheduler key for work not done on behalf of a guild (bank refill, backfill); it gets a reduced share
+BACKGROUND_GUILD_ID: Final[int] = 0
+BACKGROUND_WEIGHT: Final[float] = 0.25
+# pg_try_advisory_lock key: one process resolves channels for the guild_id backfill, the others skip it
+BACKFILL_LOCK_KEY: Final[int] = 0x4155_5449
+# While draining, challenges issued within this window are waited for; older ones count as abandoned
+DRAIN_CHALLENGE_GRACE_SECONDS: Final[int] = int(os.getenv("DRAIN_CHALLENGE_GRACE_SECONDS", 45))
+# Rolling restart: a draining process leaves new clicks to its successor, once that is seen heartbeating
+DRAIN_HANDOFF: Final[bool] = os.getenv("DRAIN_HANDOFF", "false").lower() in ("1", "true", "yes")
+DRAIN_POLL_SECONDS: Final[float] = 0.25
+# Ready processes record a heartbeat per shard in shard_instances; older heartbeats count as gone
+HEARTBEAT_SECONDS: Final[float] = 5.0
+HEARTBEAT_TIMEOUT_SECONDS: Final[float] = 15.0
+SUCCESSOR_CHECK_SECONDS: Final[float] = 2.0
+ISSUED_CHALLENGE_TTL_SECONDS: Final[int] = 900
 MIN_DIFFICULTY: Final[int] = 1
 MAX_DIFFICULTY: Final[int] = 10
+# "fast" uses orjson for the CAPTCHA payload when it is installed (see RUNTIME_PROFILE in bot.py)
+RUNTIME_PROFILE: Final[str] = os.getenv("RUNTIME_PROFILE", "standard")
 # PostgreSQL接続設定
 DB_CONFIG: Final[dict] = {
     "host": os.getenv("POSTGRES_HOST", "localhost"),
@@ -25,6 +65,8 @@ DB_CONFIG: Final[dict] = {
 ERROR_MESSAGES: Final[dict] = {
     "invalid_difficulty": "Difficulty must be specified between 1 and 10.",
     "fetch_failed": "Failed to fetch CAPTCHA.",
+    "panel_removed": "This authentication panel has been removed.",
+    "draining": "AuthShield is restarting. Please press the button again in a few seconds.",
     "http_error": "HTTP error occurred: {}",
     "unexpected_error": "An unexpected error occurred: {}"
 }
@@ -38,6 +80,59 @@ SUCCESS_MESSAGES: Final[dict] = {
 
 logger = logging.getLogger(__name__)
 
+_json_loads = orjson.loads if orjson is not None and RUNTIME_PROFILE == "fast" else json.loads
+
+
+def _decode_data_url(data_url: str) -> bytes:
+    """Decode the base64 payload of a data: URL.
+
+    One full-size copy remains: slicing off the header copies the str, since a
+    str cannot be viewed without copying and a2b_base64 takes no offset. The
+    decode then reads that ASCII str directly, with no encode step.
+    """
+    return binascii.a2b_base64(data_url[data_url.index(",") + 1:])
+
+async def request_captcha(
+    session: aiohttp.ClientSession,
+    difficulty: int
+) -> tuple[Optional[bytes], Optional[str], Optional[str]]:
+    """Fetch one challenge; returns (image, answer, None) or (None, None, error message).
+
+    The image is re-encoded to the upload budget here, so prewarmed and banked
+    challenges are stored already compacted.
+    """
+    url = f"{API_BASE_URL}?difficulty={difficulty}"
+    try:
+        async with session.get(url) as response:
+            if response.status != 200:
+                return None, None, ERROR_MESSAGES["fetch_failed"]
+            # Parse the raw body directly instead of decoding it to str first
+            data = _json_loads(await response.read())
+            image_bytes = _decode_data_url(data["image"])
+        with tracing.span("image.compact"):
+            image_bytes = await imagepipeline.compact_async(image_bytes)
+        return image_bytes, data["answer"], None
+    except aiohttp.ClientError as e:
+        logger.error("HTTP error in captcha fetch: %s", e, exc_info=True)
+        return None, None, ERROR_MESSAGES["http_error"].format(str(e))
+    except Exception as e:
+        logger.error("Unexpected error in captcha fetch: %s", e, exc_info=True)
+        return None, None, ERROR_MESSAGES["unexpected_error"].format(str(e))
+
+async def _acknowledge(interaction: discord.Interaction) -> None:
+    """Defer before queueing for a scheduler slot; Discord drops a first response sent after 3 seconds"""
+    if not interaction.response.is_done():
+        with tracing.span("discord.defer"):
+            await interaction.response.defer(ephemeral=True, thinking=True)
+
+
+async def _reply(interaction: discord.Interaction, content: Optional[str] = None, **kwargs) -> None:
+    """Ephemeral answer, sent as a followup once the interaction has been deferred"""
+    if interaction.response.is_done():
+        await interaction.followup.send(content, ephemeral=True, **kwargs)
+    else:
+        await interaction.response.send_message(content, ephemeral=True, **kwargs)
+
 class PersistentAuthView(discord.ui.View):
     def __init__(self, message_id: int, role_id: int, difficulty: int, session: aiohttp.ClientSession):
         super().__init__(timeout=None)
@@ -54,40 +149,97 @@ class PersistentAuthView(discord.ui.View):
         self.add_item(button)
 
     async def auth_button_callback(self, interaction: discord.Interaction) -> None:
-        image_bytes, answer, error = await self.fetch_captcha()
-        if error:
-            await interaction.response.send_message(error, ephemeral=True)
-            return
+        # The click, modal and submit interactions are reported as one trace
+        with tracing.transaction("auth.click", "auth.verify"):
+            tracing.set_actor(interaction.guild.id, interaction.user.id)
+            tracing.set_tag("difficulty", self.difficulty)
+
+            auth = interaction.client.get_cog("Auth")
+            if auth and auth.draining:
+                tracing.set_tag("draining", True)
+                # Stay silent only when a live successor will answer; otherwise the user would see a failure
+                if not (DRAIN_HANDOFF and auth.successor_live):
+                    await interaction.response.send_message(ERROR_MESSAGES["draining"], ephemeral=True)
+                return
 
-        file = discord.File(BytesIO(image_bytes), filename="captcha.png")
-        embed = discord.Embed(title="CAPTCHA", description="Press the button below to continue authentication.")
-        embed.set_image(url="attachment://captcha.png")
-        view = PersistentModalButtonView(answer, self.message_id, self.role_id)
-        await interaction.response.send_message(embed=embed, file=file, view=view, ephemeral=True)
+            # Panel settings may have been changed or removed by another process
+            if auth:
+                if self.message_id not in auth.panels and auth.db_scheduler.would_wait(interaction.guild.id):
+                    await _acknowledge(interaction)
+                try:
+                    with tracing.span("db.panel_lookup"):
+                        panel = await auth.get_panel(interaction.guild.id, self.message_id)
+                except Exception as e:
+                    logger.warning("Panel lookup failed, using registered settings: %s", e)
+                else:
+                    if panel is None:
+                        await _reply(interaction, ERROR_MESSAGES["panel_removed"])
+                        return
+                    self.role_id = panel.role_id
+                    self.difficulty = panel.difficulty
+
+            # Members who just joined usually have a challenge prepared already
+            prewarmer = interaction.client.get_cog("ChallengePrewarmer")
+            challenge = None
+            if prewarmer:
+                challenge = prewarmer.claim(interaction.guild.id, interaction.user.id, self.message_id, self.difficulty)
+            tracing.set_tag("prewarmed", challenge is not None)
+            # Then the on-disk bank, and only then the CAPTCHA API
+            if challenge is None:
+                bank = interaction.client.get_cog("ChallengeBankCog")
+                if bank:
+                    challenge = bank.take(self.difficulty)
+                    tracing.set_tag("banked", challenge is not None)
+            if challenge:
+                image_bytes, answer, error = challenge.image, challenge.answer, None
+            else:
+                with tracing.span("captcha.fetch"):
+                    if auth:
+                        if auth.captcha_scheduler.would_wait(interaction.guild.id):
+                            await _acknowledge(interaction)
+                        async with auth.captcha_scheduler.slot(interaction.guild.id):
+                            image_bytes, answer, error = await self.fetch_captcha()
+                    else:
+                        image_bytes, answer, error = await self.fetch_captcha()
+            if error:
+                tracing.mark_error()
+                await _reply(interaction, error)
+                return
+
+            # Banked images are memoryviews into the bank's mmap and are uploaded without a copy
+            tracing.add_size("image", len(image_bytes))
+            fp = BytesIO(image_bytes) if isinstance(image_bytes, bytes) else MemoryviewReader(image_bytes)
+            file = discord.File(fp, filename="captcha.png")
+            embed = discord.Embed(title="CAPTCHA", description="Press the button below to continue authentication.")
+            embed.set_image(url="attachment://captcha.png")
+            view = PersistentModalButtonView(
+                answer, self.message_id, self.role_id, self.difficulty, time.monotonic(), tracing.trace_headers()
+            )
+            with tracing.span("discord.respond"):
+                await _reply(interaction, embed=embed, file=file, view=view)
+            if auth:
+                auth.challenge_issued(interaction.user.id, self.message_id)
 
     async def fetch_captcha(self) -> tuple[Optional[bytes], Optional[str], Optional[str]]:
-        url = f"{API_BASE_URL}?difficulty={self.difficulty}"
-        try:
-            async with self.session.get(url) as response:
-                if response.status != 200:
-                    return None, None, ERROR_MESSAGES["fetch_failed"]
-                data = await response.json()
-                image_data = data["image"].split(",")[1]
-                image_bytes = base64.b64decode(image_data)
-                return image_bytes, data["answer"], None
-        except aiohttp.ClientError as e:
-            logger.error("HTTP error in captcha fetch: %s", e, exc_info=True)
-            return None, None, ERROR_MESSAGES["http_error"].format(str(e))
-        except Exception as e:
-            logger.error("Unexpected error in captcha fetch: %s", e, exc_info=True)
-            return None, None, ERROR_MESSAGES["unexpected_error"].format(str(e))
+        return await request_captcha(self.session, self.difficulty)
 
 class PersistentModalButtonView(discord.ui.View):
-    def __init__(self, answer: str, message_id: int, role_id: int):
+    def __init__(
+        self,
+        answer: str,
+        message_id: int,
+        role_id: int,
+        difficulty: int,
+        issued_at: float,
+        trace_headers: Optional[dict] = None
+    ):
         super().__init__(timeout=None)
         self.answer = answer
         self.message_id = message_id
         self.role_id = role_id
+        self.difficulty = difficulty
+        self.issued_at = issued_at
+        self.trace_headers = trace_headers
         button = discord.ui.Button(
             label="Open Authentication Screen",
             style=discord.ButtonStyle.secondary,
@@ -97,18 +249,35 @@ class PersistentModalButtonView(discord.ui.View):
         self.add_item(button)
 
     async def modal_button_callback(self, interaction: discord.Interaction) -> None:
-        modal = PersistentAuthModal(self.answer, self.role_id)
-        await interaction.response.send_modal(modal)
+        with tracing.transaction("auth.open_modal", "auth.verify", continue_from=self.trace_headers):
+            tracing.set_actor(interaction.guild.id, interaction.user.id)
+            modal = PersistentAuthModal(
+                self.answer, self.role_id, self.message_id, self.difficulty, self.issued_at, self.trace_headers
+            )
+            with tracing.span("discord.respond"):
+                await interaction.response.send_modal(modal)
 
 # Specify custom_id here and also for text input for stable operation after restart
 class PersistentAuthModal(discord.ui.Modal):
-    def __init__(self, answer: str, role_id: int):
+    def __init__(
+        self,
+        answer: str,
+        role_id: int,
+        message_id: int,
+        difficulty: int,
+        issued_at: float,
+        trace_headers: Optional[dict] = None
+    ):
         super().__init__(
             title="Authentication CAPTCHA",
             custom_id=f"persistent_auth_modal_{role_id}"
         )
         self.answer = answer
         self.role_id = role_id
+        self.message_id = message_id
+        self.difficulty = difficulty
+        self.issued_at = issued_at
+        self.trace_headers = trace_headers
         self.answer_input = discord.ui.TextInput(
             label="Enter the characters displayed in the image",
             placeholder="Enter characters here",
@@ -119,48 +288,309 @@ class PersistentAuthModal(discord.ui.Modal):
         self.add_item(self.answer_input)
 
     async def on_submit(self, interaction: discord.Interaction) -> None:
-        if self.answer_input.value.lower() == self.answer.lower():
+        with tracing.transaction("auth.submit", "auth.verify", continue_from=self.trace_headers):
+            tracing.set_actor(interaction.guild.id, interaction.user.id)
+            tracing.add_size("answer", len(self.answer_input.value))
+            auth = interaction.client.get_cog("Auth")
+            if auth is None:
+                await self._submit(interaction, None)
+                return
+            # A draining process waits for submissions in progress before shutting down
+            with auth.submission(interaction.user.id, self.message_id):
+                await self._submit(interaction, auth)
+
+    async def _submit(self, interaction: discord.Interaction, auth: Optional["Auth"]) -> None:
+        solve_ms = int((time.monotonic() - self.issued_at) * 1000)
+        passed = self.answer_input.value.lower() == self.answer.lower()
+        tracing.set_tag("passed", passed)
+        if passed:
             role = interaction.guild.get_role(self.role_id)
             if role:
-                await interaction.user.add_roles(role)
+                with tracing.span("discord.role_grant"):
+                    if auth:
+                        if auth.role_scheduler.would_wait(interaction.guild.id):
+                            await _acknowledge(interaction)
+                        async with auth.role_scheduler.slot(interaction.guild.id):
+                            await interaction.user.add_roles(role)
+                    else:
+                        await interaction.user.add_roles(role)
             message = SUCCESS_MESSAGES["correct"]
         else:
             message = SUCCESS_MESSAGES["incorrect"].format(self.answer)
-        await interaction.response.send_message(message, ephemeral=True)
+        with tracing.span("discord.respond"):
+            await _reply(interaction, message)
+
+        # Record the outcome after responding so the user never waits on analytics
+        stats = interaction.client.get_cog("AuthStats")
+        if stats:
+            stats.observe(interaction.guild.id, self.message_id, passed, solve_ms, self.difficulty)
+        audit = interaction.client.get_cog("AuditLog")
+        if audit:
+            with tracing.span("db.audit_record"):
+                await audit.record(
+                    interaction.guild.id,
+                    self.message_id,
+                    interaction.user.id,
+                    "passed" if passed else "failed",
+                    solve_ms,
+                    self.difficulty
+                )
 
 class Auth(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
         self._session: Optional[aiohttp.ClientSession] = None
         self.conn: Optional[asyncpg.Connection] = None
+        self._backfilled = False
+        self.panels = PanelCache(
+            DB_CONFIG, PANEL_CACHE_SIZE, bot.supervisor, owner=self, on_change=self._on_panel_change
+        )
+        self._views: dict[int, PersistentAuthView] = {}
+        # One guild's surge only delays that guild: CAPTCHA fetches, role grants and
+        # queries on self.conn (which runs one query at a time) are shared fairly
+        self.captcha_scheduler = FairScheduler("captcha", CAPTCHA_CONCURRENCY, CAPTCHA_CONCURRENCY_PER_GUILD)
+        self.role_scheduler = FairScheduler("role_grant", ROLE_GRANT_CONCURRENCY, ROLE_GRANT_CONCURRENCY_PER_GUILD)
+        self.db_scheduler = FairScheduler("db", 1, 1)
+        # asyncpg runs one operation per connection at a time; every query on self.conn holds this
+        self._conn_lock = asyncio.Lock()
+        for scheduler in self.schedulers():
+            scheduler.set_weight(BACKGROUND_GUILD_ID, BACKGROUND_WEIGHT)
+        self.draining = False
+        # (user_id, message_id) -> when the challenge was shown, until it is answered
+        self._issued: dict[tuple[int, int], float] = {}
+        self._submitting = 0
+        self.instance_id = uuid.uuid4().hex
+        # Set while draining: another ready process of this shard answers new clicks
+        self.successor_live = False
 
     async def _initialize_db(self) -> None:
-        await self.conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS panels (
-                message_id BIGINT PRIMARY KEY,
-                channel_id BIGINT NOT NULL,
-                role_id BIGINT NOT NULL,
-                difficulty INTEGER NOT NULL
-            )
-            """
-        )
+        await apply_migrations(self.conn)
 
     async def cog_load(self) -> None:
         self._session = aiohttp.ClientSession()
         self.conn = await asyncpg.connect(**DB_CONFIG)
         await self._initialize_db()
+        await self.panels.start()
         async with self.conn.transaction():
-            rows = await self.conn.fetch("SELECT message_id, channel_id, role_id, difficulty FROM panels")
+            rows = await self.conn.fetch("SELECT message_id, guild_id, channel_id, role_id, difficulty FROM panels")
+            for row in rows:
+                info = PanelInfo(**dict(row))
+                self.panels.put(info)
+                self._register_view(info)
+        self.bot.supervisor.every("panelcache.report", PANEL_CACHE_REPORT_SECONDS, self._report_cache_stats, owner=self)
+        self.bot.supervisor.every("auth.prune_issued", 60, self._prune_issued, owner=self)
+        self.bot.supervisor.every("auth.heartbeat", HEARTBEAT_SECONDS, self._heartbeat, owner=self)
+
+    def challenge_issued(self, user_id: int, message_id: int) -> None:
+        self._issued[(user_id, message_id)] = time.monotonic()
+
+    @contextmanager
+    def submission(self, user_id: int, message_id: int):
+        self._submitting += 1
+        try:
+            yield
+        finally:
+            self._submitting -= 1
+            self._issued.pop((user_id, message_id), None)
+
+    async def _prune_issued(self) -> None:
+        cutoff = time.monotonic() - ISSUED_CHALLENGE_TTL_SECONDS
+        for key in [key for key, issued_at in self._issued.items() if issued_at < cutoff]:
+            del self._issued[key]
+
+    @property
+    def shard_id(self) -> int:
+        return self.bot.shard_id or 0
+
+    @property
+    def http_session(self) -> Optional[aiohttp.ClientSession]:
+        """Session used for CAPTCHA API requests (None outside cog_load/cog_unload)"""
+        return self._session
+
+    def panel_difficulties(self) -> set[int]:
+        """Difficulties of the panels this process has views for"""
+        return {view.difficulty for view in self._views.values()}
+
+    async def _heartbeat(self) -> None:
+        """Advertise this process as able to answer its shard's interactions"""
+        if self.draining or not self.bot.is_ready():
+            return
+        async with self.connection(BACKGROUND_GUILD_ID) as conn:
+            await conn.execute(
+                """
+                INSERT INTO shard_instances (instance_id, shard_id) VALUES ($1, $2)
+                ON CONFLICT (instance_id) DO UPDATE SET heartbeat_at = now()
+                """,
+                self.instance_id, self.shard_id
+            )
+            await conn.execute(
+                "DELETE FROM shard_instances WHERE heartbeat_at < now() - make_interval(secs => $1)",
+                HEARTBEAT_TIMEOUT_SECONDS * 20
+            )
+
+    async def _withdraw(self) -> None:
+        """Stop advertising this process, so that draining peers do not hand clicks to it"""
+        try:
+            async with self.connection(BACKGROUND_GUILD_ID) as conn:
+                await conn.execute("DELETE FROM shard_instances WHERE instance_id = $1", self.instance_id)
+        except Exception as e:
+            logger.warning("Could not withdraw shard heartbeat: %s", e)
+
+    async def _check_successor(self) -> bool:
+        """Whether another process of this shard has heartbeated recently"""
+        async with self.connection(BACKGROUND_GUILD_ID) as conn:
+            return await conn.fetchval(
+                """
+                SELECT EXISTS (
+                    SELECT 1 FROM shard_instances
+                    WHERE shard_id = $1 AND instance_id <> $2
+                    AND heartbeat_at > now() - make_interval(secs => $3)
+                )
+                """,
+                self.shard_id, self.instance_id, HEARTBEAT_TIMEOUT_SECONDS
+            )
+
+    async def _refresh_successor(self) -> None:
+        try:
+            self.successor_live = await self._check_successor()
+        except Exception as e:
+            logger.warning("Could not check for a successor process: %s", e)
+            self.successor_live = False
+
+    def _in_flight(self) -> tuple[int, int]:
+        """(submissions being processed, challenges recent enough that an answer may still come)"""
+        cutoff = time.monotonic() - DRAIN_CHALLENGE_GRACE_SECONDS
+        return self._submitting, sum(1 for issued_at in self._issued.values() if issued_at > cutoff)
+
+    async def drain(self, timeout: float) -> None:
+        """Stop issuing challenges and wait (up to timeout) for the ones already issued to be answered"""
+        self.draining = True
+        await self._withdraw()
+        if DRAIN_HANDOFF:
+            await self._refresh_successor()
+        submitting, waiting = self._in_flight()
+        logger.info(
+            "Draining: %d submissions in progress, %d challenges awaiting an answer, successor %s",
+            submitting, waiting, "live" if self.successor_live else "not seen"
+        )
+        deadline = time.monotonic() + timeout
+        next_check = time.monotonic() + SUCCESSOR_CHECK_SECONDS
+        while (submitting or waiting) and time.monotonic() < deadline:
+            await asyncio.sleep(DRAIN_POLL_SECONDS)
+            submitting, waiting = self._in_flight()
+            if DRAIN_HANDOFF and time.monotonic() >= next_check:
+                await self._refresh_successor()
+                next_check = time.monotonic() + SUCCESSOR_CHECK_SECONDS
+        if submitting or waiting:
+            logger.warning(
+                "Drain timed out: %d submissions in progress, %d challenges unanswered", submitting, waiting
+            )
+        else:
+            logger.info("Drain complete")
+
+    def schedulers(self) -> tuple[FairScheduler, ...]:
+        return self.captcha_scheduler, self.role_scheduler, self.db_scheduler
+
+    def scheduler_summary(self) -> dict[str, str]:
+        """Queue waits across all guilds, for /status"""
+        summary = {}
+        for scheduler in self.schedulers():
+            stats = scheduler.stats()
+            p95 = stats["wait_p95_ms"]
+            summary[f"Queue: {scheduler.name}"] = (
+                f"{stats['queued']} waiting ({stats['waiting_guilds']} guilds), "
+                f"p95 {'≤' + str(p95) if p95 is not None else '>10000'}ms"
+            )
+        return summary
+
+    @asynccontextmanager
+    async def connection(self, guild_id: int) -> AsyncIterator[asyncpg.Connection]:
+        """Exclusive use of the query connection, queueing fairly between guilds"""
+        async with self.db_scheduler.slot(guild_id):
+            async with self._conn_lock:
+                yield self.conn
+
+    async def get_panel(self, guild_id: int, message_id: int) -> Optional[PanelInfo]:
+        """Panel settings from the cache, queueing for the connection on a miss"""
+        if message_id in self.panels:
+            return await self.panels.get(message_id, self.conn)
+        async with self.connection(guild_id) as conn:
+            return await self.panels.get(message_id, conn)
+
+    def _register_view(self, info: PanelInfo) -> None:
+        view = PersistentAuthView(info.message_id, info.role_id, info.difficulty, self._session)
+        self._views[info.message_id] = view
+        self.bot.add_view(view)
+
+    def _on_panel_change(self, op: str, info: PanelInfo) -> None:
+        """Keep registered views in line with panel changes made by any process"""
+        if op == "DELETE":
+            view = self._views.pop(info.message_id, None)
+            if view:
+                view.stop()
+        elif info.message_id not in self._views:
+            self._register_view(info)
+
+    async def _report_cache_stats(self) -> None:
+        stats = self.panels.stats()
+        logger.info(
+            "Panel cache: %d entries, hit rate %.1f%% (%d hits / %d misses), %d invalidations",
+            stats["entries"], stats["hit_rate"] * 100, stats["hits"], stats["misses"], stats["invalidations"]
+        )
+
+    async def _backfill_guild_ids(self) -> None:
+        """Fill in guild_id for panels created before schema version 2.
+
+        Resolving a channel needs the Discord API, so this cannot be a SQL
+        migration. Once every row is filled in it costs one query at startup.
+        """
+        query = "SELECT DISTINCT channel_id FROM panels WHERE guild_id IS NULL"
+        async with self.connection(BACKGROUND_GUILD_ID) as conn:
+            if not await conn.fetch(query):
+                return
+            # Session-level lock, held until the backfill finishes
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", BACKFILL_LOCK_KEY):
+                logger.info("guild_id backfill is running in another process")
+                return
+        try:
+            # Re-read under the lock: another process may have finished in the meantime
+            async with self.connection(BACKGROUND_GUILD_ID) as conn:
+                rows = await conn.fetch(query)
+            resolved = 0
             for row in rows:
-                view = PersistentAuthView(row["message_id"], row["role_id"], row["difficulty"], self._session)
-                self.bot.add_view(view)
+                channel = self.bot.get_channel(row["channel_id"])
+                if channel is None:
+                    try:
+                        channel = await self.bot.fetch_channel(row["channel_id"])
+                    except discord.HTTPException as e:
+                        logger.warning("Could not resolve guild for channel %s: %s", row["channel_id"], e)
+                        continue
+                async with self.connection(BACKGROUND_GUILD_ID) as conn:
+                    await conn.execute(
+                        "UPDATE panels SET guild_id = $1, updated_at = now() WHERE channel_id = $2 AND guild_id IS NULL",
+                        channel.guild.id, row["channel_id"]
+                    )
+                resolved += 1
+            if rows:
+                logger.info("Backfilled guild_id for panels in %d of %d channels", resolved, len(rows))
+        finally:
+            async with self.connection(BACKGROUND_GUILD_ID) as conn:
+                await conn.execute("SELECT pg_advisory_unlock($1)", BACKFILL_LOCK_KEY)
+
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        if not self._backfilled:
+            self._backfilled = True
+            await self._backfill_guild_ids()
 
     async def cog_unload(self) -> None:
+        await self.panels.close()
         if self._session:
             await self._session.close()
             self._session = None
         if self.conn:
+            if not self.draining:
+                await self._withdraw()
             await self.conn.close()
             self.conn = None
 
@@ -184,13 +614,16 @@ class Auth(commands.Cog):
             color=discord.Color.green()
         )
         message = await interaction.channel.send(embed=embed)
-        view = PersistentAuthView(message.id, role.id, difficulty, self._session)
-        self.bot.add_view(view)
-        await message.edit(view=view)
-        await self.conn.execute(
-            "INSERT INTO panels (message_id, channel_id, role_id, difficulty) VALUES ($1, $2, $3, $4)",
-            message.id, interaction.channel.id, role.id, difficulty
-        )
+        info = PanelInfo(message.id, interaction.guild.id, interaction.channel.id, role.id, difficulty)
+        self.panels.put(info)
+        self._register_view(info)
+        await message.edit(view=self._views[message.id])
+        with tracing.span("db.panel_insert"):
+            async with self.connection(interaction.guild.id) as conn:
+                await conn.execute(
+                    "INSERT INTO panels (message_id, guild_id, channel_id, role_id, difficulty) VALUES ($1, $2, $3, $4, $5)",
+                    message.id, interaction.guild.id, interaction.channel.id, role.id, difficulty
+                )
         await interaction.response.send_message(SUCCESS_MESSAGES["panel_created"], ephemeral=True)
 
 async def setup(bot: commands.Bot) -> None:
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from typing import Final, Optional
+
+import asyncpg
+import discord
+from discord.ext import commands
+
+from src.panel.authpanel import DB_CONFIG
+
+PAGE_SIZE: Final[int] = 10
+VIEW_TIMEOUT_SECONDS: Final[int] = 300
+
+ERROR_MESSAGES: Final[dict] = {
+    "no_panels": "ℹ️ There are no authentication panels in this server.",
+    "db_error": "⚠️ An error occurred during database operation: {}"
+}
+
+# Keyset pagination over panels_guild_id_idx (guild_id, created_at, message_id)
+FIRST_PAGE_QUERY: Final[str] = """
+    SELECT message_id, channel_id, role_id, difficulty, created_at FROM panels
+    WHERE guild_id = $1
+    ORDER BY created_at, message_id
+    LIMIT $2
+"""
+NEXT_PAGE_QUERY: Final[str] = """
+    SELECT message_id, channel_id, role_id, difficulty, created_at FROM panels
+    WHERE guild_id = $1 AND (created_at, message_id) > ($2, $3)
+    ORDER BY created_at, message_id
+    LIMIT $4
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class PanelListView(discord.ui.View):
+    def __init__(self, cog: "AuthList", guild: discord.Guild, rows: list, has_next: bool):
+        super().__init__(timeout=VIEW_TIMEOUT_SECONDS)
+        self.cog = cog
+        self.guild = guild
+        self.rows = rows
+        self.has_next = has_next
+        # Cursor (created_at, message_id) of the row before each visited page; None for the first page
+        self.cursors: list[Optional[tuple]] = [None]
+        self._update_buttons()
+
+    def _update_buttons(self) -> None:
+        self.previous_page.disabled = len(self.cursors) <= 1
+        self.next_page.disabled = not self.has_next
+
+    def create_embed(self) -> discord.Embed:
+        embed = discord.Embed(
+            title="Authentication Panels",
+            color=discord.Color.green()
+        )
+        for row in self.rows:
+            link = f"https://discord.com/channels/{self.guild.id}/{row['channel_id']}/{row['message_id']}"
+            embed.add_field(
+                name=f"Panel {row['message_id']}",
+                value=(
+                    f"<#{row['channel_id']}> · <@&{row['role_id']}> · difficulty {row['difficulty']}\n"
+                    f"Created {discord.utils.format_dt(row['created_at'], 'R')} · [Jump]({link})"
+                ),
+                inline=False
+            )
+        embed.set_footer(text=f"Page {len(self.cursors)}")
+        return embed
+
+    async def _show(self, interaction: discord.Interaction, cursor: Optional[tuple]) -> None:
+        self.rows, self.has_next = await self.cog.fetch_page(self.guild.id, cursor)
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.create_embed(), view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        self.cursors.pop()
+        await self._show(interaction, self.cursors[-1])
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        last = self.rows[-1]
+        cursor = (last["created_at"], last["message_id"])
+        self.cursors.append(cursor)
+        await self._show(interaction, cursor)
+
+
+class AuthList(commands.Cog):
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self.conn: Optional[asyncpg.Connection] = None
+        # Pages for different users are fetched over one connection, which runs one query at a time
+        self._conn_lock = asyncio.Lock()
+
+    async def cog_load(self) -> None:
+        self.conn = await asyncpg.connect(**DB_CONFIG)
+
+    async def cog_unload(self) -> None:
+        if self.conn:
+            await self.conn.close()
+            self.conn = None
+
+    async def fetch_page(self, guild_id: int, cursor: Optional[tuple]) -> tuple[list, bool]:
+        """Returns one page of panels and whether another page follows"""
+        async with self._conn_lock:
+            if cursor is None:
+                rows = await self.conn.fetch(FIRST_PAGE_QUERY, guild_id, PAGE_SIZE + 1)
+            else:
+                rows = await self.conn.fetch(NEXT_PAGE_QUERY, guild_id, cursor[0], cursor[1], PAGE_SIZE + 1)
+        return rows[:PAGE_SIZE], len(rows) > PAGE_SIZE
+
+    @discord.app_commands.command(
+        name="apanel_list",
+        description="Lists the authentication panels in this server"
+    )
+    @discord.app_commands.default_permissions(administrator=True)
+    async def list_auth_panels(self, interaction: discord.Interaction) -> None:
+        try:
+            rows, has_next = await self.fetch_page(interaction.guild.id, None)
+        except Exception as e:
+            logger.error(f"Error listing auth panels: {e}", exc_info=True)
+            await interaction.response.send_message(ERROR_MESSAGES["db_error"].format(str(e)), ephemeral=True)
+            return
+
+        if not rows:
+            await interaction.response.send_message(ERROR_MESSAGES["no_panels"], ephemeral=True)
+            return
+
+        view = PanelListView(self, interaction.guild, rows, has_next)
+        await interaction.response.send_message(embed=view.create_embed(), view=view, ephemeral=True)
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(AuthList(bot))
@@ -5,6 +5,7 @@ import asyncpg
 import discord
 from discord.ext import commands
 
+from src.lib import tracing
 from src.panel.authpanel import DB_CONFIG
 
 logger = logging.getLogger(__name__)
@@ -45,10 +46,11 @@ class AuthRemove(commands.Cog):
             message_id_int = int(message_id)
             
             # Retrieve the panel information from the database
-            row = await self.conn.fetchrow(
-                "SELECT channel_id FROM panels WHERE message_id = $1", 
-                message_id_int
-            )
+            with tracing.span("db.panel_lookup"):
+                row = await self.conn.fetchrow(
+                    "SELECT channel_id FROM panels WHERE message_id = $1", 
+                    message_id_int
+                )
                 
             if not row:
                 await interaction.response.send_message(ERROR_MESSAGES["not_found"], ephemeral=True)
@@ -73,7 +75,12 @@ class AuthRemove(commands.Cog):
                 return
             
             # Delete from the database
-            await self.conn.execute("DELETE FROM panels WHERE message_id = $1", message_id_int)
+            with tracing.span("db.panel_delete"):
+                await self.conn.execute("DELETE FROM panels WHERE message_id = $1", message_id_int)
+                # The panel's statistics would otherwise stay in memory and in panel_stats forever
+                stats = self.bot.get_cog("AuthStats")
+                if stats:
+                    await stats.forget_panel(interaction.guild.id, message_id_int)
             
             await interaction.response.send_message(SUCCESS_MESSAGES["panel_removed"], ephemeral=True)
             
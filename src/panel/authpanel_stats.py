@@ -0,0 +1,225 @@
+import asyncio
+import logging
+from typing import Final, Optional
+
+import asyncpg
+import discord
+from discord.ext import commands
+
+from src.lib import histogram
+from src.lib.migrations import apply_migrations
+from src.panel.authpanel import DB_CONFIG, MAX_DIFFICULTY
+
+# Solve time buckets (ms); changing them is tolerated by from_row() for rows already stored
+SOLVE_TIME_BUCKETS_MS: Final[tuple] = (
+    1000, 2000, 3000, 4000, 5000, 7500, 10000, 15000, 20000,
+    30000, 45000, 60000, 90000, 120000, 300000
+)
+CHECKPOINT_INTERVAL_SECONDS: Final[int] = 60
+# panel_id used for the per-guild aggregate row
+GUILD_TOTAL: Final[int] = 0
+
+ERROR_MESSAGES: Final[dict] = {
+    "invalid_id": "⚠️ Please enter a valid message ID.",
+    "no_data": "ℹ️ No verification attempts have been recorded yet."
+}
+
+logger = logging.getLogger(__name__)
+
+
+class RunningStats:
+    """Incrementally maintained aggregate for one panel (or one whole guild)"""
+
+    __slots__ = ("attempts", "passes", "solve_hist", "difficulty_counts", "dirty")
+
+    def __init__(self) -> None:
+        self.attempts = 0
+        self.passes = 0
+        self.solve_hist = histogram.new_histogram(SOLVE_TIME_BUCKETS_MS)
+        self.difficulty_counts = [0] * MAX_DIFFICULTY
+        self.dirty = False
+
+    def observe(self, passed: bool, solve_ms: int, difficulty: int) -> None:
+        self.attempts += 1
+        if passed:
+            self.passes += 1
+        histogram.observe(SOLVE_TIME_BUCKETS_MS, self.solve_hist, solve_ms)
+        self.difficulty_counts[difficulty - 1] += 1
+        self.dirty = True
+
+    @property
+    def pass_rate(self) -> float:
+        return self.passes / self.attempts if self.attempts else 0.0
+
+    def quantile(self, q: float) -> Optional[int]:
+        """Solve time quantile in ms, as a bucket upper bound"""
+        return histogram.quantile(SOLVE_TIME_BUCKETS_MS, self.solve_hist, q)
+
+    @classmethod
+    def from_row(cls, row: asyncpg.Record) -> "RunningStats":
+        stats = cls()
+        stats.attempts = row["attempts"]
+        stats.passes = row["passes"]
+        # Tolerate rows written with a different bucket layout
+        for i, count in enumerate(row["solve_hist"][:len(stats.solve_hist)]):
+            stats.solve_hist[i] = count
+        for i, count in enumerate(row["difficulty_counts"][:MAX_DIFFICULTY]):
+            stats.difficulty_counts[i] = count
+        return stats
+
+
+def _format_ms(value: Optional[int]) -> str:
+    if value is None:
+        return f"> {SOLVE_TIME_BUCKETS_MS[-1] // 1000}s"
+    return f"≤ {value / 1000:g}s"
+
+
+class AuthStats(commands.Cog):
+    """Per-guild and per-panel verification analytics"""
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self.conn: Optional[asyncpg.Connection] = None
+        self._stats: dict[tuple[int, int], RunningStats] = {}
+        # Checkpoints and panel deletions share the connection, which runs one query at a time
+        self._conn_lock = asyncio.Lock()
+
+    async def _initialize_db(self) -> None:
+        await apply_migrations(self.conn)
+
+    async def cog_load(self) -> None:
+        self.conn = await asyncpg.connect(**DB_CONFIG)
+        await self._initialize_db()
+        rows = await self.conn.fetch(
+            "SELECT guild_id, panel_id, attempts, passes, solve_hist, difficulty_counts FROM panel_stats"
+        )
+        for row in rows:
+            self._stats[(row["guild_id"], row["panel_id"])] = RunningStats.from_row(row)
+        # Failed checkpoints are logged and counted by the supervisor, and retried on the next run
+        self.bot.supervisor.every("stats.checkpoint", CHECKPOINT_INTERVAL_SECONDS, self.checkpoint, owner=self)
+
+    async def cog_unload(self) -> None:
+        if self.conn:
+            await self.checkpoint()
+            await self.conn.close()
+            self.conn = None
+
+    def aggregate_count(self) -> int:
+        """Aggregates held in memory (one per panel plus one per guild)"""
+        return len(self._stats)
+
+    def attempts(self, guild_id: int, panel_id: int) -> int:
+        stats = self._stats.get((guild_id, panel_id))
+        return stats.attempts if stats else 0
+
+    def _get(self, guild_id: int, panel_id: int) -> RunningStats:
+        stats = self._stats.get((guild_id, panel_id))
+        if stats is None:
+            stats = self._stats[(guild_id, panel_id)] = RunningStats()
+        return stats
+
+    def observe(self, guild_id: int, panel_id: int, passed: bool, solve_ms: int, difficulty: int) -> None:
+        self._get(guild_id, panel_id).observe(passed, solve_ms, difficulty)
+        self._get(guild_id, GUILD_TOTAL).observe(passed, solve_ms, difficulty)
+
+    async def forget_panel(self, guild_id: int, panel_id: int) -> None:
+        """Drop the aggregate of a deleted panel; the guild total keeps its attempts"""
+        async with self._conn_lock:
+            self._stats.pop((guild_id, panel_id), None)
+            if self.conn:
+                await self.conn.execute(
+                    "DELETE FROM panel_stats WHERE guild_id = $1 AND panel_id = $2", guild_id, panel_id
+                )
+
+    async def checkpoint(self) -> None:
+        async with self._conn_lock:
+            await self._checkpoint()
+
+    async def _checkpoint(self) -> None:
+        """Write every aggregate changed since the last checkpoint"""
+        dirty = [(key, stats) for key, stats in self._stats.items() if stats.dirty]
+        if not dirty or not self.conn:
+            return
+        for _, stats in dirty:
+            stats.dirty = False
+        try:
+            await self.conn.executemany(
+                """
+                INSERT INTO panel_stats (guild_id, panel_id, attempts, passes, solve_hist, difficulty_counts, updated_at)
+                VALUES ($1, $2, $3, $4, $5, $6, now())
+                ON CONFLICT (guild_id, panel_id) DO UPDATE SET
+                    attempts = EXCLUDED.attempts,
+                    passes = EXCLUDED.passes,
+                    solve_hist = EXCLUDED.solve_hist,
+                    difficulty_counts = EXCLUDED.difficulty_counts,
+                    updated_at = EXCLUDED.updated_at
+                """,
+                [
+                    (guild_id, panel_id, stats.attempts, stats.passes, list(stats.solve_hist), list(stats.difficulty_counts))
+                    for (guild_id, panel_id), stats in dirty
+                ]
+            )
+        except Exception:
+            # Retry on the next checkpoint
+            for _, stats in dirty:
+                stats.dirty = True
+            raise
+
+    def _create_stats_embed(self, title: str, stats: RunningStats) -> discord.Embed:
+        embed = discord.Embed(title=title, color=discord.Color.green())
+        embed.add_field(name="Attempts", value=str(stats.attempts), inline=True)
+        embed.add_field(name="Pass Rate", value=f"{stats.pass_rate:.1%}", inline=True)
+        embed.add_field(name="Median Solve Time", value=_format_ms(stats.quantile(0.5)), inline=True)
+        embed.add_field(name="p95 Solve Time", value=_format_ms(stats.quantile(0.95)), inline=True)
+
+        distribution = "\n".join(
+            f"`{difficulty:>2}` {count} ({count / stats.attempts:.0%})"
+            for difficulty, count in enumerate(stats.difficulty_counts, start=1)
+            if count
+        )
+        embed.add_field(name="Difficulty Distribution", value=distribution or "-", inline=False)
+        return embed
+
+    @discord.app_commands.command(
+        name="apanel_stats",
+        description="Shows verification statistics for this server or a single panel"
+    )
+    @discord.app_commands.default_permissions(administrator=True)
+    @discord.app_commands.describe(
+        message_id="The message ID of an authentication panel (omit for the whole server)"
+    )
+    async def show_stats(self, interaction: discord.Interaction, message_id: Optional[str] = None) -> None:
+        if message_id is None:
+            panel_id = GUILD_TOTAL
+            title = f"Verification Stats: {interaction.guild.name}"
+        else:
+            try:
+                panel_id = int(message_id)
+            except ValueError:
+                await interaction.response.send_message(ERROR_MESSAGES["invalid_id"], ephemeral=True)
+                return
+            title = f"Verification Stats: Panel {panel_id}"
+
+        stats = self._stats.get((interaction.guild.id, panel_id))
+        if not stats or not stats.attempts:
+            await interaction.response.send_message(ERROR_MESSAGES["no_data"], ephemeral=True)
+            return
+
+        embed = self._create_stats_embed(title, stats)
+        auth = interaction.client.get_cog("Auth")
+        if auth and panel_id == GUILD_TOTAL:
+            # Time this server's verifications spent queued behind its own traffic
+            for scheduler in auth.schedulers():
+                waits = scheduler.waits.get(interaction.guild.id)
+                if waits and waits.count:
+                    p95 = waits.quantile(0.95)
+                    embed.add_field(
+                        name=f"Queue Wait p95 ({scheduler.name})",
+                        value=f"≤ {p95}ms" if p95 is not None else "> 10s",
+                        inline=True
+                    )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(AuthStats(bot))
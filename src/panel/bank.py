@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import os
+from typing import Final, Optional
+
+import aiohttp
+from discord.ext import commands
+
+from src.lib.challengebank import DEFAULT_DIRECTORY, BankLocked, BankedChallenge, ChallengeBank
+from src.panel.authpanel import BACKGROUND_GUILD_ID, request_captcha
+
+CHALLENGE_BANK_DIR: Final[str] = os.getenv("CHALLENGE_BANK_DIR", DEFAULT_DIRECTORY)
+# Challenges kept per difficulty in use; refilled when below half of this
+CHALLENGE_BANK_TARGET: Final[int] = int(os.getenv("CHALLENGE_BANK_TARGET", 20))
+CHALLENGE_BANK_TTL_SECONDS: Final[int] = int(float(os.getenv("CHALLENGE_BANK_TTL_HOURS", 24)) * 3600)
+REFILL_INTERVAL_SECONDS: Final[int] = 60
+# Pause between refill fetches so a refill never competes with live clicks for the CAPTCHA API
+REFILL_PACING_SECONDS: Final[float] = 0.5
+COMPACT_DEAD_RATIO: Final[float] = 0.5
+COMPACT_MIN_BYTES: Final[int] = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class ChallengeBankCog(commands.Cog):
+    """Serves challenges from the on-disk bank when no prewarmed one exists, and keeps it filled"""
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self.bank = ChallengeBank(CHALLENGE_BANK_DIR)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.opened = False
+        self.misses = 0
+
+    async def cog_load(self) -> None:
+        await self._open()
+        self._session = aiohttp.ClientSession()
+        self.bot.supervisor.every("bank.refill", REFILL_INTERVAL_SECONDS, self._maintain, owner=self, initial_delay=0)
+
+    async def cog_unload(self) -> None:
+        if self._session:
+            await self._session.close()
+            self._session = None
+        self.bank.close()
+
+    async def _open(self) -> bool:
+        try:
+            await asyncio.to_thread(self.bank.open)
+        except BankLocked as e:
+            # Until the holder exits, clicks fall through to a live fetch; _maintain retries
+            logger.warning("Challenge bank disabled: %s", e)
+            return False
+        self.opened = True
+        logger.info("Challenge bank opened with %s challenges available", sum(self.bank.available().values()))
+        return True
+
+    def take(self, difficulty: int) -> Optional[BankedChallenge]:
+        challenge = self.bank.take(difficulty)
+        if challenge is None:
+            self.misses += 1
+        return challenge
+
+    async def _refill(self) -> None:
+        auth = self.bot.get_cog("Auth")
+        if not auth or auth.draining:
+            return
+        available = self.bank.available()
+        for difficulty in sorted(auth.panel_difficulties()):
+            stock = available.get(difficulty, 0)
+            if stock >= CHALLENGE_BANK_TARGET // 2:
+                continue
+            for _ in range(CHALLENGE_BANK_TARGET - stock):
+                async with auth.captcha_scheduler.slot(BACKGROUND_GUILD_ID):
+                    image, answer, error = await request_captcha(self._session, difficulty)
+                if error:
+                    logger.warning("Challenge bank refill for difficulty %d stopped: %s", difficulty, error)
+                    break
+                self.bank.add(difficulty, answer, image, CHALLENGE_BANK_TTL_SECONDS)
+                await asyncio.sleep(REFILL_PACING_SECONDS)
+
+    async def _maintain(self) -> None:
+        if not self.opened and not await self._open():
+            return
+        await self._refill()
+        if self.bank.data_size >= COMPACT_MIN_BYTES and self.bank.dead_ratio() >= COMPACT_DEAD_RATIO:
+            self.bot.supervisor.spawn("bank.compact", self.bank.compact(), owner=self)
+
+    def stats(self) -> dict[str, float]:
+        available = self.bank.available()
+        lookups = self.bank.served + self.misses
+        return {
+            "available": sum(available.values()),
+            "served": self.bank.served,
+            "misses": self.misses,
+            "hit_rate": self.bank.served / lookups if lookups else 0.0,
+            "dead_ratio": self.bank.dead_ratio(),
+        }
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(ChallengeBankCog(bot))
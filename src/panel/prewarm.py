@@ -0,0 +1,177 @@
+import logging
+import os
+import time
+from typing import Final, NamedTuple, Optional
+
+import aiohttp
+import discord
+from discord.ext import commands
+
+from src.panel.authpanel import BACKGROUND_GUILD_ID, request_captcha
+
+PREWARM_TTL_SECONDS: Final[int] = int(os.getenv("PREWARM_TTL_SECONDS", 180))
+# Outstanding (pending or ready) challenges per guild; protects the CAPTCHA API during raids
+PREWARM_GUILD_CAP: Final[int] = int(os.getenv("PREWARM_GUILD_CAP", 50))
+# Concurrent prewarm fetches, so a raid cannot crowd out CAPTCHA requests from clicks
+PREWARM_CONCURRENCY: Final[int] = int(os.getenv("PREWARM_CONCURRENCY", 8))
+SWEEP_INTERVAL_SECONDS: Final[int] = 30
+REPORT_INTERVAL_SECONDS: Final[int] = 600
+
+logger = logging.getLogger(__name__)
+
+
+class PreparedChallenge(NamedTuple):
+    image: bytes
+    answer: str
+    difficulty: int
+    expires_at: float
+
+
+class ChallengePrewarmer(commands.Cog):
+    """Prepares a challenge for new members of guilds with panels, so the first click is served instantly"""
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self._session: Optional[aiohttp.ClientSession] = None
+        # (guild_id, user_id, message_id) -> challenge
+        self._ready: dict[tuple[int, int, int], PreparedChallenge] = {}
+        self._outstanding: dict[int, int] = {}
+        self._last_report = time.monotonic()
+        self.metrics = {
+            "prepared": 0,
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "abandoned": 0,
+            "stale": 0,
+            "capped": 0,
+            "busy": 0,
+            "failed": 0,
+        }
+
+    async def cog_load(self) -> None:
+        self._session = aiohttp.ClientSession()
+        self.bot.supervisor.set_group_limit("prewarm.prepare", PREWARM_CONCURRENCY)
+        self.bot.supervisor.every("prewarm.sweep", SWEEP_INTERVAL_SECONDS, self._sweep, owner=self)
+
+    async def cog_unload(self) -> None:
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    def _release(self, guild_id: int) -> None:
+        remaining = self._outstanding.get(guild_id, 0) - 1
+        if remaining > 0:
+            self._outstanding[guild_id] = remaining
+        else:
+            self._outstanding.pop(guild_id, None)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member) -> None:
+        if member.bot:
+            return
+        auth = self.bot.get_cog("Auth")
+        if not auth or auth.draining:
+            return
+        panels = auth.panels.guild_panels(member.guild.id)
+        if not panels:
+            return
+        if auth.captcha_scheduler.queued(member.guild.id):
+            # Clicks are already waiting for the CAPTCHA API; a prefetch would only lengthen their wait
+            self.metrics["busy"] += 1
+            return
+        if self._outstanding.get(member.guild.id, 0) >= PREWARM_GUILD_CAP:
+            self.metrics["capped"] += 1
+            return
+        # One challenge per join, for the panel new members are most likely to use
+        stats = self.bot.get_cog("AuthStats")
+        if stats:
+            panel = max(panels, key=lambda panel: stats.attempts(member.guild.id, panel.message_id))
+        else:
+            panel = panels[0]
+        self._outstanding[member.guild.id] = self._outstanding.get(member.guild.id, 0) + 1
+        self.bot.supervisor.spawn(
+            "prewarm.prepare",
+            self._prepare(member.guild.id, member.id, panel.message_id, panel.difficulty),
+            owner=self,
+            group="prewarm.prepare"
+        )
+
+    async def _prepare(self, guild_id: int, user_id: int, message_id: int, difficulty: int) -> None:
+        auth = self.bot.get_cog("Auth")
+        if auth is None:
+            self._release(guild_id)
+            return
+        if auth.captcha_scheduler.queued(guild_id):
+            self.metrics["busy"] += 1
+            self._release(guild_id)
+            return
+        # Prefetches share the low-weight background key with bank refills, never the guild's click queue
+        async with auth.captcha_scheduler.slot(BACKGROUND_GUILD_ID):
+            image, answer, error = await request_captcha(self._session, difficulty)
+        if error:
+            self.metrics["failed"] += 1
+            self._release(guild_id)
+            return
+        key = (guild_id, user_id, message_id)
+        if key in self._ready:
+            self._release(guild_id)
+            return
+        self._ready[key] = PreparedChallenge(image, answer, difficulty, time.monotonic() + PREWARM_TTL_SECONDS)
+        self.metrics["prepared"] += 1
+
+    def claim(self, guild_id: int, user_id: int, message_id: int, difficulty: int) -> Optional[PreparedChallenge]:
+        """Take the challenge reserved for this member and panel, if it is still usable"""
+        challenge = self._ready.pop((guild_id, user_id, message_id), None)
+        if challenge is None:
+            self.metrics["misses"] += 1
+            return None
+        self._release(guild_id)
+        if challenge.expires_at < time.monotonic():
+            self.metrics["expired"] += 1
+            self.metrics["misses"] += 1
+            return None
+        if challenge.difficulty != difficulty:
+            # The panel was changed after the challenge was prepared
+            self.metrics["stale"] += 1
+            self.metrics["misses"] += 1
+            return None
+        self.metrics["hits"] += 1
+        return challenge
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent) -> None:
+        for key in [key for key in self._ready if key[0] == payload.guild_id and key[1] == payload.user.id]:
+            del self._ready[key]
+            self._release(payload.guild_id)
+            self.metrics["abandoned"] += 1
+
+    def stats(self) -> dict[str, float]:
+        prepared = self.metrics["prepared"]
+        wasted = self.metrics["expired"] + self.metrics["abandoned"] + self.metrics["stale"]
+        return {
+            **self.metrics,
+            "ready": len(self._ready),
+            "hit_rate": self.metrics["hits"] / prepared if prepared else 0.0,
+            "wasted": wasted,
+        }
+
+    async def _sweep(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, challenge in self._ready.items() if challenge.expires_at < now]:
+            del self._ready[key]
+            self._release(key[0])
+            self.metrics["expired"] += 1
+
+        if now - self._last_report >= REPORT_INTERVAL_SECONDS:
+            self._last_report = now
+            stats = self.stats()
+            logger.info(
+                "Challenge prewarm: %d prepared, %d hits (%.1f%%), %d wasted, %d capped, %d busy, %d failed",
+                stats["prepared"], stats["hits"], stats["hit_rate"] * 100,
+                stats["wasted"], stats["capped"], stats["busy"], stats["failed"]
+            )
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(ChallengePrewarmer(bot))
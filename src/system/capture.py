@@ -0,0 +1,39 @@
+import logging
+import os
+
+from discord.ext import commands
+
+from src.lib import tracecapture, tracing
+from src.lib.tracecapture import TraceRecorder
+
+logger = logging.getLogger(__name__)
+
+
+class TraceCapture(commands.Cog):
+    """Records anonymized interaction traces to TRACE_CAPTURE_DIR when it is set"""
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self.recorder = None
+
+    async def cog_load(self) -> None:
+        if not tracecapture.CAPTURE_DIR:
+            return
+        os.makedirs(tracecapture.CAPTURE_DIR, exist_ok=True)
+        self.recorder = TraceRecorder(tracecapture.CAPTURE_DIR)
+        tracing.add_finish_hook(self.recorder.observe)
+        self.bot.supervisor.every(
+            "tracecapture.flush", tracecapture.FLUSH_INTERVAL_SECONDS, self.recorder.flush, owner=self
+        )
+        logger.info("Capturing interaction traces to %s", tracecapture.CAPTURE_DIR)
+
+    async def cog_unload(self) -> None:
+        if self.recorder is None:
+            return
+        tracing.remove_finish_hook(self.recorder.observe)
+        await self.recorder.flush()
+        logger.info("Trace capture stopped: %s", self.recorder.stats())
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(TraceCapture(bot))
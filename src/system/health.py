@@ -0,0 +1,233 @@
+"""Periodic dependency probes with liveness and readiness endpoints.
+
+Probes run under the supervisor and cache their last result; nothing probes a
+dependency on request. When HEALTH_PORT is set, a small HTTP listener serves:
+
+* /livez   200 while the event loop answers and the probes keep running
+* /readyz  200 when every readiness probe passed recently and the process
+           is not draining; otherwise 503. Both return the cached results as
+           JSON.
+
+The CAPTCHA API is a third-party service: it is probed with a HEAD request
+and only reported in /status, so an outage there does not take every shard
+out of rotation. /status reads the same results and shows a result as
+unknown once it is older than STATUS_MAX_AGE_INTERVALS.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from typing import Any, Callable, Dict, Final, Optional
+
+from aiohttp import web
+from discord.ext import commands
+
+HEALTH_HOST: Final[str] = os.getenv("HEALTH_HOST", "0.0.0.0")
+HEALTH_PORT: Final[Optional[int]] = int(os.getenv("HEALTH_PORT")) if os.getenv("HEALTH_PORT") else None
+PROBE_INTERVAL_SECONDS: Final[float] = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", 10))
+# Third-party service; probed less often
+CAPTCHA_PROBE_INTERVAL_SECONDS: Final[float] = float(os.getenv("HEALTH_CAPTCHA_PROBE_INTERVAL_SECONDS", 60))
+PROBE_TIMEOUT_SECONDS: Final[float] = 5.0
+GATEWAY_MAX_LATENCY_SECONDS: Final[float] = 5.0
+LOOP_LAG_LIMIT_SECONDS: Final[float] = int(os.getenv("HEALTH_LOOP_LAG_LIMIT_MS", 1000)) / 1000
+# A result older than this many intervals counts as failed (the probe itself is stuck)
+STALE_INTERVALS: Final[int] = 3
+# /status shows results older than this many intervals as unknown
+STATUS_MAX_AGE_INTERVALS: Final[int] = 2
+# Reported in /status but not part of readiness
+STATUS_ONLY_PROBES: Final[frozenset] = frozenset({"captcha_api"})
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeResult:
+    __slots__ = ("ok", "detail", "latency_ms", "checked_at")
+
+    def __init__(self, ok: bool, detail: str, latency_ms: Optional[float] = None) -> None:
+        self.ok = ok
+        self.detail = detail
+        self.latency_ms = latency_ms
+        self.checked_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ok": self.ok,
+            "detail": self.detail,
+            "latency_ms": None if self.latency_ms is None else round(self.latency_ms, 1),
+            "age_seconds": round(time.time() - self.checked_at, 1),
+        }
+
+
+class Health(commands.Cog):
+    """Caches dependency probe results and serves them to orchestrators and /status"""
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self.results: Dict[str, ProbeResult] = {}
+        self._intervals: Dict[str, float] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+    async def cog_load(self) -> None:
+        self._add_probe("gateway", PROBE_INTERVAL_SECONDS, self._probe_gateway)
+        self._add_probe("postgres", PROBE_INTERVAL_SECONDS, self._probe_postgres)
+        self._add_probe("captcha_api", CAPTCHA_PROBE_INTERVAL_SECONDS, self._probe_captcha_api)
+        self._add_probe("loop", PROBE_INTERVAL_SECONDS, self._probe_loop)
+        if HEALTH_PORT is not None:
+            app = web.Application()
+            app.router.add_get("/livez", self._livez)
+            app.router.add_get("/readyz", self._readyz)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, HEALTH_HOST, HEALTH_PORT).start()
+            logger.info("Health endpoints listening on %s:%d", HEALTH_HOST, HEALTH_PORT)
+
+    async def cog_unload(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _add_probe(self, name: str, interval: float, probe: Callable) -> None:
+        self._intervals[name] = interval
+
+        async def run() -> None:
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(probe(), PROBE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                result = ProbeResult(False, f"timed out after {PROBE_TIMEOUT_SECONDS:.0f}s")
+            except Exception as e:
+                result = ProbeResult(False, f"{type(e).__name__}: {e}")
+            if result.latency_ms is None:
+                result.latency_ms = (time.perf_counter() - start) * 1000
+            previous = self.results.get(name)
+            if previous is not None and previous.ok != result.ok:
+                log = logger.info if result.ok else logger.warning
+                log("Health probe %s is now %s: %s", name, "passing" if result.ok else "failing", result.detail)
+            self.results[name] = result
+
+        self.bot.supervisor.every(f"health.{name}", interval, run, owner=self, initial_delay=0)
+
+    async def _probe_gateway(self) -> ProbeResult:
+        shards = getattr(self.bot, "shards", None)
+        if shards:
+            states = {shard_id: (shard.is_closed(), shard.latency) for shard_id, shard in shards.items()}
+        else:
+            states = {self.bot.shard_id or 0: (self.bot.is_closed() or self.bot.ws is None, self.bot.latency)}
+        down = [
+            shard_id for shard_id, (closed, latency) in states.items()
+            if closed or not math.isfinite(latency) or latency > GATEWAY_MAX_LATENCY_SECONDS
+        ]
+        if not self.bot.is_ready():
+            return ProbeResult(False, "not ready")
+        if down:
+            return ProbeResult(False, f"shards {', '.join(map(str, sorted(down)))} disconnected or lagging")
+        worst = max(latency for _, latency in states.values())
+        return ProbeResult(True, f"{len(states)} shards connected", worst * 1000)
+
+    async def _probe_postgres(self) -> ProbeResult:
+        auth = self.bot.get_cog("Auth")
+        if auth is None or auth.conn is None or auth.conn.is_closed():
+            return ProbeResult(False, "connection closed")
+        from src.panel.authpanel import BACKGROUND_GUILD_ID
+
+        # The connection runs one query at a time, so queue for it like any background query
+        async with auth.connection(BACKGROUND_GUILD_ID) as conn:
+            start = time.perf_counter()
+            await conn.fetchval("SELECT 1")
+            return ProbeResult(True, "ok", (time.perf_counter() - start) * 1000)
+
+    async def _probe_captcha_api(self) -> ProbeResult:
+        auth = self.bot.get_cog("Auth")
+        if auth is None or auth.http_session is None:
+            return ProbeResult(False, "no HTTP session")
+        from src.panel.authpanel import API_BASE_URL
+
+        # HEAD without a difficulty does not render a challenge; any answer below 500 means the API is up
+        start = time.perf_counter()
+        async with auth.http_session.head(API_BASE_URL, allow_redirects=False) as response:
+            pass
+        latency_ms = (time.perf_counter() - start) * 1000
+        if response.status >= 500:
+            return ProbeResult(False, f"HTTP {response.status}", latency_ms)
+        return ProbeResult(True, "ok", latency_ms)
+
+    async def _probe_loop(self) -> ProbeResult:
+        loop_monitor = self.bot.get_cog("LoopMonitor")
+        lag = loop_monitor.recent_lag() if loop_monitor else None
+        if lag is None:
+            return ProbeResult(True, "not measured")
+        if lag > LOOP_LAG_LIMIT_SECONDS:
+            return ProbeResult(False, f"lag {lag * 1000:.0f}ms over {LOOP_LAG_LIMIT_SECONDS * 1000:.0f}ms", lag * 1000)
+        return ProbeResult(True, "ok", lag * 1000)
+
+    def _is_fresh(self, name: str, result: ProbeResult, intervals: int = STALE_INTERVALS) -> bool:
+        return time.time() - result.checked_at <= self._intervals[name] * intervals
+
+    def is_draining(self) -> bool:
+        auth = self.bot.get_cog("Auth")
+        return self.bot.draining or (auth is not None and auth.draining)
+
+    def is_ready(self) -> bool:
+        if self.is_draining():
+            return False
+        for name in self._intervals:
+            if name in STATUS_ONLY_PROBES:
+                continue
+            result = self.results.get(name)
+            if result is None or not result.ok or not self._is_fresh(name, result):
+                return False
+        return True
+
+    def is_healthy(self) -> bool:
+        """Every probe, including status-only ones, passed within STATUS_MAX_AGE_INTERVALS (for /status)"""
+        for name in self._intervals:
+            result = self.results.get(name)
+            if result is None or not result.ok or not self._is_fresh(name, result, STATUS_MAX_AGE_INTERVALS):
+                return False
+        return True
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready(),
+            "draining": self.is_draining(),
+            "checks": {
+                name: {
+                    **result.to_dict(),
+                    "stale": not self._is_fresh(name, result),
+                    "readiness": name not in STATUS_ONLY_PROBES,
+                }
+                for name, result in self.results.items()
+            },
+        }
+
+    def summary(self) -> Dict[str, str]:
+        """One line per probe, for /status"""
+        summary = {}
+        for name in self._intervals:
+            result = self.results.get(name)
+            if result is None:
+                summary[name] = "pending"
+            elif not self._is_fresh(name, result, STATUS_MAX_AGE_INTERVALS):
+                summary[name] = f"unknown (last checked {time.time() - result.checked_at:.0f}s ago: {result.detail})"
+            elif not result.ok:
+                summary[name] = f"FAILING: {result.detail}"
+            elif result.detail == "ok":
+                summary[name] = f"{result.latency_ms:.0f}ms"
+            else:
+                summary[name] = f"{result.detail} ({result.latency_ms:.0f}ms)"
+        return summary
+
+    async def _livez(self, request: web.Request) -> web.Response:
+        # Answering at all shows the loop is alive; stuck probes mean the supervisor is not running them
+        stuck = [name for name, result in self.results.items() if not self._is_fresh(name, result)]
+        status = 503 if stuck else 200
+        return web.json_response({"alive": not stuck, "stale_checks": stuck}, status=status)
+
+    async def _readyz(self, request: web.Request) -> web.Response:
+        report = self.report()
+        return web.json_response(report, status=200 if report["ready"] else 503)
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(Health(bot))
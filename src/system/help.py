@@ -30,7 +30,9 @@ class Help(commands.Cog):
             name="AuthShield panel commands",
             value=(
                 "**`/apanel`**: Set up the authentication panel.\n"
-                "**`/apanel_remove`**: Remove the authentication panel.\n"),
+                "**`/apanel_remove`**: Remove the authentication panel.\n"
+                "**`/apanel_list`**: List the authentication panels.\n"
+                "**`/apanel_stats`**: Show verification statistics.\n"),
             inline=False
         )
 
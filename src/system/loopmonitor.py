@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, Final, Optional
+
+from discord.ext import commands
+
+from src.lib import histogram
+
+SAMPLE_INTERVAL_SECONDS: Final[float] = 0.25
+STALL_THRESHOLD_SECONDS: Final[float] = int(os.getenv("LOOP_STALL_THRESHOLD_MS", 200)) / 1000
+SUMMARY_INTERVAL_SECONDS: Final[int] = 300
+# Samples kept for recent_lag() (10 seconds)
+RECENT_SAMPLES: Final[int] = 40
+# Scheduling lag buckets (ms), from "no lag" to a multi-second stall
+LAG_BUCKETS_MS: Final[tuple] = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+TOP_LOCATIONS: Final[int] = 5
+
+PROJECT_ROOT: Final[str] = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logger = logging.getLogger(__name__)
+
+
+class StallSite:
+    """Aggregated stalls attributed to one code location"""
+
+    __slots__ = ("count", "total_seconds", "max_seconds", "stack")
+
+    def __init__(self, stack: str) -> None:
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.stack = stack
+
+
+def _blame(frame) -> str:
+    """Innermost frame from our own code, falling back to the innermost frame"""
+    innermost = None
+    while frame is not None:
+        location = f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+        if innermost is None:
+            innermost = location
+        if frame.f_code.co_filename.startswith(PROJECT_ROOT) and "site-packages" not in frame.f_code.co_filename:
+            return location
+        frame = frame.f_back
+    return innermost or "<unknown>"
+
+
+class LoopMonitor(commands.Cog):
+    """Measures event loop scheduling lag and captures stacks of callbacks that block the loop"""
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self.lag_hist = histogram.new_histogram(LAG_BUCKETS_MS)
+        self.max_lag = 0.0
+        self._recent = deque(maxlen=RECENT_SAMPLES)
+        self.stalls: Dict[str, StallSite] = {}
+        self._lock = threading.Lock()
+        self._heartbeat = time.monotonic()
+        self._current_stall: Optional[str] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def cog_load(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self.bot.supervisor.start("loopmonitor.sample", self._sample_loop, owner=self)
+        self.bot.supervisor.every("loopmonitor.summary", SUMMARY_INTERVAL_SECONDS, self._log_summary, owner=self)
+        self._watchdog = threading.Thread(target=self._watch, name="loop-stall-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def cog_unload(self) -> None:
+        self._stop.set()
+
+    async def _sample_loop(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(SAMPLE_INTERVAL_SECONDS)
+            now = time.monotonic()
+            lag = max(0.0, now - start - SAMPLE_INTERVAL_SECONDS)
+            histogram.observe(LAG_BUCKETS_MS, self.lag_hist, lag * 1000)
+            self.max_lag = max(self.max_lag, lag)
+            self._recent.append(lag)
+
+            with self._lock:
+                stalled_for = now - self._heartbeat - SAMPLE_INTERVAL_SECONDS
+                self._heartbeat = now
+                location, self._current_stall = self._current_stall, None
+                if location is not None:
+                    site = self.stalls[location]
+                    site.total_seconds += stalled_for
+                    site.max_seconds = max(site.max_seconds, stalled_for)
+            if location is not None:
+                logger.warning("Event loop was blocked for %.0fms at %s", stalled_for * 1000, location)
+
+    def _watch(self) -> None:
+        """Sidecar thread: capture the loop thread's stack while it is stalled"""
+        while not self._stop.wait(STALL_THRESHOLD_SECONDS / 4):
+            with self._lock:
+                if self._current_stall is not None:
+                    continue
+                if time.monotonic() - self._heartbeat - SAMPLE_INTERVAL_SECONDS < STALL_THRESHOLD_SECONDS:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                location = _blame(frame)
+                site = self.stalls.get(location)
+                if site is None:
+                    site = self.stalls[location] = StallSite("".join(traceback.format_stack(frame)))
+                site.count += 1
+                self._current_stall = location
+                del frame
+
+    def lag_quantile(self, q: float) -> Optional[int]:
+        """Lag quantile in ms, as a bucket upper bound"""
+        return histogram.quantile(LAG_BUCKETS_MS, self.lag_hist, q)
+
+    def recent_lag(self) -> Optional[float]:
+        """Worst lag (seconds) over the last RECENT_SAMPLES samples, None before the first sample"""
+        return max(self._recent, default=None)
+
+    def top_stalls(self, limit: int = TOP_LOCATIONS) -> list[tuple[str, StallSite]]:
+        with self._lock:
+            return sorted(self.stalls.items(), key=lambda item: item[1].total_seconds, reverse=True)[:limit]
+
+    def summary(self) -> Dict[str, str]:
+        def fmt(value: Optional[int]) -> str:
+            return f"≤{value}ms" if value is not None else f">{LAG_BUCKETS_MS[-1]}ms"
+
+        with self._lock:
+            stall_count = sum(site.count for site in self.stalls.values())
+        return {
+            "Loop Lag (p50/p99)": f"{fmt(self.lag_quantile(0.5))} / {fmt(self.lag_quantile(0.99))}",
+            "Loop Stalls": f"{stall_count} (max {self.max_lag * 1000:.0f}ms)",
+        }
+
+    async def _log_summary(self) -> None:
+        top = self.top_stalls()
+        if not top:
+            return
+        lines = [
+            f"{site.count:>5}x total {site.total_seconds * 1000:>8.0f}ms max {site.max_seconds * 1000:>6.0f}ms  {location}"
+            for location, site in top
+        ]
+        logger.info("Event loop stall summary (%s):\n%s", self.summary(), "\n".join(lines))
+        logger.debug("Stack of the worst stall site:\n%s", top[0][1].stack)
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(LoopMonitor(bot))
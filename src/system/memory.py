@@ -0,0 +1,184 @@
+import asyncio
+import gc
+import linecache
+import logging
+import os
+import time
+import tracemalloc
+from datetime import datetime
+from io import BytesIO
+from typing import Final, Optional
+
+import discord
+from discord.ext import commands
+
+OWNER_ID: Final[int] = 1241397634095120438
+TRACE_FRAMES: Final[int] = int(os.getenv("MEMDIAG_TRACE_FRAMES", 5))
+TOP_STATS: Final[int] = 25
+# Periodic job: disabled unless MEMDIAG_INTERVAL_MINUTES is set
+INTERVAL_MINUTES: Final[int] = int(os.getenv("MEMDIAG_INTERVAL_MINUTES", 0))
+REPORT_DIR: Final[str] = os.getenv("MEMDIAG_DIR", "memdiag")
+
+SNAPSHOT_FILTERS: Final[tuple] = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GiB"
+
+
+class MemoryDiagnostics(commands.Cog):
+    """tracemalloc snapshots and live object census for the bot owner"""
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._baseline_at: Optional[datetime] = None
+
+    async def cog_load(self) -> None:
+        if INTERVAL_MINUTES > 0:
+            self.bot.supervisor.spawn("memdiag.baseline", self.take_baseline(), owner=self)
+            self.bot.supervisor.every("memdiag.report", INTERVAL_MINUTES * 60, self._write_periodic_report, owner=self)
+
+    async def take_baseline(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        self._baseline = await asyncio.to_thread(self._take_snapshot)
+        self._baseline_at = datetime.now()
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    @staticmethod
+    def _count_ui_objects() -> dict[str, int]:
+        """Walks every tracked object; runs in a worker thread"""
+        start = time.perf_counter()
+        counts = {"Views (live)": 0, "Modals (live)": 0}
+        for obj in gc.get_objects():
+            if isinstance(obj, discord.ui.Modal):
+                counts["Modals (live)"] += 1
+            elif isinstance(obj, discord.ui.View):
+                counts["Views (live)"] += 1
+        counts["Object scan (ms)"] = round((time.perf_counter() - start) * 1000)
+        return counts
+
+    async def census(self) -> dict[str, int]:
+        """Counts of the objects that are expected to grow with traffic"""
+        counts = await asyncio.to_thread(self._count_ui_objects)
+        counts["Supervised tasks"] = self.bot.supervisor.task_count()
+        counts["Persistent views"] = len(self.bot.persistent_views)
+
+        counts["Guilds"] = len(self.bot.guilds)
+        counts["Cached members"] = sum(len(guild.members) for guild in self.bot.guilds)
+        counts["Cached users"] = len(self.bot.users)
+
+        status = self.bot.get_cog("Status")
+        if status:
+            counts["Status limiter entries"] = status.rate_limited_users()
+        auth = self.bot.get_cog("Auth")
+        if auth:
+            cache = auth.panels.stats()
+            counts["Panel cache entries"] = cache["entries"]
+            counts["Panel cache hit rate (%)"] = round(cache["hit_rate"] * 100)
+        prewarmer = self.bot.get_cog("ChallengePrewarmer")
+        if prewarmer:
+            prewarm = prewarmer.stats()
+            counts["Prewarmed challenges"] = prewarm["ready"]
+            counts["Prewarm hit rate (%)"] = round(prewarm["hit_rate"] * 100)
+            counts["Prewarm wasted renders"] = prewarm["wasted"]
+        bank = self.bot.get_cog("ChallengeBankCog")
+        if bank:
+            banked = bank.stats()
+            counts["Banked challenges"] = banked["available"]
+            counts["Bank dead space (%)"] = round(banked["dead_ratio"] * 100)
+        audit = self.bot.get_cog("AuditLog")
+        if audit:
+            counts["Audit buffer"] = audit.pending()
+        stats = self.bot.get_cog("AuthStats")
+        if stats:
+            counts["Stats aggregates"] = stats.aggregate_count()
+        return counts
+
+    async def build_report(self) -> str:
+        lines = [f"AuthShield memory report ({datetime.now():%Y-%m-%d %H:%M:%S})", ""]
+
+        import psutil
+        rss = psutil.Process().memory_info().rss
+        lines.append(f"RSS: {_format_bytes(rss)}")
+
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            lines.append(f"Traced: {_format_bytes(current)} (peak {_format_bytes(peak)})")
+        lines.append("")
+
+        lines.append("== Object census ==")
+        for name, count in (await self.census()).items():
+            lines.append(f"{name:<28}{count:>10}")
+        lines.append("")
+
+        if self._baseline is None:
+            lines.append("No tracemalloc baseline. Run `as!memdiag baseline` first.")
+            return "\n".join(lines)
+
+        snapshot = await asyncio.to_thread(self._take_snapshot)
+        diff = await asyncio.to_thread(snapshot.compare_to, self._baseline, "traceback")
+        lines.append(f"== Top {TOP_STATS} allocation sites since baseline ({self._baseline_at:%Y-%m-%d %H:%M:%S}) ==")
+        for stat in diff[:TOP_STATS]:
+            frame = stat.traceback[0]
+            lines.append(
+                f"{_format_bytes(stat.size_diff):>12} {stat.count_diff:>+9} blocks  "
+                f"{frame.filename}:{frame.lineno}"
+            )
+            for caller in stat.traceback[1:]:
+                lines.append(f"{'':>32}<- {caller.filename}:{caller.lineno}")
+        return "\n".join(lines)
+
+    async def _write_periodic_report(self) -> None:
+        report = await self.build_report()
+        path = os.path.join(REPORT_DIR, f"memdiag-{datetime.now():%Y%m%d-%H%M%S}.txt")
+        await asyncio.to_thread(self._write_report, path, report)
+        logger.info("Wrote memory report to %s", path)
+
+    @staticmethod
+    def _write_report(path: str, report: str) -> None:
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(report)
+
+    @commands.command(name="memdiag")
+    async def memdiag(self, ctx: commands.Context, action: Optional[str] = None) -> None:
+        """Memory diagnostics (restricted to the bot owner)"""
+        if ctx.author.id != OWNER_ID:
+            await ctx.send("❌ You do not have permission to execute this command.")
+            return
+
+        try:
+            if action == "baseline":
+                await self.take_baseline()
+                await ctx.send("✅ tracemalloc baseline recorded.")
+                return
+
+            report = await self.build_report()
+            file = discord.File(
+                BytesIO(report.encode("utf-8")),
+                filename=f"memdiag-{datetime.now():%Y%m%d-%H%M%S}.txt"
+            )
+            await ctx.send(file=file)
+        except Exception as e:
+            logger.error("Failed to build memory report: %s", e, exc_info=True)
+            await ctx.send(f"❌ Failed to build memory report: {e}")
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(MemoryDiagnostics(bot))
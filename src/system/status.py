@@ -1,25 +1,18 @@
-import asyncio
 import time
 import platform
-import psutil
 from typing import Final, Optional, Dict
 import logging
 from datetime import datetime, timedelta
 
-import aiohttp
 import discord
 from discord import app_commands
 from discord.ext import commands
 
 
-ROUTER_IP: Final[str] = "192.168.1.1"
 STATUS_URL: Final[str] = "https://status.sakana11.org"
-TIMEOUT_SECONDS: Final[int] = 3
 RATE_LIMIT_SECONDS: Final[int] = 30
 
 ERROR_MESSAGES: Final[dict] = {
-    "connection_error": "Connection Error",
-    "timeout": "Timeout",
     "rate_limit": "Rate limited. Please try again in {} seconds.",
     "unexpected": "Unexpected error occurred: {}"
 }
@@ -37,43 +30,23 @@ class SystemStatus:
 
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self._session: Optional[aiohttp.ClientSession] = None
-
-    async def initialize(self) -> None:
-        self._session = aiohttp.ClientSession()
-
-    async def cleanup(self) -> None:
-        if self._session:
-            await self._session.close()
-            self._session = None
 
     def get_discord_latency(self) -> float:
         return round(self.bot.latency * 1000, 2)
 
-    async def get_router_latency(self) -> str:
-        if not self._session:
-            self._session = aiohttp.ClientSession()
-
-        try:
-            start_time = time.time()
-            async with self._session.get(
-                f"http://{ROUTER_IP}",
-                timeout=TIMEOUT_SECONDS
-            ):
-                pass
-            return f"{round((time.time() - start_time) * 1000, 2)}ms"
-
-        except aiohttp.ClientError as e:
-            logger.error("Router connection error: %s", e, exc_info=True)
-            return ERROR_MESSAGES["connection_error"]
-        except asyncio.TimeoutError:
-            logger.warning("Router timeout after %ds", TIMEOUT_SECONDS)
-            return ERROR_MESSAGES["timeout"]
-        except Exception as e:
-            logger.error("Unexpected error: %s", e, exc_info=True)
-            return ERROR_MESSAGES["unexpected"].format(str(e))
+    def get_dependency_health(self) -> tuple[Dict[str, str], bool]:
+        """Cached probe results from the Health cog, and whether they all passed recently"""
+        health = self.bot.get_cog("Health")
+        if health is None:
+            return {}, True
+        return (
+            {f"Health: {name}": value for name, value in health.summary().items()},
+            health.is_healthy()
+        )
 
     def get_system_info(self) -> Dict[str, str]:
+        # psutil is only needed here, so import it on first use to keep startup fast
+        import psutil
         process = psutil.Process()
         return {
             "CPU Usage": f"{psutil.cpu_percent()}%",
@@ -91,11 +64,9 @@ class Status(commands.Cog):
         self.system = SystemStatus(bot)
         self._last_uses = {}
 
-    async def cog_load(self) -> None:
-        await self.system.initialize()
-
-    async def cog_unload(self) -> None:
-        await self.system.cleanup()
+    def rate_limited_users(self) -> int:
+        """Users remembered by the /status rate limiter"""
+        return len(self._last_uses)
 
     def _check_rate_limit(
         self,
@@ -112,12 +83,13 @@ class Status(commands.Cog):
     def _create_status_embed(
         self,
         discord_latency: float,
-        router_latency: str,
+        dependencies: Dict[str, str],
+        healthy: bool,
         system_info: Dict[str, str]
     ) -> discord.Embed:
         # Determine color based on latency
         color = EMBED_COLORS["normal"]
-        if isinstance(router_latency, str) and "Error" in router_latency:
+        if not healthy:
             color = EMBED_COLORS["error"]
         elif discord_latency > 500:  # Warning for above 500ms
             color = EMBED_COLORS["warning"]
@@ -133,14 +105,9 @@ class Status(commands.Cog):
             value=f"{discord_latency}ms",
             inline=True
         )
-        embed.add_field(
-            name="Network Latency",
-            value=router_latency,
-            inline=True
-        )
 
-        # System information
-        for name, value in system_info.items():
+        # Dependency and system information
+        for name, value in {**dependencies, **system_info}.items():
             embed.add_field(
                 name=name,
                 value=value,
@@ -180,8 +147,14 @@ class Status(commands.Cog):
 
             # Fetch various information
             discord_latency = self.system.get_discord_latency()
-            router_latency = await self.system.get_router_latency()
+            dependencies, healthy = self.system.get_dependency_health()
             system_info = self.system.get_system_info()
+            loop_monitor = self.bot.get_cog("LoopMonitor")
+            if loop_monitor:
+                system_info.update(loop_monitor.summary())
+            auth = self.bot.get_cog("Auth")
+            if auth:
+                system_info.update(auth.scheduler_summary())
 
             # Update rate limit
             self._last_uses[interaction.user.id] = datetime.now()
@@ -189,7 +162,8 @@ class Status(commands.Cog):
             # Send results
             embed = self._create_status_embed(
                 discord_latency,
-                router_latency,
+                dependencies,
+                healthy,
                 system_info
             )
             await interaction.followup.send(embed=embed)
@@ -0,0 +1,68 @@
+import logging
+from datetime import datetime
+from io import BytesIO
+from typing import Final
+
+import discord
+from discord.ext import commands
+
+OWNER_ID: Final[int] = 1241397634095120438
+# Longer reports are sent as a file
+MAX_INLINE_LENGTH: Final[int] = 1900
+
+logger = logging.getLogger(__name__)
+
+
+class TaskHealth(commands.Cog):
+    """Health of the supervised background tasks, for the bot owner"""
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+
+    def build_report(self) -> str:
+        supervisor = self.bot.supervisor
+        lines = [
+            f"{'task':<22}{'kind':<9}{'owner':<20}{'act':>4}{'runs':>7}{'fail':>6}{'rst':>5}{'mean':>9}{'last':>9}"
+        ]
+        errors = []
+        for row in supervisor.health():
+            lines.append(
+                f"{row['name']:<22}{row['kind']:<9}{row['owner'][:19]:<20}{row['active']:>4}{row['runs']:>7}"
+                f"{row['failures']:>6}{row['restarts']:>5}{row['mean_ms']:>7.0f}ms{row['last_ms']:>7.0f}ms"
+            )
+            if row["last_error"]:
+                failed_at = datetime.fromtimestamp(row["last_failure_at"])
+                errors.append(f"{row['name']} ({failed_at:%m-%d %H:%M:%S}): {row['last_error']}")
+
+        groups = supervisor.group_usage()
+        if groups:
+            lines.append("")
+            lines.append("Concurrency groups: " + ", ".join(
+                f"{group} {running}/{limit}" for group, (running, limit) in sorted(groups.items())
+            ))
+        if errors:
+            lines.append("")
+            lines.append("Last errors:")
+            lines.extend(errors)
+        return "\n".join(lines)
+
+    @commands.command(name="tasks")
+    async def tasks(self, ctx: commands.Context) -> None:
+        """Background task health (restricted to the bot owner)"""
+        if ctx.author.id != OWNER_ID:
+            await ctx.send("❌ You do not have permission to execute this command.")
+            return
+
+        report = self.build_report()
+        if len(report) <= MAX_INLINE_LENGTH:
+            await ctx.send(f"```\n{report}\n```")
+            return
+        file = discord.File(
+            BytesIO(report.encode("utf-8")),
+            filename=f"tasks-{datetime.now():%Y%m%d-%H%M%S}.txt"
+        )
+        await ctx.send(file=file)
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(TaskHealth(bot))
@@ -0,0 +1,118 @@
+"""Batching, backpressure and requeue on failure in src/panel/audit.py"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.panel import audit
+from src.panel.audit import AuditLog
+
+
+class FakeConnection:
+    def __init__(self) -> None:
+        self.batches: list[list] = []
+        self.fail = False
+        self.during_copy = None
+
+    async def copy_records_to_table(self, table: str, records: list, columns: tuple) -> None:
+        await asyncio.sleep(0)
+        if self.during_copy:
+            await self.during_copy()
+        if self.fail:
+            raise OSError("connection reset")
+        self.batches.append([record[3] for record in records])
+
+
+@pytest.fixture
+def small_buffer(monkeypatch):
+    monkeypatch.setattr(audit, "FLUSH_BATCH_SIZE", 3)
+    monkeypatch.setattr(audit, "MAX_BUFFERED_RECORDS", 5)
+    monkeypatch.setattr(audit, "BACKPRESSURE_TIMEOUT_SECONDS", 0.05)
+
+
+def make_log() -> AuditLog:
+    log = AuditLog(SimpleNamespace())
+    log.conn = FakeConnection()
+    return log
+
+
+async def record_users(log: AuditLog, users) -> list[bool]:
+    return [await log.record(1, 10, user_id, "passed", 1200, 1) for user_id in users]
+
+
+def test_flush_writes_in_order_and_in_batches(small_buffer):
+    async def scenario():
+        log = make_log()
+        await record_users(log, range(2))
+        assert not log._flush_requested.is_set()
+        await record_users(log, range(2, 5))
+        # A full batch asks the flush loop to run early
+        assert log._flush_requested.is_set()
+        await log.flush()
+        assert log.conn.batches == [[0, 1, 2], [3, 4]]
+        assert (log.written, log.pending()) == (5, 0)
+
+    asyncio.run(scenario())
+
+
+def test_failed_batch_is_put_back_in_order(small_buffer):
+    async def scenario():
+        log = make_log()
+        await record_users(log, range(4))
+        log.conn.fail = True
+        await log.flush()
+        assert log.pending() == 4 and log.written == 0
+        log.conn.fail = False
+        await log.flush()
+        assert log.conn.batches == [[0, 1, 2], [3]]
+        assert log.dropped == 0
+
+    asyncio.run(scenario())
+
+
+def test_requeue_drops_newest_records_when_buffer_refilled(small_buffer):
+    async def scenario():
+        log = make_log()
+        await record_users(log, range(3))
+
+        async def traffic_during_outage():
+            log.conn.during_copy = None
+            await record_users(log, range(100, 104))
+
+        log.conn.fail = True
+        log.conn.during_copy = traffic_during_outage
+        await log.flush()
+        # Room for one of the three failed records: the oldest is kept
+        assert [record[3] for record in log._buffer] == [0, 100, 101, 102, 103]
+        assert log.dropped == 2
+
+    asyncio.run(scenario())
+
+
+def test_full_buffer_drops_after_backpressure_timeout(small_buffer):
+    async def scenario():
+        log = make_log()
+        assert all(await record_users(log, range(5)))
+        assert await record_users(log, [5]) == [False]
+        assert log.dropped == 1
+        assert log._flush_requested.is_set()
+
+    asyncio.run(scenario())
+
+
+def test_backpressure_waits_for_a_flush(small_buffer):
+    async def scenario():
+        log = make_log()
+        await record_users(log, range(5))
+
+        async def flush_loop():
+            await log._flush_requested.wait()
+            await log.flush()
+
+        flusher = asyncio.create_task(flush_loop())
+        assert await record_users(log, [5]) == [True]
+        await flusher
+        assert log.dropped == 0
+        assert log.pending() == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+"""Per-panel aggregates in src/panel/authpanel_stats.py"""
+import asyncio
+from types import SimpleNamespace
+
+from src.panel.authpanel_stats import GUILD_TOTAL, AuthStats
+
+
+class FakeConnection:
+    def __init__(self) -> None:
+        self.rows: dict = {}
+        self.busy = False
+
+    async def _query(self) -> None:
+        # asyncpg refuses a second operation while one is in progress
+        assert not self.busy, "concurrent use of one connection"
+        self.busy = True
+        await asyncio.sleep(0.01)
+        self.busy = False
+
+    async def executemany(self, query: str, args: list) -> None:
+        await self._query()
+        for guild_id, panel_id, attempts, *_ in args:
+            self.rows[(guild_id, panel_id)] = attempts
+
+    async def execute(self, query: str, guild_id: int, panel_id: int) -> None:
+        await self._query()
+        self.rows.pop((guild_id, panel_id), None)
+
+
+def test_forget_panel_keeps_guild_total():
+    async def scenario():
+        stats = AuthStats(SimpleNamespace())
+        stats.conn = FakeConnection()
+        for panel_id in (111, 222):
+            stats.observe(1, panel_id, True, 1500, 2)
+        await stats.checkpoint()
+        assert set(stats.conn.rows) == {(1, 111), (1, 222), (1, GUILD_TOTAL)}
+
+        stats.observe(1, 222, False, 9000, 2)
+        await asyncio.gather(stats.checkpoint(), stats.forget_panel(1, 111))
+        assert set(stats.conn.rows) == {(1, 222), (1, GUILD_TOTAL)}
+        assert stats.aggregate_count() == 2
+        assert stats.conn.rows[(1, GUILD_TOTAL)] == 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,24 @@
+"""CACHE_POLICY presets and the MEMBER_CACHE override in bot.py"""
+import bot
+
+
+def test_slim_preset_caches_no_members(monkeypatch):
+    monkeypatch.delenv("MEMBER_CACHE", raising=False)
+    monkeypatch.delenv("INTENT_MESSAGE_CONTENT", raising=False)
+    intents, flags, chunk = bot.build_cache_policy("slim")
+    assert flags.value == 0
+    assert not intents.message_content
+    assert not chunk
+
+
+def test_member_cache_flag_names(monkeypatch):
+    monkeypatch.setenv("MEMBER_CACHE", "joined, voice")
+    _, flags, _ = bot.build_cache_policy("full")
+    assert flags.joined and flags.voice
+
+
+def test_unknown_member_cache_flag_falls_back_to_preset(monkeypatch, capsys):
+    monkeypatch.setenv("MEMBER_CACHE", "joined,voise")
+    _, flags, _ = bot.build_cache_policy("slim")
+    assert flags.value == 0
+    assert "voise" in capsys.readouterr().out
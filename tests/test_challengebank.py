@@ -0,0 +1,141 @@
+"""add/take, persistence and compaction of src/lib/challengebank.py"""
+import asyncio
+import os
+
+import pytest
+
+from src.lib.challengebank import DATA_FILE, INDEX_FILE, BankLocked, ChallengeBank, MemoryviewReader
+
+TTL = 3600
+
+
+@pytest.fixture
+def bank(tmp_path):
+    bank = ChallengeBank(str(tmp_path))
+    bank.open()
+    yield bank
+    bank.close()
+
+
+def reopen(bank: ChallengeBank) -> ChallengeBank:
+    bank.close()
+    reopened = ChallengeBank(bank.directory)
+    reopened.open()
+    return reopened
+
+
+def test_take_serves_newest_challenge_of_the_difficulty(bank):
+    bank.add(1, "abc", b"image-1", TTL)
+    bank.add(1, "def", b"image-2", TTL)
+    bank.add(3, "ghi", b"image-3", TTL)
+    challenge = bank.take(1)
+    assert (challenge.answer, bytes(challenge.image), challenge.difficulty) == ("def", b"image-2", 1)
+    assert bank.available() == {1: 1, 3: 1}
+    assert bank.take(2) is None
+
+
+def test_expired_challenges_are_skipped(bank):
+    bank.add(1, "old", b"stale", -1)
+    assert bank.take(1) is None
+    bank.add(1, "new", b"fresh", TTL)
+    assert bank.take(1).answer == "new"
+
+
+def test_consumed_flags_survive_reopening(bank):
+    bank.add(1, "one", b"1", TTL)
+    bank.add(1, "two", b"2", TTL)
+    bank.take(1)
+    bank = reopen(bank)
+    try:
+        assert bank.available() == {1: 1}
+        assert bank.take(1).answer == "one"
+    finally:
+        bank.close()
+
+
+def test_torn_append_is_ignored(bank):
+    bank.add(1, "kept", b"data", TTL)
+    bank.add(1, "torn", b"lost", TTL)
+    bank.close()
+    # The second record's index entry was written, its data was not
+    data_path = os.path.join(bank.directory, DATA_FILE)
+    with open(data_path, "r+b") as f:
+        f.truncate(os.path.getsize(data_path) - 4)
+    bank = reopen(bank)
+    try:
+        assert bank.available() == {1: 1}
+        assert bank.take(1).answer == "kept"
+    finally:
+        bank.close()
+
+
+def test_corrupt_record_is_skipped(bank):
+    bank.add(1, "good", b"image", TTL)
+    bank.add(1, "evil", b"image", TTL)
+    bank.close()
+    with open(os.path.join(bank.directory, DATA_FILE), "r+b") as f:
+        f.seek(9)
+        f.write(b"X")
+    bank = reopen(bank)
+    try:
+        assert bank.take(1).answer == "good"
+    finally:
+        bank.close()
+
+
+def test_compaction_keeps_only_live_challenges(bank):
+    for i in range(10):
+        bank.add(1, f"a{i}", b"x" * 100, TTL)
+    for _ in range(8):
+        bank.take(1)
+    before = bank._data_size
+    assert bank.dead_ratio() > 0.7
+    asyncio.run(bank.compact())
+    assert bank._data_size < before / 4
+    assert bank.dead_ratio() == 0.0
+    assert sorted(bank.take(1).answer for _ in range(2)) == ["a0", "a1"]
+    assert os.path.getsize(os.path.join(bank.directory, INDEX_FILE)) > 0
+
+
+def test_changes_during_compaction_are_kept(bank):
+    for i in range(4):
+        bank.add(1, f"a{i}", b"x" * 10, TTL)
+    live, source = bank.snapshot()
+    mapping = bank.build_compacted(live, source)
+    # While the worker thread was writing: one challenge served, one added
+    served = bank.take(1).answer
+    bank.add(2, "late", b"y" * 10, TTL)
+    bank.finish_compaction(mapping)
+    assert bank.available() == {1: 3, 2: 1}
+    remaining = {bank.take(1).answer for _ in range(3)}
+    assert served not in remaining
+    assert bank.take(2).answer == "late"
+
+
+def test_memoryview_reader_reads_and_seeks():
+    reader = MemoryviewReader(memoryview(b"0123456789"))
+    assert reader.read(3) == b"012"
+    reader.seek(-2, os.SEEK_END)
+    assert reader.read() == b"89"
+    reader.seek(0)
+    buffer = bytearray(4)
+    assert reader.readinto(buffer) == 4 and bytes(buffer) == b"0123"
+
+
+def test_second_open_of_the_same_bank_is_refused(bank):
+    other = ChallengeBank(bank.directory)
+    with pytest.raises(BankLocked):
+        other.open()
+    bank.close()
+    # Released on close
+    other.open()
+    other.close()
+
+
+def test_compaction_keeps_the_lock(bank):
+    for i in range(4):
+        bank.add(1, f"answer{i}", b"image", TTL)
+    bank.take(1)
+    asyncio.run(bank.compact())
+    with pytest.raises(BankLocked):
+        ChallengeBank(bank.directory).open()
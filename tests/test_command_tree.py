@@ -0,0 +1,45 @@
+"""TracedCommandTree overrides CommandTree._call, which is private to discord.py"""
+import asyncio
+import inspect
+from types import SimpleNamespace
+
+import discord
+
+import bot
+from src.lib import tracing
+
+
+def test_command_tree_dispatches_through_call():
+    call = discord.app_commands.CommandTree._call
+    assert inspect.iscoroutinefunction(call)
+    assert list(inspect.signature(call).parameters) == ["self", "interaction"]
+
+
+def test_traced_tree_overrides_call():
+    assert bot.TracedCommandTree._call is not discord.app_commands.CommandTree._call
+    assert bot.BOT_OPTIONS["tree_cls"] is bot.TracedCommandTree
+
+
+def test_slash_commands_are_traced(monkeypatch):
+    async def scenario():
+        finished = []
+        tree = bot.AuthShieldBot(**bot.BOT_OPTIONS).tree
+
+        async def reject(interaction):
+            return False
+
+        monkeypatch.setattr(tree, "interaction_check", reject)
+        interaction = SimpleNamespace(data={"name": "status"}, guild_id=1, user=SimpleNamespace(id=2))
+
+        def hook(trace, duration):
+            finished.append(trace)
+
+        tracing.add_finish_hook(hook)
+        try:
+            await tree._call(interaction)
+        finally:
+            tracing.remove_finish_hook(hook)
+        assert [(trace.op, trace.name, trace.guild_id) for trace in finished] == [("command", "/status", 1)]
+        assert interaction.command_failed
+
+    asyncio.run(scenario())
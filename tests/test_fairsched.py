@@ -0,0 +1,141 @@
+"""Fairness, caps and cancellation of src/lib/fairsched.py"""
+import asyncio
+
+from src.lib.fairsched import FairScheduler, WaitStats
+
+
+async def run_jobs(scheduler: FairScheduler, jobs: list[int], order: list[int], hold: float = 0.0) -> None:
+    """Queue every job behind one held slot, then release it and let them run"""
+    release = asyncio.Event()
+
+    async def blocker():
+        async with scheduler.slot(-1):
+            await release.wait()
+
+    async def job(guild_id: int):
+        async with scheduler.slot(guild_id):
+            order.append(guild_id)
+            await asyncio.sleep(hold)
+
+    blocking = asyncio.create_task(blocker())
+    await asyncio.sleep(0)
+    tasks = [asyncio.create_task(job(guild_id)) for guild_id in jobs]
+    await asyncio.sleep(0)
+    release.set()
+    # A stalled scheduler fails the test instead of hanging it
+    await asyncio.wait_for(asyncio.gather(blocking, *tasks), 5)
+
+
+def test_flooding_guild_does_not_starve_others():
+    async def scenario():
+        scheduler = FairScheduler("test", concurrency=1, per_guild=1)
+        order = []
+        await run_jobs(scheduler, [1] * 10 + [2] * 2, order)
+        # Guild 2 queued last but is served on alternate turns
+        assert order[:4] == [1, 2, 1, 2]
+        assert scheduler.queued() == 0
+
+    asyncio.run(scenario())
+
+
+def test_weights_set_the_share_between_busy_guilds():
+    async def scenario():
+        scheduler = FairScheduler("test", concurrency=1, per_guild=1)
+        scheduler.set_weight(0, 0.25)
+        order = []
+        await run_jobs(scheduler, [0] * 10 + [1] * 10, order)
+        # While both are queued, the background guild gets one slot per four rounds
+        assert order[:10].count(0) in (2, 3)
+
+    asyncio.run(scenario())
+
+
+def test_low_weight_guild_alone_in_the_queue_is_served():
+    async def scenario():
+        scheduler = FairScheduler("test", concurrency=1, per_guild=1)
+        scheduler.set_weight(0, 0.25)
+        order = []
+        await run_jobs(scheduler, [0] * 3, order)
+        assert order == [0, 0, 0]
+
+    asyncio.run(scenario())
+
+
+def test_per_guild_cap_leaves_slots_for_other_guilds():
+    async def scenario():
+        scheduler = FairScheduler("test", concurrency=4, per_guild=2)
+        peak = {}
+
+        async def job(guild_id: int):
+            async with scheduler.slot(guild_id):
+                peak[guild_id] = max(peak.get(guild_id, 0), scheduler._active[guild_id])
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(job(1) for _ in range(6)), *(job(2) for _ in range(2)))
+        assert peak == {1: 2, 2: 2}
+        assert scheduler.stats()["running"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = FairScheduler("test", concurrency=1, per_guild=1)
+        release = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot(1):
+                await release.wait()
+
+        async def waiter():
+            async with scheduler.slot(2):
+                pass
+
+        holding = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        assert scheduler.queued(2) == 1
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert scheduler.queued() == 0
+        assert scheduler.stats()["waiting_guilds"] == 0
+        release.set()
+        await holding
+        assert scheduler.stats()["running"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_wait_stats_quantiles():
+    stats = WaitStats()
+    for seconds in [0.002] * 90 + [0.3] * 9 + [20.0]:
+        stats.observe(seconds)
+    assert stats.quantile(0.5) == 5
+    assert stats.quantile(0.95) == 500
+    assert stats.quantile(1.0) is None
+    assert stats.max_seconds == 20.0
+
+
+def test_would_wait_reports_a_full_or_queued_guild():
+    async def scenario():
+        scheduler = FairScheduler("test", concurrency=2, per_guild=1)
+        release = asyncio.Event()
+
+        async def holder(guild_id: int):
+            async with scheduler.slot(guild_id):
+                await release.wait()
+
+        assert not scheduler.would_wait(1)
+        tasks = [asyncio.create_task(holder(1))]
+        await asyncio.sleep(0)
+        # Guild 1 is at its cap; guild 2 still has room
+        assert scheduler.would_wait(1) and not scheduler.would_wait(2)
+        tasks.append(asyncio.create_task(holder(2)))
+        await asyncio.sleep(0)
+        assert scheduler.would_wait(3)
+        release.set()
+        await asyncio.gather(*tasks)
+        assert not scheduler.would_wait(1)
+
+    asyncio.run(scenario())
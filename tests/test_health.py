@@ -0,0 +1,50 @@
+"""Readiness and /status views of the cached probe results (src/system/health.py)"""
+import time
+from types import SimpleNamespace
+
+from src.system import health
+from src.system.health import Health, ProbeResult
+
+
+def make_health(results: dict) -> Health:
+    bot = SimpleNamespace(draining=False, get_cog=lambda name: None)
+    cog = Health(bot)
+    cog._intervals = {"gateway": 10.0, "postgres": 10.0, "captcha_api": 60.0}
+    cog.results = results
+    return cog
+
+
+def result(ok: bool, age: float = 0.0) -> ProbeResult:
+    probe = ProbeResult(ok, "ok" if ok else "down", 1.0)
+    probe.checked_at = time.time() - age
+    return probe
+
+
+def test_captcha_api_outage_does_not_affect_readiness():
+    cog = make_health({"gateway": result(True), "postgres": result(True), "captcha_api": result(False)})
+    assert cog.is_ready()
+    assert not cog.is_healthy()
+    assert cog.summary()["captcha_api"] == "FAILING: down"
+
+
+def test_readiness_needs_fresh_results():
+    cog = make_health({"gateway": result(True), "postgres": result(True, age=10 * health.STALE_INTERVALS + 1)})
+    assert not cog.is_ready()
+
+
+def test_status_shows_old_results_as_unknown():
+    cog = make_health({
+        "gateway": result(True),
+        "postgres": result(True, age=10 * health.STATUS_MAX_AGE_INTERVALS + 1),
+        "captcha_api": result(True),
+    })
+    assert cog.is_ready()
+    assert not cog.is_healthy()
+    assert cog.summary()["postgres"].startswith("unknown")
+    assert cog.summary()["gateway"] == "1ms"
+
+
+def test_draining_is_not_ready():
+    cog = make_health({"gateway": result(True), "postgres": result(True), "captcha_api": result(True)})
+    cog.bot.draining = True
+    assert not cog.is_ready()
@@ -0,0 +1,24 @@
+"""Bucket counting and quantiles of src/lib/histogram.py"""
+from src.lib import histogram
+
+BOUNDS = (10, 100, 1000)
+
+
+def test_values_land_in_the_first_bucket_that_holds_them():
+    counts = histogram.new_histogram(BOUNDS)
+    for value in (0, 10, 11, 1000, 1001):
+        histogram.observe(BOUNDS, counts, value)
+    assert counts == [2, 1, 1, 1]
+
+
+def test_quantile_is_a_bucket_upper_bound():
+    counts = [50, 40, 9, 1]
+    assert histogram.quantile(BOUNDS, counts, 0.5) == 10
+    assert histogram.quantile(BOUNDS, counts, 0.9) == 100
+    assert histogram.quantile(BOUNDS, counts, 0.99) == 1000
+    # Above the last bound there is no upper bound to report
+    assert histogram.quantile(BOUNDS, counts, 1.0) is None
+
+
+def test_empty_histogram_has_no_quantile():
+    assert histogram.quantile(BOUNDS, histogram.new_histogram(BOUNDS), 0.5) is None
@@ -0,0 +1,104 @@
+"""Ordering of SIGTERM drain, the second signal and the forced exit in bot.py"""
+import asyncio
+import signal
+
+import pytest
+
+import bot
+
+
+class Exited(Exception):
+    pass
+
+
+class FakeAuth:
+    def __init__(self, events: list) -> None:
+        self.events = events
+        self.drained = asyncio.Event()
+
+    async def drain(self, timeout: float) -> None:
+        self.events.append("auth.drain")
+        await self.drained.wait()
+        self.events.append("auth.drained")
+
+
+def make_bot(monkeypatch, events: list, close_seconds: float = 0.0):
+    instance = bot.AuthShieldBot(**bot.BOT_OPTIONS)
+    auth = FakeAuth(events)
+    monkeypatch.setattr(instance, "get_cog", lambda name: auth if name == "Auth" else None)
+
+    async def close() -> None:
+        events.append("close")
+        await asyncio.sleep(close_seconds)
+        events.append("closed")
+
+    monkeypatch.setattr(instance, "close", close)
+
+    def exit_(code: int) -> None:
+        events.append(f"exit {code}")
+        raise Exited
+
+    monkeypatch.setattr(bot.os, "_exit", exit_)
+    return instance, auth
+
+
+def test_first_signal_drains_before_closing(monkeypatch):
+    async def scenario():
+        events = []
+        instance, auth = make_bot(monkeypatch, events)
+        instance.handle_signal(signal.SIGTERM)
+        assert instance.draining
+        await asyncio.sleep(0.01)
+        assert events == ["auth.drain"]
+        auth.drained.set()
+        await instance._drain_task
+        assert events == ["auth.drain", "auth.drained", "close", "closed"]
+        await instance.supervisor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_second_signal_cancels_drain_and_closes(monkeypatch):
+    async def scenario():
+        events = []
+        instance, _ = make_bot(monkeypatch, events)
+        instance.handle_signal(signal.SIGTERM)
+        await asyncio.sleep(0.01)
+        instance.handle_signal(signal.SIGTERM)
+        await asyncio.sleep(0.01)
+        assert instance._drain_task.cancelled()
+        # The drain never finished and close() ran once, from the forced path
+        assert events == ["auth.drain", "close", "closed"]
+        await instance.supervisor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_force_close_exits_when_close_hangs(monkeypatch):
+    monkeypatch.setattr(bot, "FORCE_CLOSE_TIMEOUT_SECONDS", 0.05)
+
+    async def scenario():
+        events = []
+        instance, _ = make_bot(monkeypatch, events, close_seconds=10)
+        with pytest.raises(Exited):
+            await instance.force_close()
+        assert events == ["close", "exit 1"]
+        await instance.supervisor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_third_signal_exits_immediately(monkeypatch):
+    async def scenario():
+        events = []
+        instance, _ = make_bot(monkeypatch, events, close_seconds=10)
+        instance.handle_signal(signal.SIGTERM)
+        await asyncio.sleep(0.01)
+        instance.handle_signal(signal.SIGTERM)
+        await asyncio.sleep(0.01)
+        with pytest.raises(Exited):
+            instance.handle_signal(signal.SIGTERM)
+        assert events == ["auth.drain", "close", "exit 1"]
+        await instance.supervisor.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,91 @@
+"""LRU, negative entries and NOTIFY handling of src/lib/panelcache.py"""
+import asyncio
+import json
+
+from src.lib.panelcache import PanelCache, PanelInfo
+from src.lib.supervisor import Supervisor
+
+
+class FakeConnection:
+    def __init__(self, rows: dict) -> None:
+        self.rows = rows
+        self.queries = 0
+
+    async def fetchrow(self, query: str, message_id: int):
+        self.queries += 1
+        return self.rows.get(message_id)
+
+
+def panel(message_id: int, guild_id: int = 1, difficulty: int = 1) -> PanelInfo:
+    return PanelInfo(message_id, guild_id, 100, 200, difficulty)
+
+
+def make_cache(max_size: int = 3) -> PanelCache:
+    return PanelCache({}, max_size, Supervisor())
+
+
+def notify(cache: PanelCache, op: str, info: PanelInfo) -> None:
+    cache._on_notify(None, 0, "authshield_panels", json.dumps({"op": op, **info._asdict()}))
+
+
+def test_misses_are_loaded_once_and_then_hit():
+    async def scenario():
+        cache = make_cache()
+        conn = FakeConnection({10: panel(10)._asdict()})
+        assert await cache.get(10, conn) == panel(10)
+        assert await cache.get(10, conn) == panel(10)
+        assert conn.queries == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_missing_panels_are_cached_as_negative_entries():
+    async def scenario():
+        cache = make_cache()
+        conn = FakeConnection({})
+        assert await cache.get(99, conn) is None
+        assert 99 in cache
+        assert await cache.get(99, conn) is None
+        assert conn.queries == 1
+
+    asyncio.run(scenario())
+
+
+def test_least_recently_used_entry_is_evicted():
+    async def scenario():
+        cache = make_cache(max_size=2)
+        cache.put(panel(1))
+        cache.put(panel(2))
+        await cache.get(1, FakeConnection({}))
+        cache.put(panel(3))
+        assert 1 in cache and 3 in cache
+        assert 2 not in cache
+        assert sorted(info.message_id for info in cache.guild_panels(1)) == [1, 3]
+
+    asyncio.run(scenario())
+
+
+def test_guild_index_follows_moves_and_evictions():
+    cache = make_cache()
+    cache.put(panel(1, guild_id=1))
+    cache.put(panel(1, guild_id=2))
+    assert cache.guild_panels(1) == []
+    assert cache.guild_panels(2) == [panel(1, guild_id=2)]
+    cache.evict(1)
+    assert cache.guild_panels(2) == []
+    assert cache._by_guild == {}
+
+
+def test_notifications_update_and_delete_entries():
+    changes = []
+    cache = PanelCache({}, 10, Supervisor(), on_change=lambda op, info: changes.append((op, info.message_id)))
+    notify(cache, "INSERT", panel(5))
+    notify(cache, "UPDATE", panel(5, difficulty=7))
+    assert cache.guild_panels(1) == [panel(5, difficulty=7)]
+    notify(cache, "DELETE", panel(5))
+    # A deleted panel becomes a negative entry, so clicks on it do not query
+    assert 5 in cache and cache.guild_panels(1) == []
+    cache._on_notify(None, 0, "authshield_panels", "not json")
+    assert changes == [("INSERT", 5), ("UPDATE", 5), ("DELETE", 5)]
+    assert cache.invalidations == 3
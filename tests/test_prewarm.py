@@ -0,0 +1,78 @@
+"""Which joins src/panel/prewarm.py prepares a challenge for"""
+import asyncio
+from types import SimpleNamespace
+
+from src.lib.fairsched import FairScheduler
+from src.lib.panelcache import PanelInfo
+from src.panel.prewarm import ChallengePrewarmer
+
+GUILD_ID = 10
+
+
+class FakeBot:
+    def __init__(self, panels: list[PanelInfo], attempts: dict[int, int]) -> None:
+        self.supervisor = SimpleNamespace(spawn=lambda name, coro, **kwargs: coro.close())
+        self.auth = SimpleNamespace(
+            draining=False,
+            panels=SimpleNamespace(guild_panels=lambda guild_id: panels),
+            captcha_scheduler=FairScheduler("captcha", concurrency=4, per_guild=1),
+        )
+        self.stats = SimpleNamespace(attempts=lambda guild_id, panel_id: attempts.get(panel_id, 0))
+
+    def get_cog(self, name: str):
+        return {"Auth": self.auth, "AuthStats": self.stats}.get(name)
+
+
+def make_prewarmer(bot: FakeBot) -> tuple[ChallengePrewarmer, list[int]]:
+    prewarmer = ChallengePrewarmer(bot)
+    prepared = []
+
+    async def prepare(guild_id: int, user_id: int, message_id: int, difficulty: int) -> None:
+        pass
+
+    def record(guild_id: int, user_id: int, message_id: int, difficulty: int):
+        prepared.append(message_id)
+        return prepare(guild_id, user_id, message_id, difficulty)
+
+    prewarmer._prepare = record
+    return prewarmer, prepared
+
+
+def member(user_id: int = 1) -> SimpleNamespace:
+    return SimpleNamespace(id=user_id, bot=False, guild=SimpleNamespace(id=GUILD_ID))
+
+
+def panel(message_id: int) -> PanelInfo:
+    return PanelInfo(message_id, GUILD_ID, 1, 2, 3)
+
+
+def test_one_challenge_for_the_most_used_panel():
+    bot = FakeBot([panel(100), panel(200), panel(300)], {200: 40, 300: 5})
+    prewarmer, prepared = make_prewarmer(bot)
+    asyncio.run(prewarmer.on_member_join(member()))
+    assert prepared == [200]
+
+
+def test_join_is_skipped_while_clicks_are_queued():
+    async def scenario():
+        bot = FakeBot([panel(100)], {})
+        prewarmer, prepared = make_prewarmer(bot)
+        scheduler = bot.auth.captcha_scheduler
+        release = asyncio.Event()
+
+        async def click():
+            async with scheduler.slot(GUILD_ID):
+                await release.wait()
+
+        clicks = [asyncio.create_task(click()) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert scheduler.queued(GUILD_ID) == 1
+        await prewarmer.on_member_join(member())
+        assert prepared == [] and prewarmer.metrics["busy"] == 1
+
+        release.set()
+        await asyncio.gather(*clicks)
+        await prewarmer.on_member_join(member(2))
+        assert prepared == [100]
+
+    asyncio.run(scenario())
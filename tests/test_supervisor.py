@@ -0,0 +1,129 @@
+"""Backoff, restarts, cancellation and concurrency groups of src/lib/supervisor.py"""
+import asyncio
+
+import pytest
+
+from src.lib import supervisor
+from src.lib.supervisor import Supervisor
+
+
+def test_backoff_doubles_up_to_the_cap():
+    delays = [supervisor._backoff(failures) for failures in range(1, 12)]
+    assert delays[:4] == [1.0, 2.0, 4.0, 8.0]
+    assert delays[-1] == supervisor.BACKOFF_MAX_SECONDS
+    assert all(a <= b for a, b in zip(delays, delays[1:]))
+
+
+def test_crashing_loop_is_restarted_with_backoff(monkeypatch):
+    monkeypatch.setattr(supervisor, "BACKOFF_INITIAL_SECONDS", 0.01)
+
+    async def scenario():
+        tasks = Supervisor()
+        started = []
+
+        async def flaky():
+            started.append(asyncio.get_running_loop().time())
+            if len(started) < 3:
+                raise RuntimeError("boom")
+
+        await tasks.start("flaky", flaky)
+        metrics = tasks.metrics["flaky"]
+        assert (metrics.runs, metrics.failures, metrics.restarts) == (3, 2, 2)
+        assert metrics.last_error == "RuntimeError: boom"
+        # Second restart waited twice as long as the first
+        assert started[2] - started[1] >= 1.5 * (started[1] - started[0])
+
+    asyncio.run(scenario())
+
+
+def test_loop_without_restart_stops_after_a_crash():
+    async def scenario():
+        tasks = Supervisor()
+
+        async def crash():
+            raise ValueError("once")
+
+        await tasks.start("crash", crash, restart=False)
+        assert tasks.metrics["crash"].restarts == 0
+        assert tasks.task_count() == 0
+
+    asyncio.run(scenario())
+
+
+def test_periodic_failure_is_recorded_and_retried():
+    async def scenario():
+        tasks = Supervisor()
+        calls = []
+
+        async def job():
+            calls.append(len(calls))
+            if len(calls) == 1:
+                raise RuntimeError("first run fails")
+
+        tasks.every("job", 0.01, job, initial_delay=0)
+        # The failed first run delays the next by the initial backoff (1s)
+        await asyncio.sleep(0.05)
+        assert calls == [0]
+        assert tasks.metrics["job"].failures == 1
+        await tasks.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_cancel_owner_only_cancels_that_owner():
+    async def scenario():
+        tasks = Supervisor()
+        cog, other = object(), object()
+        mine = tasks.start("mine", lambda: asyncio.sleep(60), owner=cog)
+        theirs = tasks.start("theirs", lambda: asyncio.sleep(60), owner=other)
+        await asyncio.sleep(0)
+        await tasks.cancel_owner(cog)
+        assert mine.cancelled()
+        assert not theirs.done()
+        assert tasks.tasks_of(other) == [theirs]
+        await tasks.shutdown()
+        assert theirs.cancelled()
+
+    asyncio.run(scenario())
+
+
+def test_shutdown_from_a_supervised_task_does_not_cancel_itself():
+    async def scenario():
+        tasks = Supervisor()
+        sleeper = tasks.start("sleeper", lambda: asyncio.sleep(60))
+        finished = []
+
+        async def drain():
+            await tasks.shutdown()
+            finished.append(True)
+
+        await tasks.spawn("drain", drain())
+        assert finished == [True]
+        assert sleeper.cancelled()
+        with pytest.raises(RuntimeError):
+            tasks.spawn("late", asyncio.sleep(0))
+
+    asyncio.run(scenario())
+
+
+def test_group_limit_bounds_concurrency():
+    async def scenario():
+        tasks = Supervisor()
+        tasks.set_group_limit("reload", 2)
+        running, peak = 0, 0
+
+        async def work():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        spawned = [tasks.spawn("reload", work(), group="reload") for _ in range(6)]
+        await asyncio.sleep(0)
+        assert tasks.group_usage()["reload"] == (2, 2)
+        await asyncio.gather(*spawned)
+        assert peak == 2
+        assert tasks.metrics["reload"].runs == 6
+
+    asyncio.run(scenario())
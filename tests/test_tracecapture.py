@@ -0,0 +1,78 @@
+"""Writing and reading capture files with src/lib/tracecapture.py"""
+import asyncio
+import glob
+import os
+
+from src.lib import tracecapture
+from src.lib.tracecapture import TraceRecorder, read_traces, trace_files
+from src.lib.tracing import Trace
+
+
+def make_trace(name: str, guild_id: int = 111, user_id: int = 222) -> Trace:
+    trace = Trace("auth.click", name)
+    trace.guild_id = guild_id
+    trace.user_id = user_id
+    trace.stages["captcha.fetch"] = 0.18
+    trace.sizes["image"] = 21344
+    trace.tags["difficulty"] = 3
+    return trace
+
+
+def test_round_trip_with_pseudonymous_ids(tmp_path):
+    recorder = TraceRecorder(str(tmp_path))
+    recorder.observe(make_trace("auth.verify"), 0.2124)
+    recorder.observe(make_trace("auth.verify", user_id=333), 0.1)
+    asyncio.run(recorder.flush())
+    recorder.observe(make_trace("auth.verify"), 0.05)
+    asyncio.run(recorder.flush())
+
+    records = list(read_traces([str(tmp_path)]))
+    assert [record["ms"] for record in records] == [212.4, 100.0, 50.0]
+    first = records[0]
+    assert first["stages"] == {"captcha.fetch": 180.0}
+    assert first["sizes"] == {"image": 21344}
+    assert first["tags"] == {"difficulty": 3}
+    # Same ID, same pseudonym; the raw ID is never written
+    assert first["user"] == records[2]["user"] != records[1]["user"]
+    assert first["guild"] != "111" and "222" not in str(records)
+    assert recorder.stats()["recorded"] == 3
+
+
+def test_pseudonyms_differ_between_processes(tmp_path):
+    one, two = TraceRecorder(str(tmp_path)), TraceRecorder(str(tmp_path))
+    assert one._pseudonym(111) != two._pseudonym(111)
+
+
+def test_files_rotate_and_oldest_are_pruned(tmp_path):
+    recorder = TraceRecorder(str(tmp_path), file_bytes=1, max_files=2)
+    for i in range(4):
+        recorder.observe(make_trace(f"auth.step{i}"), 0.1)
+        asyncio.run(recorder.flush())
+        # File names carry a sequence number, but pruning goes by modification time
+        for path in glob.glob(os.path.join(tmp_path, tracecapture.FILE_PATTERN)):
+            os.utime(path, (os.path.getatime(path), os.path.getmtime(path) - 10))
+    files = trace_files([str(tmp_path)])
+    assert len(files) == 2
+    assert [record["name"] for record in read_traces(files)] == ["auth.step2", "auth.step3"]
+
+
+def test_buffer_overflow_is_counted(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracecapture, "BUFFER_RECORDS", 2)
+    recorder = TraceRecorder(str(tmp_path))
+    for _ in range(3):
+        recorder.observe(make_trace("auth.verify"), 0.1)
+    assert recorder.stats() == {"recorded": 0, "buffered": 2, "dropped": 1, "bytes_written": 0}
+
+
+def test_truncated_file_is_read_up_to_the_cut(tmp_path, caplog):
+    recorder = TraceRecorder(str(tmp_path))
+    recorder.observe(make_trace("auth.first"), 0.1)
+    asyncio.run(recorder.flush())
+    recorder.observe(make_trace("auth.second"), 0.1)
+    asyncio.run(recorder.flush())
+    path = trace_files([str(tmp_path)])[0]
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 8)
+    # The last member lost its trailer: its data is still read, then the reader stops with a warning
+    assert [record["name"] for record in read_traces([path])] == ["auth.first", "auth.second"]
+    assert "Truncated trace file" in caplog.text
@@ -0,0 +1,96 @@
+"""DynamicSampler in src/lib/tracing.py"""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.lib import tracing
+from src.lib.tracing import DynamicSampler, Trace
+
+WINDOW = tracing.SAMPLER_WINDOW_SECONDS
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(tracing, "time", SimpleNamespace(
+        monotonic=clock.monotonic, perf_counter=time.perf_counter, time=time.time
+    ))
+    return clock
+
+
+def context(name: str, parent_sampled=None) -> dict:
+    return {"transaction_context": {"name": name}, "parent_sampled": parent_sampled}
+
+
+def observe(sampler: DynamicSampler, name: str, count: int, duration: float = 0.1, error: bool = False) -> None:
+    for _ in range(count):
+        trace = Trace("auth.click", name)
+        trace.error = error
+        sampler.observe(trace, duration)
+
+
+def make_sampler() -> DynamicSampler:
+    return DynamicSampler(base_rate=0.2, traces_per_second=2, slow_seconds=3.0)
+
+
+def test_unseen_names_use_the_base_rate(clock):
+    assert make_sampler()(context("auth.verify")) == 0.2
+
+
+def test_continued_traces_follow_the_parent(clock):
+    sampler = make_sampler()
+    observe(sampler, "auth.verify", 5, error=True)
+    assert sampler(context("auth.verify", parent_sampled=False)) == 0.0
+    assert sampler(context("auth.verify", parent_sampled=True)) == 1.0
+
+
+def test_recent_errors_raise_the_rate(clock):
+    sampler = make_sampler()
+    observe(sampler, "auth.verify", 10)
+    observe(sampler, "auth.verify", 1, error=True)
+    clock.now += 30
+    assert sampler(context("auth.verify")) == 1.0
+    assert sampler(context("auth.other")) == 0.2
+
+
+def test_slow_share_raises_the_rate(clock):
+    sampler = make_sampler()
+    observe(sampler, "auth.verify", 19)
+    observe(sampler, "auth.verify", 1, duration=5.0)
+    clock.now += 30
+    assert sampler(context("auth.verify")) == 0.5
+
+
+def test_healthy_volume_is_capped_to_the_budget(clock):
+    sampler = make_sampler()
+    observe(sampler, "auth.verify", 600)
+    clock.now += 30
+    # 600 traces in 30s is 20/s; at the base rate that would be 4/s against a budget of 2/s
+    assert sampler(context("auth.verify")) == pytest.approx(0.1)
+
+
+def test_errors_are_remembered_for_one_more_window(clock):
+    sampler = make_sampler()
+    observe(sampler, "auth.verify", 1, error=True)
+    clock.now += WINDOW
+    observe(sampler, "auth.verify", 1)
+    assert sampler(context("auth.verify")) == 1.0
+    clock.now += WINDOW
+    observe(sampler, "auth.verify", 1)
+    assert sampler(context("auth.verify")) == 0.2
+
+
+def test_idle_name_forgets_its_history(clock):
+    sampler = make_sampler()
+    observe(sampler, "auth.verify", 1, error=True)
+    clock.now += 2 * WINDOW
+    assert sampler(context("auth.verify")) == 0.2